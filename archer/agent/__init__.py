@@ -1,21 +1,35 @@
+import asyncio
 import logging
+import time
 import uuid
+from collections.abc import Callable
 from dataclasses import dataclass
+from typing import Any
 
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
 from langgraph.types import Command
 
-from archer.agent.agent import ReactAgent
-from archer.agent.base import BaseAgent
+from archer.agent.base import BaseAgent, StreamHandler
+from archer.agent.redaction import redact, redactor
+from archer.agent.registry import agent_registry
+from archer.agent.response_cache import CacheKey, response_cache
+from archer.agent.runs import ThreadRun, thread_runs
+from archer.agent.scheduler import QueuedCallback, scheduler
+from archer.agent.tool_cache import get_toolkit
+from archer.agent.tool_output import FETCH_TOOL_NAME
+from archer.agent.usage import token_usage
 from archer.agent.utils import slack_to_markdown
-from archer.defaults import get_system_prompt
+from archer.defaults import PUBLIC_TOOLKITS, get_system_prompt
+from archer.env import AGENT_WARMUP_MODELS
+from archer.metrics import AGENT_RUN_SECONDS
 from archer.storage.functions import get_user_state
+from archer.storage.schema import UserIdentity
 
 logger = logging.getLogger(__name__)
 
 
-# Module-level cache for agents. This ensures expensive initialization (like tool retrieval)
-# is executed only once per model.
-_agents: dict[str, BaseAgent] = {}
+# Startup timing, reported by the readiness endpoint.
+_warmup_seconds: float | None = None
 
 
 @dataclass
@@ -23,79 +37,371 @@ class AgentResponse:
     content: str | None = None
     auth_message: str | None = None
     thread_id: str | None = None
+    # Set when a newer message in the thread cancelled this run; there is nothing to post
+    superseded: bool = False
 
 
 def get_agent(model: str = "gpt-4o") -> BaseAgent:
     """
-    Create and cache a ReactAgent (which holds the tool definitions) for the given model.
+    Return the ReactAgent for the given model from the shared agent registry.
 
-    This ensures that we only perform the expensive calls to get tools once,
-    and reuse the cached instance for subsequent invocations.
+    The first call for a model builds the agent; the tool definitions are fetched
+    once and shared by the agents of all models. Agents are built lazily, so a
+    request that arrives while the warm-up is still running waits for that build
+    instead of starting a second one.
     """
-    if model not in _agents:
-        _agents[model] = ReactAgent(model=model)
-    return _agents[model]
+    return agent_registry.get(model)
 
 
-def build_state(system: str, prompt: str, context: list[dict[str, str]] | None = None) -> dict:
+def warm_up_agents(models: list[str] | None = None) -> None:
+    """
+    Build the agents for the given models ahead of the first request.
+
+    This is meant to run in the background after the server has started, so that
+    the Slack endpoint can accept (and ack) events while the tools are being fetched.
+    Failures are logged and left to the lazy path in get_agent to retry.
+    """
+    global _warmup_seconds
+
+    started = time.perf_counter()
+    for model in models if models is not None else AGENT_WARMUP_MODELS:
+        try:
+            get_agent(model)
+        except Exception:
+            logger.exception(f"Failed to warm up agent for {model}")
+    _warmup_seconds = time.perf_counter() - started
+    logger.info(f"Agent warm-up finished in {_warmup_seconds:.2f}s")
+
+
+def is_ready() -> bool:
+    """
+    Return whether every warm-up model has a compiled agent.
+    """
+    return all(agent_registry.peek(model) is not None for model in AGENT_WARMUP_MODELS)
+
+
+def get_startup_metrics() -> dict:
+    """
+    Return the agent build timings and the token usage recorded so far.
+    """
+    return {
+        "ready": is_ready(),
+        "warmup_seconds": _warmup_seconds,
+        "agent_build_seconds": dict(agent_registry.build_seconds),
+        "agent_registry": agent_registry.stats(),
+        "token_usage": token_usage.stats(),
+        "thread_runs": thread_runs.stats(),
+        "response_cache": response_cache.stats() if response_cache is not None else None,
+        "redactions": redactor.stats(),
+    }
+
+
+async def _load_user_agent(user_id: str) -> tuple[UserIdentity, BaseAgent]:
+    """
+    Load the user's settings and the agent for their model without blocking the event loop.
+
+    Reading the settings touches storage and the first use of a model builds its agent,
+    so both run in a worker thread unless the agent is already cached.
+    """
+    user_settings = await asyncio.to_thread(get_user_state, user_id)
+    agent = agent_registry.peek(user_settings["model"])
+    if agent is None:
+        agent = await asyncio.to_thread(get_agent, user_settings["model"])
+    return user_settings, agent
+
+
+async def has_checkpoint(user_id: str, thread_id: str) -> bool:
+    """
+    Return whether the agent already holds conversation state for the given thread.
+
+    Callers use this to skip fetching the Slack thread history, which is only needed
+    to backfill a thread the checkpointer has not seen yet.
+    """
+    _, agent = await _load_user_agent(user_id)
+    return await _has_messages(agent, thread_id)
+
+
+async def _has_messages(agent: BaseAgent, thread_id: str) -> bool:
+    snapshot = await agent.graph.aget_state({"configurable": {"thread_id": thread_id}})
+    return bool(snapshot.values.get("messages"))
+
+
+def _cancelled_tool_results(messages: list) -> list[dict]:
+    """
+    Return results for the tool calls of the last AI message that never got one.
+
+    A run cancelled while its tools were running leaves tool calls without results
+    in the checkpoint, which the model API rejects. Each gets a result saying its
+    outcome is unknown, so the next run can continue the conversation. A call may
+    have finished (and sent an email, say) after the run was cancelled, so the model
+    is told not to repeat it blindly.
+    """
+    answered = set()
+    for message in reversed(messages):
+        if isinstance(message, ToolMessage):
+            answered.add(message.tool_call_id)
+            continue
+        if not isinstance(message, AIMessage):
+            return []
+        return [
+            {
+                "role": "tool",
+                "tool_call_id": tool_call["id"],
+                "content": (
+                    "Unknown outcome: the user sent a new message while this call was "
+                    "running, so it may or may not have completed. Do not call it again "
+                    "unless the user asks; check its effect first where possible."
+                ),
+            }
+            for tool_call in message.tool_calls
+            if tool_call["id"] not in answered
+        ]
+    return []
+
+
+async def _graph_input(
+    agent: BaseAgent,
+    thread_id: str,
+    prompts: list[str],
+    context: list[dict[str, str]] | None,
+    resume: bool,
+) -> Any:
+    if resume:
+        return Command(
+            update={"resume_input": "yes"},
+            resume="post-auth",
+            goto="tools",
+        )
+
+    # Messages of a superseded run that never started are sent before the new one
+    earlier = [{"role": "user", "content": slack_to_markdown(p)} for p in prompts[:-1]]
+    snapshot = await agent.graph.aget_state({"configurable": {"thread_id": thread_id}})
+    messages = snapshot.values.get("messages")
+    if messages:
+        # The checkpoint already holds the system prompt and the earlier turns,
+        # and add_messages appends, so only the new user messages are sent.
+        return build_state(None, prompts[-1], _cancelled_tool_results(messages) + earlier)
+    return build_state(get_system_prompt(), prompts[-1], (context or []) + earlier)
+
+
+async def _run_graph(
+    agent: BaseAgent,
+    graph_input: Any,
+    config: dict,
+    stream_handler: StreamHandler | None = None,
+    on_started: Callable[[], None] | None = None,
+) -> dict:
+    """
+    Run the graph to completion (or to an interrupt) and return the final state.
+
+    With a stream_handler the graph is streamed instead, forwarding the tokens of
+    the agent node and the names of the tools it calls as they are produced.
+
+    on_started is called with the graph's first output. LangGraph has submitted
+    the checkpoint holding the input by then, and waits for it to be written even
+    if the run is cancelled.
+    """
+    stream_mode = ["values"] if stream_handler is None else ["messages", "updates", "values"]
+    state: dict = {}
+    async for mode, chunk in agent.graph.astream(
+        graph_input, config=config, stream_mode=stream_mode
+    ):
+        if on_started is not None:
+            on_started()
+            on_started = None
+        if mode == "messages":
+            message, metadata = chunk
+            if (
+                metadata.get("langgraph_node") == "agent"
+                and isinstance(message, AIMessageChunk)
+                and isinstance(message.content, str)
+                and message.content
+            ):
+                await stream_handler.on_token(message.id, message.content)
+        elif mode == "updates":
+            update = chunk.get("agent") or {}
+            for message in update.get("messages", []):
+                if isinstance(message, AIMessage) and message.tool_calls:
+                    await stream_handler.on_tool_calls([tc["name"] for tc in message.tool_calls])
+        else:
+            state = chunk
+    return state
+
+
+async def _response_cache_key(
+    agent: BaseAgent,
+    model: str,
+    thread_id: str,
+    prompts: list[str],
+    context: list[dict[str, str]] | None,
+) -> CacheKey | None:
+    """
+    Return the response cache key of the prompt, or None if the answer depends on
+    an earlier conversation and can't come from (or go to) the cache.
+    """
+    if len(prompts) != 1 or any(message["role"] == "user" for message in context or []):
+        return None
+    if await _has_messages(agent, thread_id):
+        return None
+    try:
+        tool_names = [tool.name for tool in agent.tools]
+        return await asyncio.to_thread(
+            response_cache.key, model, slack_to_markdown(prompts[0]), tool_names
+        )
+    except Exception:
+        logger.exception("Failed to embed the prompt for the response cache")
+        return None
+
+
+def _is_shareable(state: dict) -> bool:
+    """
+    Return whether a run's answer is the same for every user: it used only tools
+    of public toolkits, none of them failed, and it finished with an answer.
+    """
+    messages = state.get("messages", [])
+    if state.get("auth_message") or not messages:
+        return False
+    last_message = messages[-1]
+    if not isinstance(last_message, AIMessage) or not last_message.content:
+        return False
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return True
+        if isinstance(message, ToolMessage) and message.status == "error":
+            return False
+        if isinstance(message, AIMessage) and any(
+            tool_call["name"] != FETCH_TOOL_NAME
+            and get_toolkit(tool_call["name"]) not in PUBLIC_TOOLKITS
+            for tool_call in message.tool_calls
+        ):
+            return False
+    return True
+
+
+async def _save_cached_response(
+    agent: BaseAgent,
+    config: dict,
+    prompt: str,
+    context: list[dict[str, str]] | None,
+    content: str,
+) -> dict:
+    """
+    Add the question and its cached answer to the thread, as if the agent had
+    answered it, so that follow-up questions have the conversation.
+    """
+    state = build_state(get_system_prompt(), prompt, context)
+    state["messages"].append(AIMessage(content=content))
+    await agent.graph.aupdate_state(config, state, as_node="agent")
+    return {"messages": state["messages"][-1:]}
+
+
+def build_state(
+    system: str | None, prompt: str, context: list[dict[str, str]] | None = None
+) -> dict:
     """
     Construct the conversation state by building a list of messages:
-      1. The first message is the system prompt.
+      1. The first message is the system prompt (if provided).
       2. Any prior context messages (if provided) are appended.
       3. Finally, the user message is appended.
+
+    For a thread that is already checkpointed only the user message should be
+    passed, since the graph appends it to the stored conversation.
     """
-    messages = [{"role": "system", "content": system}]
+    messages = []
+    if system:
+        messages.append({"role": "system", "content": system})
     if context:
         messages.extend(context)
     messages.append({"role": "user", "content": slack_to_markdown(prompt)})
     return {"messages": messages}
 
 
-def invoke_agent(
+async def invoke_agent(
     user_id: str,
     prompt: str,
     context: list[dict[str, str]] | None = None,
     thread_id: str | None = None,
     resume: bool = False,
+    stream_handler: StreamHandler | None = None,
+    workspace_id: str | None = None,
+    on_queued: QueuedCallback | None = None,
 ) -> AgentResponse:
     """
     Invoke the agent with the given prompt and conversation context.
     If an authorization message is present in the computed state,
     the agent will raise an interrupt. The returned AgentResponse includes
     any auth_message.
+
+    If a stream_handler is given it receives the response tokens and tool calls
+    while the agent runs; the returned AgentResponse is the same either way.
+
+    Runs are admitted by the agent scheduler, fairly across users and workspaces.
+    While the run waits for a slot, on_queued is called with its queue position.
+
+    A new message in a thread cancels the run still in flight for it, which then
+    returns a response with superseded set. If that run had not started yet, its
+    message is answered together with the new one.
+
+    With RESPONSE_CACHE_ENABLED, the first question of a thread may be answered
+    from the semantic response cache, which only holds answers that used no
+    user-private tools.
     """
+    started = time.perf_counter()
     try:
-        user_settings = get_user_state(user_id)
-        agent = get_agent(user_settings["model"])
-        enriched_system_content = get_system_prompt(user_timezone=user_settings.get("timezone"))
-
+        # Personal data is redacted before it reaches the model or the checkpoint
+        prompt = redact(prompt)
+        if context:
+            context = [{**message, "content": redact(message["content"])} for message in context]
+        user_settings, agent = await _load_user_agent(user_id)
         if not thread_id:
             thread_id = str(uuid.uuid4())
+        config = {
+            "configurable": {
+                "user_id": user_id,
+                "thread_id": thread_id,
+                "user_timezone": user_settings.get("timezone"),
+            }
+        }
+        logger.info(f"Using thread_id {thread_id} for graph execution")
 
-        if resume:
-            command = Command(
-                update={"resume_input": "yes"},
-                resume="post-auth",
-                goto="tools",
-            )
-            response_state = agent.graph.invoke(
-                command, config={"configurable": {"user_id": user_id, "thread_id": thread_id}}
-            )
-        else:
-            state = build_state(enriched_system_content, prompt, context)
-            response_state = agent.invoke(
-                state, config={"configurable": {"user_id": user_id, "thread_id": thread_id}}
-            )
+        async def run_thread(run: ThreadRun) -> dict:
+            cache_key = None
+            if response_cache is not None and not resume:
+                cache_key = await _response_cache_key(
+                    agent, user_settings["model"], thread_id, run.prompts, context
+                )
+            if cache_key is not None and (content := response_cache.get(cache_key)):
+                logger.info(f"Answering thread {thread_id} from the response cache")
+                state = await _save_cached_response(agent, config, run.prompts[0], context, content)
+                run.mark_started()
+                return state
+
+            async with scheduler.slot(user_id, workspace_id, on_queued):
+                graph_input = await _graph_input(agent, thread_id, run.prompts, context, resume)
+                state = await _run_graph(
+                    agent, graph_input, config, stream_handler, run.mark_started
+                )
+            if cache_key is not None and _is_shareable(state):
+                response_cache.put(cache_key, state["messages"][-1].content)
+            return state
+
+        response_state = await thread_runs.run(thread_id, None if resume else prompt, run_thread)
     except Exception:
         logger.exception("Error generating response")
+        AGENT_RUN_SECONDS.observe(time.perf_counter() - started, "error")
         return AgentResponse(
             content="An unexpected error occurred while processing your request.",
             thread_id=thread_id,
         )
     else:
+        if response_state is None:
+            logger.info(f"Run of thread {thread_id} was superseded by a newer message")
+            AGENT_RUN_SECONDS.observe(time.perf_counter() - started, "superseded")
+            return AgentResponse(thread_id=thread_id, superseded=True)
         last_message = response_state["messages"][-1]
+        content = last_message.content
         response = AgentResponse(
-            content=last_message.content,
+            content=redact(content) if isinstance(content, str) else content,
             auth_message=response_state.get("auth_message"),
             thread_id=thread_id,
         )
@@ -103,4 +409,6 @@ def invoke_agent(
             f"Agent response: auth_message={'present' if response.auth_message else 'absent'}, "
             f"thread_id={response.thread_id}, has_content={response.content is not None}"
         )
+        outcome = "auth" if response.auth_message else "ok"
+        AGENT_RUN_SECONDS.observe(time.perf_counter() - started, outcome)
         return response
@@ -1,19 +1,49 @@
+import asyncio
 import logging
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
 
-from langchain_arcade import ArcadeToolManager
+from arcadepy.types.shared import AuthorizationResponse
 from langchain_core.language_models.base import BaseLanguageModel
-from langchain_core.messages import ToolMessage
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    SystemMessage,
+    ToolMessage,
+    message_chunk_to_message,
+)
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_openai import ChatOpenAI
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import END, START, MessagesState, StateGraph
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.prebuilt import tools_condition
 from langgraph.types import interrupt
 
+from archer.agent.auth import auth_cache
 from archer.agent.base import BaseAgent
-from archer.defaults import get_available_models, get_available_toolkits
+from archer.agent.context import ContextManager
+from archer.agent.manifest import ToolManifest, load_tool_manifest
+from archer.agent.tool_output import ToolOutputProcessor
+from archer.agent.usage import token_usage
+from archer.defaults import get_available_models, get_current_times_prompt
+from archer.env import (
+    CONTEXT_BUDGET_FRACTION,
+    CONTEXT_TOOL_MESSAGE_MAX_TOKENS,
+    TOOL_ROUTING_ENABLED,
+)
+from archer.metrics import (
+    GRAPH_NODE_SECONDS,
+    LLM_FIRST_TOKEN_SECONDS,
+    LLM_RESPONSE_SECONDS,
+    timed,
+)
+from archer.storage.functions import get_checkpointer
 
 logger = logging.getLogger(__name__)
 
@@ -25,44 +55,8 @@ class AgentState(MessagesState):
 
     auth_message: str | None = None
     resume_input: str | None = None
-
-
-def handle_tool_error(state) -> dict:
-    """
-    Handle errors that occur during tool execution.
-
-    Args:
-        state: The current state with the error
-
-    Returns:
-        dict: Updated state with error messages
-    """
-    error = state.get("error")
-    tool_calls = state["messages"][-1].tool_calls
-    return {
-        "messages": [
-            ToolMessage(
-                content=f"Error: {error!r}\nPlease fix your mistakes.",
-                tool_call_id=tc["id"],
-            )
-            for tc in tool_calls
-        ]
-    }
-
-
-def create_tool_node_with_fallback(tools: list) -> ToolNode:
-    """
-    Create a tool node with error handling fallback.
-
-    Args:
-        tools: List of tools to include in the node
-
-    Returns:
-        ToolNode: A tool node with error handling
-    """
-    return ToolNode(tools).with_fallbacks(
-        [RunnableLambda(handle_tool_error)], exception_key="error"
-    )
+    # Tools bound to the model for the current turn, None for all of them
+    selected_tools: list[str] | None = None
 
 
 class ReactAgent(BaseAgent):
@@ -71,18 +65,40 @@ class ReactAgent(BaseAgent):
     extraction and integrates Arcade-based authorization when needed.
     """
 
-    def __init__(self, model: str = "gpt-4o", tools: list[str] | None = None):
+    # Number of tool subsets whose bound chat models are kept
+    BOUND_MODEL_CACHE_SIZE = 64
+
+    def __init__(
+        self,
+        model: str = "gpt-4o",
+        tools: list[str] | None = None,
+        checkpointer: BaseCheckpointSaver | None = None,
+        manifest: ToolManifest | None = None,
+    ):
         super().__init__(model=model)
-        self.manager = ArcadeToolManager()
-        self.tools = self.manager.get_tools(
-            tools=tools, toolkits=get_available_toolkits(), langgraph=False
-        )
-        self.tool_node = create_tool_node_with_fallback(self.tools)
+        # The tool definitions are usually shared with the agents of the other models
+        # (see archer.agent.registry); without a manifest the agent fetches its own.
+        self.manifest = manifest if manifest is not None else load_tool_manifest(tools)
+        self.manager = self.manifest.manager
+        self.local_tool_names = self.manifest.local_tool_names
+        self.tools = self.manifest.tools
+        self.tool_node = self.manifest.executor
+        self.tool_output = ToolOutputProcessor()
+        self.router = self.manifest.router
         # Initialize the chat model
+        self._bound_models: OrderedDict[tuple[str, ...], BaseLanguageModel] = OrderedDict()
+        self._bound_models_lock = threading.Lock()
         self.prompted_model = self._init_chat_model(model, self.tools)
+        self.context = ContextManager(
+            model,
+            max_tokens=get_available_models()[model]["max_tokens"],
+            budget_fraction=CONTEXT_BUDGET_FRACTION,
+            tool_message_max_tokens=CONTEXT_TOOL_MESSAGE_MAX_TOKENS,
+        )
 
-        # Create a memory saver for the graph
-        self.memory = MemorySaver()
+        # Conversation state is kept by the checkpointer configured in archer.env,
+        # which is shared with the agents of the other models
+        self.memory = checkpointer if checkpointer is not None else get_checkpointer()
 
         # Setup the graph after initializing all components
         self.setup_graph()
@@ -97,15 +113,45 @@ class ReactAgent(BaseAgent):
             raise ValueError(f"Model {model} not found")
 
         if record["provider"] == "OpenAI":
-            llm = ChatOpenAI(model=model)
+            # stream_usage makes streamed responses report token usage as well
+            self.llm = ChatOpenAI(model=model, stream_usage=True)
         else:
             raise ValueError(f"Provider {record['provider']} not supported")
 
+        self.parallel_tool_calls = record["parallel_tool_calling"]
+        return self._bind_tools(tools)
+
+    def _bind_tools(self, tools: list) -> BaseLanguageModel:
         prompt = ChatPromptTemplate.from_messages([("placeholder", "{messages}")])
-        llm_with_tools = llm.bind_tools(tools, parallel_tool_calls=record["parallel_tool_calling"])
+        llm_with_tools = self.llm.bind_tools(tools, parallel_tool_calls=self.parallel_tool_calls)
         prompted_model = prompt | llm_with_tools
         return prompted_model
 
+    def _model_for(self, tool_names: list[str] | None) -> BaseLanguageModel:
+        """
+        Return the chat model bound to the given tools, or to all tools for None.
+
+        Bound models are cached per subset. The subset keeps the order of self.tools,
+        so the same subset always produces the same tool schemas and prompt prefix.
+        """
+        if tool_names is None:
+            return self.prompted_model
+
+        key = tuple(tool_names)
+        with self._bound_models_lock:
+            model = self._bound_models.get(key)
+            if model is not None:
+                self._bound_models.move_to_end(key)
+                return model
+
+        selected = set(tool_names)
+        model = self._bind_tools([tool for tool in self.tools if tool.name in selected])
+        with self._bound_models_lock:
+            self._bound_models[key] = model
+            while len(self._bound_models) > self.BOUND_MODEL_CACHE_SIZE:
+                self._bound_models.popitem(last=False)
+        return model
+
     def invoke(self, state: AgentState, config: RunnableConfig) -> AgentState:
         """
         Process the state through the graph and handle authentication interruptions.
@@ -129,15 +175,120 @@ class ReactAgent(BaseAgent):
         result = self.graph.invoke(state, config=config)
         return result
 
+    async def ainvoke(self, state: AgentState, config: RunnableConfig) -> AgentState:
+        """
+        Asynchronously process the state through the graph.
+
+        Args:
+            state: The current agent state
+            config: Configuration for the runnable
+
+        Returns:
+            AgentState: The updated state after processing
+        """
+        if "configurable" not in config:
+            config["configurable"] = {}
+
+        if "thread_id" not in config.get("configurable", {}):
+            config["configurable"]["thread_id"] = str(uuid.uuid4())
+
+        thread_id = config["configurable"]["thread_id"]
+        logger.info(f"Using thread_id {thread_id} for graph execution")
+
+        result = await self.graph.ainvoke(state, config=config)
+        return result
+
     def call_agent(self, state: AgentState, config: RunnableConfig) -> dict:
         """
         Call the LLM with its tools using the full conversation context
         provided in state["messages"].
         """
-        messages = state.get("messages", [])
-        response = self.prompted_model.invoke({"messages": messages})
+        messages = self._model_messages(state, config)
+        model = self._model_for(state.get("selected_tools"))
+        with LLM_RESPONSE_SECONDS.time(self.model):
+            response = model.invoke({"messages": messages})
+        self._record_usage(response)
+        self._record_tool_use(response, config)
         return {"messages": [response]}
 
+    async def acall_agent(self, state: AgentState, config: RunnableConfig) -> dict:
+        """
+        Async version of call_agent, used when the graph runs with ainvoke.
+        """
+        messages = self._model_messages(state, config)
+        model = self._model_for(state.get("selected_tools"))
+        # The response is streamed to time its first token. Pass the config along so
+        # graph.astream can surface the model's tokens.
+        started = time.perf_counter()
+        response = None
+        first_token = False
+        async for chunk in model.astream({"messages": messages}, config):
+            if not first_token and (chunk.content or getattr(chunk, "tool_call_chunks", None)):
+                first_token = True
+                LLM_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started, self.model)
+            response = chunk if response is None else response + chunk
+        LLM_RESPONSE_SECONDS.observe(time.perf_counter() - started, self.model)
+        if isinstance(response, AIMessageChunk):
+            response = message_chunk_to_message(response)
+        self._record_usage(response)
+        self._record_tool_use(response, config)
+        return {"messages": [response]}
+
+    def route_tools(self, state: AgentState, config: RunnableConfig) -> dict:
+        """
+        Select the tools to bind to the model for this turn.
+        """
+        if not TOOL_ROUTING_ENABLED:
+            return {"selected_tools": None}
+        user_id = config.get("configurable", {}).get("user_id")
+        selected_tools = self.router.select(state.get("messages", []), user_id)
+        logger.info(
+            f"Routing to {len(selected_tools) if selected_tools is not None else 'all'} "
+            f"of {len(self.tools)} tools"
+        )
+        return {"selected_tools": selected_tools}
+
+    def _model_messages(self, state: AgentState, config: RunnableConfig) -> list[BaseMessage]:
+        """
+        Return the messages to send to the model.
+
+        The conversation is fitted into the model's token budget first. The current
+        times are then appended as the last message instead of being part of the
+        system prompt, so everything before them (tool schemas, system prompt and the
+        earlier turns) is an unchanged prefix that the provider can cache. They are
+        not stored in the state, so the conversation does not accumulate them.
+        """
+        context = self.context.fit(state.get("messages", []))
+        logger.info(
+            f"Context for {self.model}: {len(context.messages)} messages, "
+            f"{context.tokens} tokens (budget {self.context.budget}), "
+            f"{context.dropped} messages dropped, {context.truncated} tool outputs truncated"
+        )
+        token_usage.record_context(self.model, context)
+
+        user_timezone = config.get("configurable", {}).get("user_timezone")
+        return [
+            *context.messages,
+            SystemMessage(content=get_current_times_prompt(user_timezone)),
+        ]
+
+    def _record_tool_use(self, response: BaseMessage, config: RunnableConfig) -> None:
+        user_id = config.get("configurable", {}).get("user_id")
+        if user_id and isinstance(response, AIMessage) and response.tool_calls:
+            tool_names = [tool_call["name"] for tool_call in response.tool_calls]
+            self.router.record_use(user_id, tool_names)
+
+    def _record_usage(self, response: BaseMessage) -> None:
+        if not isinstance(response, AIMessage) or not response.usage_metadata:
+            return
+        usage = response.usage_metadata
+        cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+        logger.info(
+            f"Model {self.model} used {usage.get('input_tokens', 0)} input tokens "
+            f"({cached} cached) and {usage.get('output_tokens', 0)} output tokens"
+        )
+        token_usage.record(self.model, usage)
+
     def should_continue(self, state: AgentState, config: RunnableConfig) -> str:
         """
         Determine the next node based on the presence of tool calls.
@@ -163,7 +314,7 @@ class ReactAgent(BaseAgent):
             tool_calls = last_msg.tool_calls
         if any(
             (t.get("name") if isinstance(t, dict) else getattr(t, "name", None))
-            and self.manager.requires_auth(
+            and self._requires_auth(
                 t.get("name") if isinstance(t, dict) else getattr(t, "name", None)
             )
             for t in tool_calls
@@ -172,10 +323,16 @@ class ReactAgent(BaseAgent):
         else:
             return "tools"
 
+    def _requires_auth(self, tool_name: str) -> bool:
+        return tool_name not in self.local_tool_names and self.manager.requires_auth(tool_name)
+
     def check_auth(self, state: AgentState, config: RunnableConfig) -> AgentState:
         """
         Check if the tool call(s) require user authorization.
 
+        Authorizations that Arcade recently reported as completed are served
+        from the auth cache; only the remaining tools are checked with Arcade.
+
         Args:
             state: The current agent state
             config: Configuration for the runnable
@@ -188,25 +345,69 @@ class ReactAgent(BaseAgent):
             logger.warning("No user_id provided in config")
             return state
 
-        tools_to_auth: dict[str, str] = {}
+        tool_names = self._tools_to_check(state, user_id)
+        responses = [self.manager.authorize(tool_name, user_id) for tool_name in tool_names]
+        return self._auth_update(user_id, dict(zip(tool_names, responses, strict=True)))
+
+    async def acheck_auth(self, state: AgentState, config: RunnableConfig) -> AgentState:
+        """
+        Async version of check_auth, which checks the tools with Arcade concurrently.
+        """
+        user_id: str = config.get("configurable", {}).get("user_id")
+        if not user_id:
+            logger.warning("No user_id provided in config")
+            return state
+
+        tool_names = self._tools_to_check(state, user_id)
+        responses = await asyncio.gather(
+            *(
+                asyncio.to_thread(self.manager.authorize, tool_name, user_id)
+                for tool_name in tool_names
+            )
+        )
+        return self._auth_update(user_id, dict(zip(tool_names, responses, strict=True)))
+
+    def _tools_to_check(self, state: AgentState, user_id: str) -> list[str]:
+        """
+        Return the tools called in the last message that require authorization
+        and are not known to be authorized for the user.
+        """
         messages = state.get("messages", [])
-        if messages:
-            last_msg = messages[-1]
-            tool_calls = []
-            if isinstance(last_msg, dict):
-                tool_calls = last_msg.get("tool_calls", [])
-            elif hasattr(last_msg, "tool_calls"):
-                tool_calls = last_msg.tool_calls
-            for tool_call in tool_calls:
-                tool_name = (
-                    tool_call.get("name")
-                    if isinstance(tool_call, dict)
-                    else getattr(tool_call, "name", None)
-                )
-                if tool_name and self.manager.requires_auth(tool_name):
-                    auth_response = self.manager.authorize(tool_name, user_id)
-                    if auth_response.status != "completed" and tool_name not in tools_to_auth:
-                        tools_to_auth[tool_name] = auth_response.url
+        if not messages:
+            return []
+
+        last_msg = messages[-1]
+        tool_calls = []
+        if isinstance(last_msg, dict):
+            tool_calls = last_msg.get("tool_calls", [])
+        elif hasattr(last_msg, "tool_calls"):
+            tool_calls = last_msg.tool_calls
+
+        tool_names: list[str] = []
+        for tool_call in tool_calls:
+            tool_name = (
+                tool_call.get("name")
+                if isinstance(tool_call, dict)
+                else getattr(tool_call, "name", None)
+            )
+            if (
+                tool_name
+                and tool_name not in tool_names
+                and self._requires_auth(tool_name)
+                and not auth_cache.is_authorized(user_id, tool_name)
+            ):
+                tool_names.append(tool_name)
+        return tool_names
+
+    def _auth_update(
+        self, user_id: str, auth_responses: dict[str, AuthorizationResponse]
+    ) -> AgentState:
+        tools_to_auth: dict[str, str] = {}
+        for tool_name, auth_response in auth_responses.items():
+            if auth_response.status == "completed":
+                auth_cache.mark_authorized(user_id, tool_name)
+            else:
+                tools_to_auth[tool_name] = auth_response.url
 
         if tools_to_auth:
             auth_message = self.__create_url_string_for_slack(tools_to_auth)
@@ -217,6 +418,66 @@ class ReactAgent(BaseAgent):
         logger.info("All tools authorized, proceeding with execution")
         return {"auth_message": None}
 
+    def call_tools(self, state: AgentState, config: RunnableConfig) -> dict:
+        """
+        Run the tool calls of the last message.
+        """
+        result = self.tool_node.invoke(state, config)
+        self._forget_failed_auth(result, config)
+        return result
+
+    async def acall_tools(self, state: AgentState, config: RunnableConfig) -> dict:
+        """
+        Async version of call_tools.
+        """
+        result = await self.tool_node.ainvoke(state, config)
+        self._forget_failed_auth(result, config)
+        return result
+
+    def process_tool_results(self, state: AgentState, config: RunnableConfig) -> dict:
+        """
+        Shrink the results of the tool calls that just ran before the model sees them.
+
+        The processed messages keep their ids, so they replace the originals in the
+        conversation and later model calls only re-send the reduced results.
+        """
+        user_id = config.get("configurable", {}).get("user_id")
+        processed = []
+        for message in reversed(state.get("messages", [])):
+            if not isinstance(message, ToolMessage):
+                break
+            result = self.tool_output.process(message, user_id)
+            if result is not message:
+                processed.append(result)
+        return {"messages": processed[::-1]}
+
+    async def aprocess_tool_results(self, state: AgentState, config: RunnableConfig) -> dict:
+        """
+        Async version of process_tool_results, which saves full outputs in a worker thread.
+        """
+        return await asyncio.to_thread(self.process_tool_results, state, config)
+
+    def _forget_failed_auth(self, result: dict, config: RunnableConfig) -> None:
+        """
+        Drop cached authorizations of tools that failed because of authorization,
+        e.g. when the user revoked access, so the next call checks with Arcade again.
+
+        Such calls end in an error ToolMessage whose artifact is the one of a
+        ToolAuthorizationError.
+        """
+        user_id = config.get("configurable", {}).get("user_id")
+        if not user_id:
+            return
+        for message in result.get("messages", []):
+            if (
+                isinstance(message, ToolMessage)
+                and message.name
+                and message.status == "error"
+                and isinstance(message.artifact, dict)
+                and message.artifact.get("error") == "authorization_required"
+            ):
+                auth_cache.invalidate(user_id, message.name)
+
     def auth_interrupt(self, state: AgentState, config: RunnableConfig) -> AgentState:
         """
         Handle the authorization interruption.
@@ -240,12 +501,24 @@ class ReactAgent(BaseAgent):
         """
         self.workflow = StateGraph(AgentState)
 
-        self.workflow.add_node("agent", self.call_agent)
-        self.workflow.add_node("tools", self.tool_node)
-        self.workflow.add_node("check_auth", self.check_auth)
+        def timed_node(name: str, func: Callable, afunc: Callable) -> RunnableLambda:
+            timer = timed(GRAPH_NODE_SECONDS, name)
+            return RunnableLambda(timer(func), afunc=timer(afunc))
+
+        self.workflow.add_node("route_tools", self.route_tools)
+        self.workflow.add_node("agent", timed_node("agent", self.call_agent, self.acall_agent))
+        self.workflow.add_node("tools", timed_node("tools", self.call_tools, self.acall_tools))
+        self.workflow.add_node(
+            "check_auth", timed_node("check_auth", self.check_auth, self.acheck_auth)
+        )
+        self.workflow.add_node(
+            "process_tool_results",
+            RunnableLambda(self.process_tool_results, afunc=self.aprocess_tool_results),
+        )
         self.workflow.add_node("auth_interrupt", self.auth_interrupt)
 
-        self.workflow.add_edge(START, "agent")
+        self.workflow.add_edge(START, "route_tools")
+        self.workflow.add_edge("route_tools", "agent")
         self.workflow.add_conditional_edges(
             "agent",
             self.should_continue,
@@ -267,7 +540,8 @@ class ReactAgent(BaseAgent):
                 "tools": "tools",
             },
         )
-        self.workflow.add_edge("tools", "agent")
+        self.workflow.add_edge("tools", "process_tool_results")
+        self.workflow.add_edge("process_tool_results", "agent")
 
         self.graph = self.workflow.compile(checkpointer=self.memory, debug=True)
         logger.info("Agent graph compiled successfully with memory checkpointing")
@@ -301,4 +575,16 @@ class ReactAgent(BaseAgent):
         return auth_message
 
 
-GRAPH = ReactAgent().graph
+def __getattr__(name: str) -> Any:
+    """
+    Build ``GRAPH`` on first access instead of at import time.
+
+    LangGraph tooling can still load ``archer.agent.agent:GRAPH``, but importing this
+    module no longer fetches toolkits from Arcade or compiles the graph. The graph is
+    taken from the shared agent registry so the server and tooling reuse one instance.
+    """
+    if name == "GRAPH":
+        from archer.agent import get_agent
+
+        return get_agent().graph
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
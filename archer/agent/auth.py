@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from langchain_arcade import ArcadeToolManager
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import StructuredTool
+
+from archer.env import AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL_SECONDS
+
+
+class ToolAuthorizationError(Exception):
+    """
+    Raised when Arcade refuses to run a tool because the user's authorization for
+    it is missing, e.g. after the user revoked access.
+
+    `artifact` is attached to the call's error ToolMessage, which is how the agent
+    recognises the failure and drops the cached authorization.
+    """
+
+    def __init__(self, tool_name: str, status: str | None):
+        super().__init__(f"{tool_name} needs to be authorized again (status: {status})")
+        self.artifact = {"error": "authorization_required", "tool_name": tool_name}
+
+
+class AuthStatusCache:
+    """
+    Remembers which (user, tool) pairs Arcade reported as authorized.
+
+    Only completed authorizations are cached, since a pending one has to be
+    checked again (and its URL shown) until the user finishes it. Entries expire
+    after `ttl_seconds` and are dropped when a tool call fails on authorization
+    or the user completes a new authorization. At most `maxsize` entries are
+    kept; since they all have the same TTL, the oldest expire first.
+    """
+
+    def __init__(self, ttl_seconds: float, maxsize: int = AUTH_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self._expires: OrderedDict[tuple[str, str], float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_authorized(self, user_id: str, tool_name: str) -> bool:
+        key = (user_id, tool_name)
+        with self._lock:
+            expires_at = self._expires.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= time.monotonic():
+                del self._expires[key]
+                return False
+            return True
+
+    def mark_authorized(self, user_id: str, tool_name: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._expires[(user_id, tool_name)] = now + self.ttl_seconds
+            self._expires.move_to_end((user_id, tool_name))
+            while self._expires and (
+                next(iter(self._expires.values())) <= now or len(self._expires) > self.maxsize
+            ):
+                self._expires.popitem(last=False)
+
+    def invalidate(self, user_id: str, tool_name: str | None = None) -> None:
+        """Forget one tool's authorization for the user, or all of them."""
+        with self._lock:
+            if tool_name is not None:
+                self._expires.pop((user_id, tool_name), None)
+            else:
+                for key in [key for key in self._expires if key[0] == user_id]:
+                    del self._expires[key]
+
+
+auth_cache = AuthStatusCache(ttl_seconds=AUTH_CACHE_TTL_SECONDS)
+
+
+def with_cached_authorization(
+    tool: StructuredTool, manager: ArcadeToolManager, cache: AuthStatusCache = auth_cache
+) -> StructuredTool:
+    """
+    Return a copy of an Arcade tool that skips Arcade's authorization check while
+    the cache holds the user's authorization for it.
+
+    langchain_arcade's tool function asks Arcade to authorize the user before every
+    execution, although the check_auth node has just done so (or found the result
+    in the cache). Tools without authorization requirements are returned as is.
+    """
+    if not manager.requires_auth(tool.name):
+        return tool
+
+    func = tool.func
+
+    def run_authorized(config: RunnableConfig, **kwargs: Any) -> Any:
+        user_id = config.get("configurable", {}).get("user_id") if config else None
+        if user_id is None or not cache.is_authorized(user_id, tool.name):
+            # Authorizes, then executes the tool
+            return func(config=config, **kwargs)
+
+        response = manager.client.tools.execute(tool_name=tool.name, input=kwargs, user_id=user_id)
+        if response.success:
+            return response.output.value  # type: ignore[union-attr]
+        if response.output and response.output.authorization:
+            raise ToolAuthorizationError(tool.name, response.output.authorization.status)
+        return {"error": str(response.output.error)}  # type: ignore[union-attr]
+
+    return tool.model_copy(update={"func": run_authorized})
@@ -15,3 +15,31 @@ class BaseAgent(ABC):
         Process the given state and configuration, and return the new state.
         """
         pass
+
+    @abstractmethod
+    async def ainvoke(self, state: dict, config: dict) -> dict:
+        """
+        Asynchronously process the given state and configuration, and return the new state.
+        """
+        pass
+
+
+class StreamHandler:
+    """
+    Receives incremental output while an agent runs.
+
+    Subclasses override the hooks they need; the defaults do nothing.
+    """
+
+    async def on_token(self, message_id: str | None, token: str) -> None:
+        """
+        Called with each chunk of text the model produces.
+        A new message_id means the model started a new response.
+        """
+        pass
+
+    async def on_tool_calls(self, tool_names: list[str]) -> None:
+        """
+        Called when the model decides to call tools, before they run.
+        """
+        pass
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import tiktoken
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+logger = logging.getLogger(__name__)
+
+# Tokens OpenAI adds around every message for the role and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+# Rough number of characters per token, used when no tokenizer is available
+CHARS_PER_TOKEN = 4
+# Tool outputs are never cut below this many tokens when shrinking the last turn
+MIN_TOOL_MESSAGE_TOKENS = 256
+
+
+def get_encoding(model: str) -> tiktoken.Encoding | None:
+    """
+    Return the tokenizer of the model, or None if it can't be loaded (for example
+    when the encoding files can't be downloaded), in which case tokens are estimated.
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass
+    except Exception:
+        logger.warning(f"Could not load the tokenizer for {model}, estimating tokens")
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        logger.warning(f"Could not load the tokenizer for {model}, estimating tokens")
+        return None
+
+
+def message_text(message: BaseMessage) -> str:
+    """
+    Return the text of a message that counts towards the prompt.
+    """
+    if isinstance(message.content, str):
+        text = message.content
+    else:
+        text = "".join(
+            part if isinstance(part, str) else str(part.get("text", "")) for part in message.content
+        )
+    if isinstance(message, AIMessage) and message.tool_calls:
+        text += json.dumps([[tc["name"], tc["args"]] for tc in message.tool_calls])
+    return text
+
+
+@dataclass
+class FittedContext:
+    messages: list[BaseMessage]
+    tokens: int
+    # Number of messages left out and of tool outputs cut down
+    dropped: int
+    truncated: int
+
+
+class ContextManager:
+    """
+    Keeps the messages sent to the model within a token budget.
+
+    The budget is a fraction of the model's context window, leaving the rest for the
+    tool schemas and the response. Messages are fitted in two steps:
+      1. Tool outputs longer than `tool_message_max_tokens` are cut down.
+      2. If the conversation is still over budget, the oldest turns (a user message
+         and everything that answered it) are left out, keeping the system prompt
+         and the latest turn. A note tells the model that earlier messages were omitted.
+    Only what is sent is changed; the checkpointed conversation keeps every message.
+
+    Token counts and cut down tool outputs are cached by a hash of the message's
+    text, so each model call only tokenizes the messages that are new since the
+    previous one, and a message whose content changed is counted again.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        max_tokens: int,
+        budget_fraction: float,
+        tool_message_max_tokens: int,
+        cache_size: int = 50000,
+    ):
+        self.model = model
+        self.budget = int(max_tokens * budget_fraction)
+        self.tool_message_max_tokens = tool_message_max_tokens
+        self.cache_size = cache_size
+        self.encoding = get_encoding(model)
+
+        self._counts: OrderedDict[tuple, int] = OrderedDict()
+        self._truncated: OrderedDict[tuple, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cache_key(self, message: BaseMessage) -> tuple:
+        digest = hashlib.blake2b(message_text(message).encode(), digest_size=16).digest()
+        return (message.type, digest)
+
+    def count_text(self, text: str) -> int:
+        if self.encoding is None:
+            return len(text) // CHARS_PER_TOKEN + 1
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def count(self, message: BaseMessage) -> int:
+        """
+        Return the number of prompt tokens of a message.
+        """
+        key = self._cache_key(message)
+        with self._lock:
+            if key in self._counts:
+                self._counts.move_to_end(key)
+                return self._counts[key]
+
+        tokens = self.count_text(message_text(message)) + MESSAGE_OVERHEAD_TOKENS
+        self._remember(self._counts, key, tokens)
+        return tokens
+
+    def truncate(self, message: ToolMessage, max_tokens: int) -> ToolMessage:
+        """
+        Return the tool message cut down to max_tokens, or the message itself if it fits.
+        """
+        if self.count(message) <= max_tokens + MESSAGE_OVERHEAD_TOKENS:
+            return message
+
+        # Only the text is cached: messages with the same output keep their own ids
+        key = (*self._cache_key(message), max_tokens)
+        with self._lock:
+            content = self._truncated.get(key)
+        if content is None:
+            text = message_text(message)
+            if self.encoding is None:
+                kept = text[: max_tokens * CHARS_PER_TOKEN]
+            else:
+                tokens = self.encoding.encode(text, disallowed_special=())
+                kept = self.encoding.decode(tokens[:max_tokens])
+            omitted = self.count(message) - MESSAGE_OVERHEAD_TOKENS - max_tokens
+            content = f"{kept}\n[... {omitted} more tokens of tool output omitted]"
+            self._remember(self._truncated, key, content)
+        return message.model_copy(update={"content": content})
+
+    def _remember(self, cache: OrderedDict, key: tuple, value) -> None:
+        with self._lock:
+            cache[key] = value
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+
+    def _fit_tool_messages(self, messages: list[BaseMessage], max_tokens: int) -> list[BaseMessage]:
+        return [
+            self.truncate(message, max_tokens) if isinstance(message, ToolMessage) else message
+            for message in messages
+        ]
+
+    def fit(self, messages: list[BaseMessage]) -> FittedContext:
+        """
+        Return the messages to send to the model, within the token budget.
+        """
+        fitted = self._fit_tool_messages(messages, self.tool_message_max_tokens)
+        truncated = sum(
+            1 for before, after in zip(messages, fitted, strict=True) if before is not after
+        )
+        total = sum(self.count(message) for message in fitted)
+        if total <= self.budget:
+            return FittedContext(fitted, total, dropped=0, truncated=truncated)
+
+        # Split into the leading system prompt and turns that start with a user message
+        head: list[BaseMessage] = []
+        turns: list[list[BaseMessage]] = []
+        for message in messages:
+            if isinstance(message, HumanMessage) or (
+                not turns and not isinstance(message, SystemMessage)
+            ):
+                turns.append([message])
+            elif turns:
+                turns[-1].append(message)
+            else:
+                head.append(message)
+
+        def tokens(messages: list[BaseMessage]) -> int:
+            return sum(self.count(message) for message in messages)
+
+        max_tokens = self.tool_message_max_tokens
+        fitted_turns = [self._fit_tool_messages(turn, max_tokens) for turn in turns]
+        dropped = 0
+        while len(fitted_turns) > 1 and total > self.budget:
+            turn = fitted_turns.pop(0)
+            total -= tokens(turn)
+            dropped += len(turn)
+
+        # The latest turn alone is over budget, so cut its tool outputs further
+        while fitted_turns and total > self.budget and max_tokens > MIN_TOOL_MESSAGE_TOKENS:
+            max_tokens = max(max_tokens // 2, MIN_TOOL_MESSAGE_TOKENS)
+            total -= tokens(fitted_turns[-1])
+            fitted_turns[-1] = self._fit_tool_messages(turns[-1], max_tokens)
+            total += tokens(fitted_turns[-1])
+
+        if dropped:
+            note = SystemMessage(
+                content=f"{dropped} earlier messages of this conversation were omitted."
+            )
+            head = [*head, note]
+            total += self.count(note)
+        fitted = [*head, *(message for turn in fitted_turns for message in turn)]
+        truncated = sum(
+            1
+            for turn, fitted_turn in zip(
+                turns[len(turns) - len(fitted_turns) :], fitted_turns, strict=True
+            )
+            for before, after in zip(turn, fitted_turn, strict=True)
+            if before is not after
+        )
+        return FittedContext(fitted, total, dropped=dropped, truncated=truncated)
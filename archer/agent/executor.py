@@ -0,0 +1,324 @@
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor
+from typing import Any
+
+from arcadepy import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from langchain_core.messages import AIMessage, ToolCall, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+from langgraph.errors import GraphBubbleUp
+
+from archer.agent.auth import ToolAuthorizationError
+from archer.agent.tool_cache import tool_cache
+from archer.defaults import get_tool_timeout
+from archer.env import TOOL_HEDGE_SECONDS, TOOL_MAX_CONCURRENCY, TOOL_MAX_RETRIES
+from archer.metrics import TOOL_CALL_SECONDS, TOOL_CALLS_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+# Failures after which any tool call can be retried, because the call did not run
+RETRYABLE_ERRORS: tuple[type[BaseException], ...] = (RateLimitError,)
+# Failures after which read-only tool calls are retried as well, since they may
+# have run already and only calls without side effects can safely run twice
+READ_ONLY_RETRYABLE_ERRORS: tuple[type[BaseException], ...] = (
+    *RETRYABLE_ERRORS,
+    APIConnectionError,
+    InternalServerError,
+    ConnectionError,
+)
+# Timeouts are never retried: the call may still be running, and a retry would
+# only wait for the same slow service again
+TIMEOUT_ERRORS: tuple[type[BaseException], ...] = (
+    TimeoutError,
+    concurrent.futures.TimeoutError,
+    APITimeoutError,
+)
+
+# Threads that run the tools. Their number caps how many tool calls run at once
+# across all agents and conversations.
+_pool = ThreadPoolExecutor(max_workers=TOOL_MAX_CONCURRENCY, thread_name_prefix="tool")
+# Threads that wait for the calls of synchronous invocations, with their timeouts,
+# hedges and retries. Async invocations wait on the event loop instead.
+_coordinators = ThreadPoolExecutor(max_workers=TOOL_MAX_CONCURRENCY, thread_name_prefix="tool-call")
+
+
+class ToolExecutor:
+    """
+    Runs the tool calls of the last AI message, in place of LangGraph's ToolNode.
+
+    The calls of a message run concurrently on a shared thread pool, whose size caps
+    the tool calls in flight for the whole process. Each call has a timeout (see
+    TOOL_TIMEOUTS in archer.defaults) that covers all of its attempts, and transient
+    failures other than timeouts are retried with exponential backoff while time is
+    left. Read-only tools (those allowed in the tool response cache) are also hedged
+    once: if their first attempt has not answered after `hedge_after` seconds, a
+    second identical call is started and the first answer wins. Calls that already
+    run on the pool cannot be stopped, so a call never starts more than one hedge.
+
+    The async methods wait for the pool on the event loop, so waiting for slow tools
+    holds no thread; the sync ones wait in threads of a second, shared pool.
+
+    Every call gets its own ToolMessage, with an error status if it failed, so the
+    model only needs to retry the calls that failed.
+    """
+
+    def __init__(
+        self,
+        tools: list[BaseTool],
+        max_retries: int = TOOL_MAX_RETRIES,
+        hedge_after: float = TOOL_HEDGE_SECONDS,
+    ):
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+
+    def _tool_calls(self, state: dict) -> list[ToolCall]:
+        messages = state.get("messages", [])
+        last_message = messages[-1] if messages else None
+        if not isinstance(last_message, AIMessage):
+            return []
+        return last_message.tool_calls
+
+    def invoke(self, state: dict, config: RunnableConfig) -> dict:
+        calls = self._tool_calls(state)
+        futures = [_coordinators.submit(self.run_call, call, config) for call in calls]
+        return {"messages": [future.result() for future in futures]}
+
+    async def ainvoke(self, state: dict, config: RunnableConfig) -> dict:
+        calls = self._tool_calls(state)
+        messages = await asyncio.gather(*(self.arun_call(call, config) for call in calls))
+        return {"messages": list(messages)}
+
+    def run_call(self, call: ToolCall, config: RunnableConfig) -> ToolMessage:
+        """
+        Run one tool call with its timeout and retries, and return its ToolMessage.
+        """
+        started = time.perf_counter()
+        with TOOL_CALLS_IN_FLIGHT.track():
+            message = self._run_call(call, config)
+        self._observe(call, message, started)
+        return message
+
+    async def arun_call(self, call: ToolCall, config: RunnableConfig) -> ToolMessage:
+        """
+        Async version of run_call.
+        """
+        started = time.perf_counter()
+        with TOOL_CALLS_IN_FLIGHT.track():
+            message = await self._arun_call(call, config)
+        self._observe(call, message, started)
+        return message
+
+    def _observe(self, call: ToolCall, message: ToolMessage, started: float) -> None:
+        # Names the model made up are counted together
+        name = call["name"] if call["name"] in self.tools_by_name else "unknown"
+        TOOL_CALL_SECONDS.observe(time.perf_counter() - started, name, message.status)
+
+    def _run_call(self, call: ToolCall, config: RunnableConfig) -> ToolMessage:
+        tool = self.tools_by_name.get(call["name"])
+        if tool is None:
+            return self._unknown_tool_message(call)
+
+        retry = _Retry(tool, self.max_retries)
+        while True:
+            try:
+                message = self._attempt(tool, call, config, retry.deadline, retry.hedge)
+            except GraphBubbleUp:
+                raise
+            except Exception as e:
+                delay = retry.delay_after(e)
+                if delay is None:
+                    return self._failure_message(call, retry, e)
+                time.sleep(delay)
+            else:
+                return retry.finished(message)
+
+    async def _arun_call(self, call: ToolCall, config: RunnableConfig) -> ToolMessage:
+        tool = self.tools_by_name.get(call["name"])
+        if tool is None:
+            return self._unknown_tool_message(call)
+
+        retry = _Retry(tool, self.max_retries)
+        while True:
+            try:
+                message = await self._aattempt(tool, call, config, retry.deadline, retry.hedge)
+            except GraphBubbleUp:
+                raise
+            except Exception as e:
+                delay = retry.delay_after(e)
+                if delay is None:
+                    return self._failure_message(call, retry, e)
+                await asyncio.sleep(delay)
+            else:
+                return retry.finished(message)
+
+    def _attempt(
+        self,
+        tool: BaseTool,
+        call: ToolCall,
+        config: RunnableConfig,
+        deadline: float,
+        hedge: bool,
+    ) -> ToolMessage:
+        """
+        Run the call once, plus a hedged duplicate if `hedge` is set and the first
+        call is slow. Raise TimeoutError if neither answers before the deadline.
+        """
+        futures: set[Future] = {_pool.submit(tool.invoke, {**call, "type": "tool_call"}, config)}
+
+        if hedge and 0 < self.hedge_after < deadline - time.monotonic():
+            done, _ = concurrent.futures.wait(futures, timeout=self.hedge_after)
+            if not done:
+                logger.info(f"{tool.name} is slow, starting a hedged call")
+                futures.add(_pool.submit(tool.invoke, {**call, "type": "tool_call"}, config))
+
+        error: BaseException | None = None
+        while futures:
+            done, futures = concurrent.futures.wait(
+                futures, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED
+            )
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    for pending in futures:
+                        pending.cancel()
+                    return future.result()
+                error = future.exception()
+        if error is not None and not futures:
+            raise error
+        # Calls still waiting for a thread are dropped; running ones finish in the background
+        for pending in futures:
+            pending.cancel()
+        raise TimeoutError(f"{tool.name} did not finish before its deadline")
+
+    async def _aattempt(
+        self,
+        tool: BaseTool,
+        call: ToolCall,
+        config: RunnableConfig,
+        deadline: float,
+        hedge: bool,
+    ) -> ToolMessage:
+        """
+        Async version of _attempt, which waits for the pool on the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        run = functools.partial(tool.invoke, {**call, "type": "tool_call"}, config)
+        futures: set[asyncio.Future] = {loop.run_in_executor(_pool, run)}
+
+        try:
+            if hedge and 0 < self.hedge_after < deadline - time.monotonic():
+                done, _ = await asyncio.wait(futures, timeout=self.hedge_after)
+                if not done:
+                    logger.info(f"{tool.name} is slow, starting a hedged call")
+                    futures.add(loop.run_in_executor(_pool, run))
+
+            error: BaseException | None = None
+            while futures:
+                done, futures = await asyncio.wait(
+                    futures,
+                    timeout=max(deadline - time.monotonic(), 0),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    break
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    error = future.exception()
+            if error is not None and not futures:
+                raise error
+            raise TimeoutError(f"{tool.name} did not finish before its deadline")
+        finally:
+            # Calls still waiting for a thread are dropped; running ones finish in the
+            # background. This also runs when the agent run is cancelled.
+            for pending in futures:
+                pending.cancel()
+
+    def _unknown_tool_message(self, call: ToolCall) -> ToolMessage:
+        return self._error_message(
+            call,
+            f"Error: {call['name']} is not a valid tool, "
+            f"try one of [{', '.join(self.tools_by_name)}].",
+        )
+
+    def _failure_message(self, call: ToolCall, retry: "_Retry", error: Exception) -> ToolMessage:
+        name = call["name"]
+        if isinstance(error, TIMEOUT_ERRORS):
+            logger.warning(f"{name} timed out after {retry.timeout}s")
+            return self._error_message(
+                call,
+                f"Error: {name} did not finish within {retry.timeout} seconds. "
+                "Do not call it again with the same arguments unless the user asks.",
+            )
+        if isinstance(error, ToolAuthorizationError):
+            logger.info(f"{name} failed: {error}")
+            return self._error_message(
+                call,
+                f"Error: {error}. Call the tool again to ask the user for authorization.",
+                artifact=error.artifact,
+            )
+        if isinstance(error, retry.retryable):
+            return self._error_message(
+                call,
+                f"Error: {name} failed with a temporary error ({error!r}) "
+                f"after {retry.attempt + 1} attempts. Try again later.",
+            )
+        logger.warning(f"{name} failed: {error!r}")
+        return self._error_message(call, f"Error: {error!r}\nPlease fix your mistakes.")
+
+    def _error_message(self, call: ToolCall, content: str, artifact: Any = None) -> ToolMessage:
+        return ToolMessage(
+            content=content,
+            name=call["name"],
+            tool_call_id=call["id"],
+            status="error",
+            artifact=artifact,
+        )
+
+
+class _Retry:
+    """
+    The retry state of one tool call, shared by the sync and async executors.
+    """
+
+    def __init__(self, tool: BaseTool, max_retries: int):
+        self.tool_name = tool.name
+        self.max_retries = max_retries
+        self.read_only = tool_cache.is_cacheable(tool.name)
+        self.retryable = READ_ONLY_RETRYABLE_ERRORS if self.read_only else RETRYABLE_ERRORS
+        self.timeout = get_tool_timeout(tool.name)
+        self.started = time.perf_counter()
+        self.deadline = time.monotonic() + self.timeout
+        self.attempt = 0
+
+    @property
+    def hedge(self) -> bool:
+        # Only the first attempt is hedged
+        return self.read_only and self.attempt == 0
+
+    def delay_after(self, error: Exception) -> float | None:
+        """
+        Return the seconds to wait before retrying after `error`, or None to give up.
+        """
+        if isinstance(error, TIMEOUT_ERRORS) or not isinstance(error, self.retryable):
+            return None
+        delay = 0.5 * 2**self.attempt * (1 + random.random())  # noqa: S311
+        if self.attempt == self.max_retries or time.monotonic() + delay >= self.deadline:
+            return None
+        self.attempt += 1
+        logger.warning(
+            f"{self.tool_name} failed with {error!r}, retrying in {delay:.1f}s "
+            f"({self.attempt}/{self.max_retries})"
+        )
+        return delay
+
+    def finished(self, message: ToolMessage) -> ToolMessage:
+        logger.info(f"{self.tool_name} finished in {time.perf_counter() - self.started:.2f}s")
+        return message
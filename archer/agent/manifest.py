@@ -0,0 +1,65 @@
+import logging
+import time
+from dataclasses import dataclass
+
+from langchain_arcade import ArcadeToolManager
+from langchain_core.tools import BaseTool
+
+from archer.agent.auth import with_cached_authorization
+from archer.agent.executor import ToolExecutor
+from archer.agent.routing import ToolRouter
+from archer.agent.tool_cache import with_response_cache
+from archer.agent.tool_output import create_fetch_tool
+from archer.defaults import get_available_toolkits
+from archer.env import TOOL_ROUTING_MAX_TOOLS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ToolManifest:
+    """
+    The tools available to the agents, with everything derived from their
+    definitions: the executor that runs them and the router's index. A manifest
+    is never modified, so the agents of all models can share one, and a refresh
+    replaces it as a whole.
+    """
+
+    manager: ArcadeToolManager
+    tools: list[BaseTool]
+    # Tools that run in this process and are always available to the model
+    local_tool_names: frozenset[str]
+    executor: ToolExecutor
+    router: ToolRouter
+    fetched_at: float
+
+
+def load_tool_manifest(tools: list[str] | None = None) -> ToolManifest:
+    """
+    Fetch the tool definitions of the available toolkits from Arcade (or only the
+    given tools) and build a manifest from them.
+    """
+    started = time.perf_counter()
+    manager = ArcadeToolManager()
+    local_tools = [create_fetch_tool()]
+    all_tools: list[BaseTool] = [
+        with_response_cache(with_cached_authorization(tool, manager))
+        for tool in manager.get_tools(
+            tools=tools, toolkits=get_available_toolkits(), langgraph=False
+        )
+    ]
+    all_tools.extend(local_tools)
+    local_tool_names = frozenset(tool.name for tool in local_tools)
+
+    manifest = ToolManifest(
+        manager=manager,
+        tools=all_tools,
+        local_tool_names=local_tool_names,
+        executor=ToolExecutor(all_tools),
+        router=ToolRouter(
+            all_tools, max_tools=TOOL_ROUTING_MAX_TOOLS, always=sorted(local_tool_names)
+        ),
+        fetched_at=time.time(),
+    )
+    logger.info(f"Loaded {len(all_tools)} tools in {time.perf_counter() - started:.2f}s")
+    return manifest
@@ -0,0 +1,193 @@
+import os
+import re
+import threading
+from collections import Counter
+
+from archer.env import (
+    REDACT_CREDIT_CARD_PATTERN,
+    REDACT_EMAIL_PATTERN,
+    REDACT_PHONE_PATTERN,
+    REDACT_SSN_PATTERN,
+    REDACT_TERMS,
+    REDACT_USER_DEFINED_PATTERN,
+    REDACTION_ENABLED,
+)
+
+# Default of REDACT_USER_DEFINED_PATTERN, which never matches
+NEVER_MATCHES = r"(?!)"
+
+CONFIGURABLE_PATTERNS = [
+    "REDACT_EMAIL_PATTERN",
+    "REDACT_CREDIT_CARD_PATTERN",
+    "REDACT_PHONE_PATTERN",
+    "REDACT_SSN_PATTERN",
+    "REDACT_USER_DEFINED_PATTERN",
+]
+
+
+class Redactor:
+    """
+    Replaces personal data in text with a placeholder for its kind.
+
+    All rules are combined into one precompiled alternation, so a text is scanned
+    once however many rules there are. Where matches of several rules start at the
+    same position, the earlier rule wins. Literal terms are matched as whole
+    words, ignoring case, longest first.
+
+    A rule is a (label, pattern) pair, or a (label, pattern, starts) triple where
+    `starts` is a character class such as "[0-9(]" containing every character its
+    matches can start with (the classes are joined into one, so a "-" in them
+    must be escaped). Consecutive rules with the same class are only tried
+    where the class matches, and if all rules have one, positions outside all of
+    them are skipped at once. An optional prefilter pattern that every match must
+    contain lets text without it skip the scan.
+    """
+
+    def __init__(
+        self,
+        rules: list[tuple[str, str] | tuple[str, str, str | None]],
+        terms: list[str] | None = None,
+        term_label: str = "[REDACTED]",
+        prefilter: str | None = None,
+    ):
+        # Consecutive rules that start with the same characters, as [starts, alternatives]
+        groups: list[list] = []
+        self.labels: dict[str, str] = {}
+        for index, (label, pattern, *rest) in enumerate(rules):
+            if pattern == NEVER_MATCHES:
+                continue
+            starts = rest[0] if rest else None
+            self.labels[f"rule{index}"] = label
+            if not groups or groups[-1][0] != starts:
+                groups.append([starts, []])
+            groups[-1][1].append(f"(?P<rule{index}>{pattern})")
+        if terms:
+            self.labels["terms"] = term_label
+            literals = "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+            groups.append([None, [rf"(?P<terms>(?i:\b(?:{literals})\b))"]])
+
+        self.pattern = re.compile(_combine(groups)) if groups else None
+        # A text must match this to contain any match of the rules
+        self.prefilter = re.compile(prefilter) if prefilter and not terms else None
+
+        self._counts: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def _replace(self, match: re.Match[str]) -> str:
+        label = self.labels[match.lastgroup]
+        with self._lock:
+            self._counts[label] += 1
+        return label
+
+    def redact(self, text: str) -> str:
+        if self.pattern is None or (self.prefilter and not self.prefilter.search(text)):
+            return text
+        return self.pattern.sub(self._replace, text)
+
+    def stream(self, holdback: int = 64) -> "StreamRedactor":
+        return StreamRedactor(self, holdback)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+def _combine(groups: list[list]) -> str:
+    alternatives = [
+        f"(?={starts})(?:{'|'.join(group)})" if starts else "|".join(group)
+        for starts, group in groups
+    ]
+    pattern = "|".join(alternatives)
+    if all(starts for starts, _ in groups):
+        # One character class with all of the classes
+        union = "".join(starts[1:-1] for starts, _ in groups)
+        pattern = f"(?=[{union}])(?:{pattern})"
+    return pattern
+
+
+class StreamRedactor:
+    """
+    Redacts text that arrives in chunks, such as a streamed model response.
+
+    Text is only released once it can't be part of a match that is still being
+    written: the last `holdback` characters are kept back, and the cut between
+    released and kept text is moved to a whitespace character outside of any
+    match. Text is released once another `holdback` characters have arrived, so
+    the kept text is scanned once per batch rather than once per chunk. Rules
+    that match more than `holdback` characters including whitespace may
+    therefore be split.
+    """
+
+    def __init__(self, redactor: Redactor, holdback: int = 64):
+        self.redactor = redactor
+        self.holdback = holdback
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        """
+        Add a chunk and return the redacted text that is safe to show.
+        """
+        self._pending += chunk
+        if len(self._pending) < 2 * self.holdback:
+            return ""
+        end = len(self._pending) - self.holdback
+        cut = max(self._pending.rfind(" ", 0, end), self._pending.rfind("\n", 0, end)) + 1
+        if cut <= 0:
+            return ""
+        pattern = self.redactor.pattern
+        if pattern is not None:
+            for match in pattern.finditer(self._pending):
+                if match.start() < cut < match.end():
+                    cut = match.start()
+                    break
+        released, self._pending = self._pending[:cut], self._pending[cut:]
+        return self.redactor.redact(released)
+
+    def flush(self) -> str:
+        """
+        Return the rest of the text, redacted, at the end of the stream.
+        """
+        released, self._pending = self._pending, ""
+        return self.redactor.redact(released)
+
+
+def _default_starts(name: str, starts: str) -> str | None:
+    # The characters that matches of the default pattern start with are unknown
+    # for a pattern set in the environment
+    return None if name in os.environ else starts
+
+
+redactor = Redactor(
+    rules=[
+        (
+            "[EMAIL]",
+            REDACT_EMAIL_PATTERN,
+            _default_starts("REDACT_EMAIL_PATTERN", r"[\w.*%+\-]"),
+        ),
+        (
+            "[CREDIT CARD]",
+            REDACT_CREDIT_CARD_PATTERN,
+            _default_starts("REDACT_CREDIT_CARD_PATTERN", r"[\d(]"),
+        ),
+        ("[PHONE]", REDACT_PHONE_PATTERN, _default_starts("REDACT_PHONE_PATTERN", r"[\d(]")),
+        ("[SSN]", REDACT_SSN_PATTERN, _default_starts("REDACT_SSN_PATTERN", r"[\d(]")),
+        ("[REDACTED]", REDACT_USER_DEFINED_PATTERN),
+    ],
+    terms=REDACT_TERMS,
+    # Every match of the default patterns contains an "@" or a digit
+    prefilter=None if any(name in os.environ for name in CONFIGURABLE_PATTERNS) else r"[@\d]",
+)
+
+
+def redact(text: str) -> str:
+    """
+    Redact the text if REDACTION_ENABLED is set, otherwise return it unchanged.
+    """
+    return redactor.redact(text) if REDACTION_ENABLED else text
+
+
+def stream_redactor() -> StreamRedactor | None:
+    """
+    Return a StreamRedactor for a new stream if REDACTION_ENABLED is set.
+    """
+    return redactor.stream() if REDACTION_ENABLED else None
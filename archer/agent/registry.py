@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+
+from archer.agent.agent import ReactAgent
+from archer.agent.manifest import ToolManifest, load_tool_manifest
+from archer.env import AGENT_TOOL_REFRESH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class AgentRegistry:
+    """
+    Builds and caches one ReactAgent per model.
+
+    The agents of all models share one tool manifest, fetched from Arcade once, and
+    the checkpointer. Each model's agent is built under its own lock, so concurrent
+    first requests for a model wait for a single build while other models can be
+    built at the same time.
+
+    The tool definitions can be refreshed in the background: a new manifest is
+    fetched and new agents are built from it before they replace the old ones, so
+    requests never wait for a refresh, and runs in flight finish on the agent they
+    started with.
+    """
+
+    def __init__(self, refresh_seconds: float = AGENT_TOOL_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+
+        self._agents: dict[str, ReactAgent] = {}
+        self._build_locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._manifest: ToolManifest | None = None
+        self._manifest_lock = threading.Lock()
+        self._refresh_thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+        self.build_seconds: dict[str, float] = {}
+        self._manifest_seconds: float | None = None
+        self._refreshes = 0
+        self._refresh_failures = 0
+
+    def peek(self, model: str) -> ReactAgent | None:
+        """
+        Return the model's agent if it is already built, without building it.
+        """
+        return self._agents.get(model)
+
+    def manifest(self) -> ToolManifest:
+        manifest = self._manifest
+        if manifest is not None:
+            return manifest
+        with self._manifest_lock:
+            if self._manifest is None:
+                started = time.perf_counter()
+                self._manifest = load_tool_manifest()
+                self._manifest_seconds = time.perf_counter() - started
+            return self._manifest
+
+    def get(self, model: str) -> ReactAgent:
+        agent = self._agents.get(model)
+        if agent is not None:
+            return agent
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(model, threading.Lock())
+        with build_lock:
+            if model not in self._agents:
+                started = time.perf_counter()
+                self._agents[model] = ReactAgent(model=model, manifest=self.manifest())
+                self.build_seconds[model] = time.perf_counter() - started
+                logger.info(f"Built agent for {model} in {self.build_seconds[model]:.2f}s")
+            return self._agents[model]
+
+    def refresh(self) -> None:
+        """
+        Fetch the tool definitions again and rebuild the agents built so far with them.
+        """
+        manifest = load_tool_manifest()
+        with self._manifest_lock:
+            self._manifest = manifest
+        for model in list(self._agents):
+            with self._lock:
+                build_lock = self._build_locks.setdefault(model, threading.Lock())
+            agent = ReactAgent(model=model, manifest=manifest)
+            with build_lock:
+                self._agents[model] = agent
+        self._refreshes += 1
+        logger.info(f"Refreshed {len(manifest.tools)} tools for {len(self._agents)} agents")
+
+    def start_refresh(self) -> None:
+        """
+        Refresh the tool definitions every `refresh_seconds` in a background thread.
+        """
+        if self.refresh_seconds <= 0 or self._refresh_thread is not None:
+            return
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_loop, name="agent-refresh", daemon=True
+        )
+        self._refresh_thread.start()
+
+    def stop_refresh(self) -> None:
+        self._stopped.set()
+
+    def _refresh_loop(self) -> None:
+        while not self._stopped.wait(self.refresh_seconds):
+            try:
+                self.refresh()
+            except Exception:
+                # The current tools stay in use until the next attempt
+                self._refresh_failures += 1
+                logger.exception("Failed to refresh the tool definitions")
+
+    def stats(self) -> dict:
+        manifest = self._manifest
+        return {
+            "models": sorted(self._agents),
+            "tools": len(manifest.tools) if manifest is not None else None,
+            "manifest_seconds": self._manifest_seconds,
+            "manifest_age_seconds": (
+                time.time() - manifest.fetched_at if manifest is not None else None
+            ),
+            "refreshes": self._refreshes,
+            "refresh_failures": self._refresh_failures,
+        }
+
+
+agent_registry = AgentRegistry()
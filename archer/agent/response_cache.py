@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import math
+import operator
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass
+
+from archer.env import (
+    RESPONSE_CACHE_EMBEDDING_DIMENSIONS,
+    RESPONSE_CACHE_EMBEDDING_MODEL,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_SIMILARITY,
+    RESPONSE_CACHE_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Turns a prompt into an embedding vector
+Embedder = Callable[[str], Sequence[float]]
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Return the prompt lowercased, without Slack mentions, surrounding punctuation
+    and repeated whitespace, so trivially different phrasings share a key.
+    """
+    prompt = re.sub(r"<[@#!][^>]*>", " ", prompt.lower())
+    return " ".join(prompt.split()).strip(" .!?¿¡")
+
+
+def hashed_embedding(text: str, dimensions: int = 256) -> list[float]:
+    """
+    Embed text as hashed counts of its words and character trigrams.
+
+    This needs no model or network and is deterministic, which makes it suitable
+    for tests and offline use. It only captures surface similarity.
+    """
+    vector = [0.0] * dimensions
+    words = text.split()
+    features = words + [f"#{word[i : i + 3]}" for word in words for i in range(len(word) - 2)]
+    for feature in features:
+        digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    return vector
+
+
+def openai_embedder(
+    model: str = RESPONSE_CACHE_EMBEDDING_MODEL,
+    dimensions: int = RESPONSE_CACHE_EMBEDDING_DIMENSIONS,
+) -> Embedder:
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(model=model, dimensions=dimensions).embed_query
+
+
+def _unit(vector: Sequence[float]) -> list[float]:
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else list(vector)
+
+
+def tools_digest(tool_names: Iterable[str]) -> str:
+    """
+    Return a short digest of a set of tool names, independent of their order.
+    """
+    joined = "\n".join(sorted(set(tool_names)))
+    return hashlib.blake2b(joined.encode(), digest_size=8).hexdigest()
+
+
+@dataclass
+class CacheKey:
+    model: str
+    # Digest of the tools the agent could call; answers are not shared across tool sets
+    tools: str
+    prompt: str
+    vector: list[float]
+
+    @property
+    def scope(self) -> tuple[str, str]:
+        return self.model, self.tools
+
+
+@dataclass
+class _Entry:
+    vector: list[float]
+    content: str
+    expires_at: float
+
+
+class SemanticResponseCache:
+    """
+    Cache of agent responses, looked up by the meaning of the question.
+
+    Prompts are normalized and embedded with a pluggable embedding function. A
+    lookup returns the response of the most similar cached prompt of the same
+    model and tool set, if its cosine similarity is at least `threshold`. Entries expire after
+    `ttl` seconds and the least recently used ones are evicted beyond `maxsize`.
+    The index is a plain list scan, which is fast enough at a few hundred entries
+    of small embeddings.
+
+    The cache does not decide what may be shared between users: callers must only
+    store responses that depend on nothing private to the user.
+    """
+
+    def __init__(
+        self,
+        embed: Embedder | None = None,
+        threshold: float = RESPONSE_CACHE_SIMILARITY,
+        ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+        maxsize: int = RESPONSE_CACHE_MAX_ENTRIES,
+    ):
+        self._embed = embed
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: OrderedDict[tuple[str, str, str], _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "exact_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def key(self, model: str, prompt: str, tool_names: Iterable[str] = ()) -> CacheKey:
+        """
+        Normalize and embed the prompt. This may call the embedding model.
+        """
+        if self._embed is None:
+            self._embed = openai_embedder()
+        normalized = normalize_prompt(prompt)
+        return CacheKey(model, tools_digest(tool_names), normalized, _unit(self._embed(normalized)))
+
+    def get(self, key: CacheKey) -> str | None:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get((*key.scope, key.prompt))
+            if entry is not None:
+                self._stats["exact_hits"] += 1
+                best_key = (*key.scope, key.prompt)
+            else:
+                best_key, best_similarity = None, self.threshold
+                for (model, tools, prompt), candidate in self._entries.items():
+                    if (model, tools) != key.scope:
+                        continue
+                    similarity = sum(map(operator.mul, key.vector, candidate.vector))
+                    if similarity >= best_similarity:
+                        best_key, best_similarity = (model, tools, prompt), similarity
+                if best_key is None:
+                    self._stats["misses"] += 1
+                    return None
+                entry = self._entries[best_key]
+                logger.info(f"Response cache matched {best_key[2]!r} at {best_similarity:.3f}")
+            self._stats["hits"] += 1
+            self._entries.move_to_end(best_key)
+            return entry.content
+
+    def put(self, key: CacheKey, content: str) -> None:
+        with self._lock:
+            self._entries[(*key.scope, key.prompt)] = _Entry(
+                key.vector, content, time.monotonic() + self.ttl
+            )
+            self._entries.move_to_end((*key.scope, key.prompt))
+            self._stats["stores"] += 1
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _expire(self, now: float) -> None:
+        for entry_key in [k for k, entry in self._entries.items() if entry.expires_at <= now]:
+            del self._entries[entry_key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+response_cache = SemanticResponseCache() if RESPONSE_CACHE_ENABLED else None
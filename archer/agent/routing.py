@@ -0,0 +1,141 @@
+import math
+import re
+import threading
+from collections import OrderedDict, defaultdict, deque
+
+from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.tools import BaseTool
+
+# Words that say nothing about which tool is needed
+STOPWORDS = frozenset(
+    "a an and are as at be by can could do for from get give have how i in is it me my "
+    "of on or please show tell that the this to up was what when where which who will "
+    "with would you your".split()
+)
+
+# Words users say for what the tool descriptions call something else
+ALIASES = {
+    "pr": ("pull", "request"),
+    "repo": ("repository",),
+    "mail": ("email",),
+    "inbox": ("email",),
+    "meeting": ("event", "calendar"),
+    "schedule": ("event", "calendar"),
+}
+
+# Name words identify a tool much better than the words of its description
+NAME_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split text into lowercase words. CamelCase words are also split into their parts
+    ("ListEmails" gives "listemail", "list" and "email"), a plural "s" is dropped so
+    that "emails" matches "ListEmail", and aliases are expanded.
+    """
+    words = []
+    for word in re.findall(r"[A-Za-z0-9]+", text):
+        parts = re.sub(r"(?<=[a-z0-9])(?=[A-Z])", " ", word).split()
+        words.extend([word, *parts] if len(parts) > 1 else parts)
+
+    terms = []
+    for word in words:
+        term = word.lower()
+        if len(term) < 2 or term in STOPWORDS:
+            continue
+        if len(term) > 2 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        terms.extend(ALIASES.get(term, (term,)))
+    return terms
+
+
+class ToolRouter:
+    """
+    Picks the tools that are relevant to a turn, so the model is not sent the
+    schemas of every tool on every call.
+
+    Tools are scored against the latest user messages with a keyword index over
+    their names and descriptions, weighted by how rare each word is among the
+    tools. Matching tools the user called recently get a bonus. The tools in
+    `always` are part of every subset. When nothing in the question matches, all
+    tools are used, which also keeps the tools of follow-up questions ("and the
+    one after that?").
+    """
+
+    def __init__(
+        self,
+        tools: list[BaseTool],
+        max_tools: int,
+        always: list[str] | None = None,
+        recent_tools: int = 8,
+        prior_weight: float = 1.0,
+        max_users: int = 10000,
+    ):
+        self.tool_names = [tool.name for tool in tools]
+        self.max_tools = max_tools
+        self.always = set(always or [])
+        self.recent_tools = recent_tools
+        self.prior_weight = prior_weight
+        self.max_users = max_users
+
+        self._index: dict[str, dict[str, float]] = defaultdict(dict)
+        for tool in tools:
+            if tool.name in self.always:
+                continue
+            first_line = (tool.description or "").split("\n")[0]
+            for weight, text in (
+                (DESCRIPTION_WEIGHT, first_line),
+                (NAME_WEIGHT, tool.name),
+            ):
+                for term in tokenize(text):
+                    self._index[term][tool.name] = weight
+        self._idf = {
+            term: math.log(1 + len(tools) / len(postings)) for term, postings in self._index.items()
+        }
+
+        self._recent: OrderedDict[str, deque[str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def select(self, messages: list[BaseMessage], user_id: str | None = None) -> list[str] | None:
+        """
+        Return the names of the tools to bind for the conversation, in the order the
+        tools were given, or None to bind all of them.
+        """
+        query = [
+            message.content
+            for message in messages
+            if isinstance(message, HumanMessage) and isinstance(message.content, str)
+        ][-2:]
+
+        scores: dict[str, float] = defaultdict(float)
+        for term in set(tokenize(" ".join(query))):
+            for tool_name, weight in self._index.get(term, {}).items():
+                scores[tool_name] += weight * self._idf[term]
+        if not scores:
+            # Nothing in the question points at a tool, so recent use alone can't choose
+            return None
+        with self._lock:
+            recent = list(self._recent.get(user_id, ())) if user_id else []
+        for tool_name in recent:
+            if tool_name in scores:
+                scores[tool_name] += self.prior_weight
+        selected = set(sorted(scores, key=scores.__getitem__, reverse=True)[: self.max_tools])
+        selected |= self.always
+        return [tool_name for tool_name in self.tool_names if tool_name in selected]
+
+    def record_use(self, user_id: str, tool_names: list[str]) -> None:
+        """
+        Remember the tools the user's conversation called, most recent last.
+        """
+        with self._lock:
+            recent = self._recent.pop(user_id, None) or deque(maxlen=self.recent_tools)
+            for tool_name in tool_names:
+                if tool_name in self.always:
+                    continue
+                if tool_name in recent:
+                    recent.remove(tool_name)
+                recent.append(tool_name)
+            self._recent[user_id] = recent
+            while len(self._recent) > self.max_users:
+                self._recent.popitem(last=False)
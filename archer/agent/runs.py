@@ -0,0 +1,98 @@
+import asyncio
+import logging
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class ThreadRun:
+    thread_id: str
+    # User messages this run has to send, oldest first
+    prompts: list[str] = field(default_factory=list)
+    task: asyncio.Task | None = None
+    # Whether the checkpoint holds this run's messages, so a newer run must not resend them
+    started: bool = False
+    superseded: bool = False
+
+    def mark_started(self) -> None:
+        """
+        Record that the checkpoint holds the run's messages. Until then, a newer run
+        of the thread sends them itself, so they are not lost if this one is cancelled.
+        """
+        self.started = True
+
+
+class ThreadRunTracker:
+    """
+    Tracks the agent run in flight for each conversation thread.
+
+    When a new message arrives for a thread that already has a run, the older run
+    is cancelled: it would answer a question the user has since corrected or
+    extended. If the older run had not started yet, its messages are handed to the
+    new run, so both are answered together. Runs of the same thread are serialized
+    by a lock, so a new run only reads the checkpoint once the cancelled one has
+    finished writing it.
+    """
+
+    def __init__(self) -> None:
+        self._runs: dict[str, ThreadRun] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._lock_users: Counter[str] = Counter()
+        self._superseded = 0
+
+    async def run(
+        self,
+        thread_id: str,
+        prompt: str | None,
+        func: Callable[[ThreadRun], Awaitable[T]],
+    ) -> T | None:
+        """
+        Run func as the current run of the thread and return its result, or None if
+        the run was superseded by a newer one before it finished.
+        """
+        run = ThreadRun(thread_id, [prompt] if prompt else [])
+        previous = self._runs.get(thread_id)
+        if previous is not None:
+            previous.superseded = True
+            if not previous.started:
+                run.prompts[:0] = previous.prompts
+            if previous.task is not None:
+                previous.task.cancel()
+            self._superseded += 1
+            logger.info(f"Cancelling the previous run of thread {thread_id}")
+        self._runs[thread_id] = run
+
+        self._lock_users[thread_id] += 1
+        lock = self._locks.setdefault(thread_id, asyncio.Lock())
+
+        async def run_locked() -> T:
+            async with lock:
+                return await func(run)
+
+        run.task = asyncio.ensure_future(run_locked())
+        try:
+            return await run.task
+        except asyncio.CancelledError:
+            # Only swallow our own cancellation, not one of the caller's task
+            if run.superseded and run.task.cancelled():
+                return None
+            raise
+        finally:
+            if self._runs.get(thread_id) is run:
+                del self._runs[thread_id]
+            self._lock_users[thread_id] -= 1
+            if not self._lock_users[thread_id]:
+                del self._lock_users[thread_id]
+                del self._locks[thread_id]
+
+    def stats(self) -> dict[str, int]:
+        return {"active": len(self._runs), "superseded": self._superseded}
+
+
+thread_runs = ThreadRunTracker()
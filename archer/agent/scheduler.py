@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import time
+from collections import Counter, OrderedDict, deque
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from archer.env import AGENT_MAX_CONCURRENT_RUNS, AGENT_MAX_RUNS_PER_USER
+
+logger = logging.getLogger(__name__)
+
+# Called with the 1-based queue position of a run when it is queued and when it moves up,
+# and with 0 when the run leaves the queue and starts
+QueuedCallback = Callable[[int], Awaitable[None]]
+
+
+@dataclass
+class _Ticket:
+    user_id: str
+    workspace_id: str
+    on_queued: QueuedCallback | None
+    future: asyncio.Future = field(
+        default_factory=lambda: asyncio.get_running_loop().create_future()
+    )
+    queued_at: float = field(default_factory=time.monotonic)
+    position: int | None = None
+
+
+class AgentScheduler:
+    """
+    Admission control for agent runs.
+
+    At most `max_concurrency` runs execute at once in the process, and at most
+    `max_per_user` for any one user. Runs beyond that wait in a queue that is
+    served round-robin across workspaces, and across the users of each workspace,
+    so a burst from one user or workspace can't starve the others. Waiting runs
+    are told their position so the user can be shown it.
+    """
+
+    def __init__(self, max_concurrency: int, max_per_user: int):
+        self.max_concurrency = max_concurrency
+        self.max_per_user = max_per_user
+
+        self._running = 0
+        self._running_by_user: Counter[str] = Counter()
+        # workspace -> user -> tickets; dict order is the round-robin order
+        self._queues: OrderedDict[str, OrderedDict[str, deque[_Ticket]]] = OrderedDict()
+        self._notifications: set[asyncio.Task] = set()
+
+        self._queued_total = 0
+        self._started_from_queue = 0
+        self._max_queue_depth = 0
+        self._wait_seconds = 0.0
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        user_id: str,
+        workspace_id: str | None = None,
+        on_queued: QueuedCallback | None = None,
+    ) -> AsyncIterator[None]:
+        """
+        Wait for a free slot for the user's run and hold it for the duration of the block.
+        """
+        await self._acquire(user_id, workspace_id or "", on_queued)
+        try:
+            yield
+        finally:
+            self._release(user_id)
+
+    def _can_run(self, user_id: str) -> bool:
+        return (
+            self._running < self.max_concurrency
+            and self._running_by_user[user_id] < self.max_per_user
+        )
+
+    def _start(self, user_id: str) -> None:
+        self._running += 1
+        self._running_by_user[user_id] += 1
+
+    async def _acquire(
+        self, user_id: str, workspace_id: str, on_queued: QueuedCallback | None
+    ) -> None:
+        if self._can_run(user_id):
+            self._start(user_id)
+            return
+
+        ticket = _Ticket(user_id, workspace_id, on_queued)
+        self._queues.setdefault(workspace_id, OrderedDict()).setdefault(user_id, deque()).append(
+            ticket
+        )
+        self._queued_total += 1
+        self._max_queue_depth = max(self._max_queue_depth, self.queue_depth)
+        logger.info(f"Queued agent run for {user_id}, {self.queue_depth} runs waiting")
+        self._notify_positions()
+
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                # The slot was granted just before the cancellation
+                self._release(user_id)
+            else:
+                self._remove(ticket)
+                self._notify_positions()
+            raise
+
+    def _release(self, user_id: str) -> None:
+        self._running -= 1
+        self._running_by_user[user_id] -= 1
+        if self._running_by_user[user_id] <= 0:
+            del self._running_by_user[user_id]
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        dispatched = False
+        while self._running < self.max_concurrency:
+            ticket = self._next_ticket()
+            if ticket is None:
+                break
+            if ticket.future.cancelled():
+                continue
+            self._start(ticket.user_id)
+            self._started_from_queue += 1
+            self._wait_seconds += time.monotonic() - ticket.queued_at
+            ticket.future.set_result(None)
+            if ticket.on_queued is not None:
+                self._schedule_notification(ticket, 0)
+            dispatched = True
+        if dispatched:
+            self._notify_positions()
+
+    def _next_ticket(self) -> _Ticket | None:
+        for workspace_id, users in self._queues.items():
+            for user_id, tickets in users.items():
+                if self._running_by_user[user_id] >= self.max_per_user:
+                    continue
+                ticket = tickets.popleft()
+                # Rotate so the next pick comes from another user and workspace
+                if tickets:
+                    users.move_to_end(user_id)
+                else:
+                    del users[user_id]
+                if users:
+                    self._queues.move_to_end(workspace_id)
+                else:
+                    del self._queues[workspace_id]
+                return ticket
+        return None
+
+    def _remove(self, ticket: _Ticket) -> None:
+        users = self._queues.get(ticket.workspace_id, {})
+        tickets = users.get(ticket.user_id)
+        if tickets is None or ticket not in tickets:
+            return
+        tickets.remove(ticket)
+        if not tickets:
+            del users[ticket.user_id]
+        if not users:
+            del self._queues[ticket.workspace_id]
+
+    def _dispatch_order(self) -> list[_Ticket]:
+        """
+        Return the waiting tickets in the order they would be started.
+        """
+        workspaces = deque(
+            deque(deque(tickets) for tickets in users.values()) for users in self._queues.values()
+        )
+        order = []
+        while workspaces:
+            users = workspaces.popleft()
+            tickets = users.popleft()
+            order.append(tickets.popleft())
+            if tickets:
+                users.append(tickets)
+            if users:
+                workspaces.append(users)
+        return order
+
+    def _notify_positions(self) -> None:
+        for position, ticket in enumerate(self._dispatch_order(), start=1):
+            if ticket.on_queued is None or ticket.position == position:
+                continue
+            ticket.position = position
+            self._schedule_notification(ticket, position)
+
+    def _schedule_notification(self, ticket: _Ticket, position: int) -> None:
+        task = asyncio.get_running_loop().create_task(self._notify(ticket, position))
+        self._notifications.add(task)
+        task.add_done_callback(self._notifications.discard)
+
+    async def _notify(self, ticket: _Ticket, position: int) -> None:
+        try:
+            await ticket.on_queued(position)
+        except Exception:
+            logger.exception("Failed to report the queue position")
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(tickets) for users in self._queues.values() for tickets in users.values())
+
+    def stats(self) -> dict:
+        return {
+            "running": self._running,
+            "queued": self.queue_depth,
+            "max_concurrency": self.max_concurrency,
+            "queued_by_workspace": {
+                workspace_id: sum(len(tickets) for tickets in users.values())
+                for workspace_id, users in self._queues.items()
+            },
+            "max_queue_depth": self._max_queue_depth,
+            "queued_total": self._queued_total,
+            "average_wait_seconds": (
+                self._wait_seconds / self._started_from_queue if self._started_from_queue else 0.0
+            ),
+        }
+
+
+scheduler = AgentScheduler(
+    max_concurrency=AGENT_MAX_CONCURRENT_RUNS, max_per_user=AGENT_MAX_RUNS_PER_USER
+)
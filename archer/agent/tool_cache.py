@@ -0,0 +1,145 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import StructuredTool
+
+from archer.defaults import (
+    TOOL_CACHE_ALLOWLIST,
+    TOOL_CACHE_TTLS,
+    USER_SCOPED_TOOLKITS,
+)
+from archer.env import TOOL_CACHE_ENABLED, TOOL_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+
+def get_toolkit(tool_name: str) -> str:
+    return tool_name.split("_")[0]
+
+
+class ToolResponseCache:
+    """
+    LRU cache of the responses of read-only tools.
+
+    Only tools matching TOOL_CACHE_ALLOWLIST are cached, for the TTL of their
+    toolkit in TOOL_CACHE_TTLS. Responses of toolkits in USER_SCOPED_TOOLKITS are
+    cached per user; the others (public data such as web search) are shared by
+    all users. When a user runs a tool of a user-scoped toolkit that is not
+    cacheable (one that may change data, such as sending an email), that user's
+    cached responses of the toolkit are dropped. Shared responses are only dropped
+    when they expire.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[tuple, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict[str, int]] = {}
+
+    def is_cacheable(self, tool_name: str) -> bool:
+        return get_toolkit(tool_name) in TOOL_CACHE_TTLS and any(
+            fnmatchcase(tool_name, pattern) for pattern in TOOL_CACHE_ALLOWLIST
+        )
+
+    def key(self, tool_name: str, args: dict, user_id: str | None) -> tuple:
+        # Arguments left at None are the same call as arguments not given
+        normalized = json.dumps(
+            {name: value for name, value in args.items() if value is not None},
+            sort_keys=True,
+            default=str,
+        )
+        toolkit = get_toolkit(tool_name)
+        scope = user_id if toolkit in USER_SCOPED_TOOLKITS else None
+        return (toolkit, scope, tool_name, normalized)
+
+    def get(self, key: tuple) -> tuple[bool, Any]:
+        """Return (True, response) on a hit, (False, None) on a miss."""
+        tool_name = key[2]
+        with self._lock:
+            stats = self._stats.setdefault(tool_name, {"hits": 0, "misses": 0})
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                stats["hits"] += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            stats["misses"] += 1
+            return False, None
+
+    def put(self, key: tuple, response: Any) -> None:
+        expires_at = time.monotonic() + TOOL_CACHE_TTLS[key[0]]
+        with self._lock:
+            self._entries[key] = (expires_at, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, toolkit: str, user_id: str | None) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == toolkit and key[1] == user_id]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            tools = {tool_name: dict(stats) for tool_name, stats in self._stats.items()}
+            size = len(self._entries)
+        return {
+            "hits": sum(stats["hits"] for stats in tools.values()),
+            "misses": sum(stats["misses"] for stats in tools.values()),
+            "size": size,
+            "tools": tools,
+        }
+
+
+tool_cache = ToolResponseCache(maxsize=TOOL_CACHE_MAX_ENTRIES)
+
+
+def with_response_cache(
+    tool: StructuredTool, cache: ToolResponseCache = tool_cache
+) -> StructuredTool:
+    """
+    Return a copy of an Arcade tool that serves its responses from the cache when
+    it is cacheable, or that invalidates the user's cached responses of its toolkit
+    when it is not and the toolkit is user-scoped.
+    """
+    if not TOOL_CACHE_ENABLED or get_toolkit(tool.name) not in TOOL_CACHE_TTLS:
+        return tool
+
+    func = tool.func
+    toolkit = get_toolkit(tool.name)
+
+    if not cache.is_cacheable(tool.name):
+        # A user can only change their own data, so the responses of shared toolkits
+        # are never invalidated: one user's calls must not clear the cache of all users
+        if toolkit not in USER_SCOPED_TOOLKITS:
+            return tool
+
+        def run_and_invalidate(config: RunnableConfig, **kwargs: Any) -> Any:
+            user_id = config.get("configurable", {}).get("user_id")
+            try:
+                return func(config=config, **kwargs)
+            finally:
+                cache.invalidate(toolkit, user_id)
+
+        return tool.model_copy(update={"func": run_and_invalidate})
+
+    def run_cached(config: RunnableConfig, **kwargs: Any) -> Any:
+        key = cache.key(tool.name, kwargs, config.get("configurable", {}).get("user_id"))
+        hit, response = cache.get(key)
+        if hit:
+            logger.info(f"Serving {tool.name} from the tool response cache")
+            return response
+        response = func(config=config, **kwargs)
+        # Errors (including missing authorization) are not cached
+        if not (isinstance(response, dict) and "error" in response):
+            cache.put(key, response)
+        return response
+
+    return tool.model_copy(update={"func": run_cached})
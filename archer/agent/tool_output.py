@@ -0,0 +1,229 @@
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from html.parser import HTMLParser
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import StructuredTool
+
+from archer.agent.redaction import redact
+from archer.defaults import get_tool_output_limit
+from archer.env import TOOL_OUTPUT_TTL_SECONDS
+from archer.storage.functions import get_store
+from archer.storage.schema import StorageResourceError
+
+logger = logging.getLogger(__name__)
+
+FETCH_TOOL_NAME = "FetchToolOutput"
+
+HANDLE_PREFIX = "tool-output-"
+HANDLE_PATTERN = re.compile(rf"{HANDLE_PREFIX}[0-9a-f]{{32}}")
+
+# Seconds between two passes deleting the expired outputs
+PURGE_INTERVAL_SECONDS = 60 * 60
+
+# Keys of tool results (mostly email metadata) that take a lot of tokens and are
+# almost never needed to answer the user
+DROPPED_KEYS = frozenset({
+    "headers",
+    "raw",
+    "payload",
+    "label_ids",
+    "labelids",
+    "history_id",
+    "historyid",
+    "internal_date",
+    "internaldate",
+    "size_estimate",
+    "sizeestimate",
+    "mime_type",
+    "mimetype",
+})
+
+HTML_PATTERN = re.compile(r"<(?:html|body|div|p|br|table|span|a)\b", re.IGNORECASE)
+
+
+class _HTMLTextExtractor(HTMLParser):
+    SKIPPED_TAGS = frozenset({"script", "style", "head", "noscript", "svg"})
+    BLOCK_TAGS = frozenset("p div br li tr h1 h2 h3 h4 h5 h6 section article".split())
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.parts: list[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag in self.SKIPPED_TAGS:
+            self._skipping += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self.SKIPPED_TAGS and self._skipping:
+            self._skipping -= 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data: str) -> None:
+        if not self._skipping:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """
+    Return the readable text of an HTML document, without scripts, styles and markup.
+    """
+    parser = _HTMLTextExtractor()
+    parser.feed(html)
+    parser.close()
+    text = re.sub(r"[ \t\r\f\v]+", " ", "".join(parser.parts))
+    return re.sub(r"\s*\n\s*", "\n", text).strip()
+
+
+def extract_relevant(value):
+    """
+    Strip a decoded tool result down to what the model needs: HTML strings become
+    text and email headers and similar metadata are dropped.
+    """
+    if isinstance(value, dict):
+        return {
+            key: extract_relevant(item)
+            for key, item in value.items()
+            if key.lower() not in DROPPED_KEYS
+        }
+    if isinstance(value, list):
+        return [extract_relevant(item) for item in value]
+    if isinstance(value, str) and HTML_PATTERN.search(value):
+        return html_to_text(value)
+    return value
+
+
+def extract_text(content: str) -> str:
+    try:
+        value = json.loads(content)
+    except ValueError:
+        return html_to_text(content) if HTML_PATTERN.search(content) else content
+    if not isinstance(value, dict | list):
+        return content
+    return json.dumps(extract_relevant(value), ensure_ascii=False, separators=(",", ":"))
+
+
+class ToolOutputProcessor:
+    """
+    Shrinks tool results before they are added to the conversation.
+
+    Every later model call of the thread re-sends the tool results, so each result is
+    reduced to its relevant parts, redacted if REDACTION_ENABLED is set, and capped
+    to the limit of its tool (see TOOL_OUTPUT_LIMITS in archer.defaults). When a
+    result is cut, the full text is saved in the state store behind a handle, which
+    the model can read in pages with the FetchToolOutput tool if it needs more.
+    Saved outputs expire after TOOL_OUTPUT_TTL_SECONDS and are deleted by a pass
+    that runs at most every PURGE_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, ttl_seconds: float = TOOL_OUTPUT_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._purged_at = 0.0
+        self._purge_lock = threading.Lock()
+
+    def purge_expired(self) -> None:
+        """
+        Delete the saved outputs older than the TTL, unless another pass ran recently.
+        """
+        now = time.time()
+        with self._purge_lock:
+            if now - self._purged_at < PURGE_INTERVAL_SECONDS:
+                return
+            self._purged_at = now
+        try:
+            deleted = get_store().delete_agent_states(HANDLE_PREFIX, now - self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Could not delete expired tool outputs: {e}")
+            return
+        if deleted:
+            logger.info(f"Deleted {deleted} expired tool outputs")
+
+    def process(self, message: ToolMessage, user_id: str | None) -> ToolMessage:
+        """
+        Return the message with its content reduced, or the message itself if it is
+        already small and clean.
+        """
+        if message.name == FETCH_TOOL_NAME or not isinstance(message.content, str):
+            return message
+
+        text = redact(extract_text(message.content))
+        limit = get_tool_output_limit(message.name or "")
+        if len(text) > limit:
+            handle = f"{HANDLE_PREFIX}{uuid.uuid4().hex}"
+            get_store().save_agent_state(
+                handle,
+                {
+                    "user_id": user_id,
+                    "tool_name": message.name,
+                    "content": text,
+                    "expires_at": time.time() + self.ttl_seconds,
+                },
+            )
+            logger.info(
+                f"Stored {len(text)} characters of {message.name} output as {handle}, "
+                f"kept {limit}"
+            )
+            text = (
+                f"{text[:limit]}\n[Output truncated, {len(text) - limit} more characters. "
+                f'Call {FETCH_TOOL_NAME} with handle "{handle}" and offset {limit} '
+                "to read more.]"
+            )
+            self.purge_expired()
+
+        if text == message.content:
+            return message
+        return message.model_copy(update={"content": text})
+
+
+def fetch_tool_output(handle: str, offset: int = 0, *, config: RunnableConfig) -> str:
+    """
+    Read more of a tool output that was truncated, starting at the given character offset.
+    """
+    # The handle comes from the model, so it must not be able to name any other state
+    if not HANDLE_PATTERN.fullmatch(handle):
+        return f"Error: invalid tool output handle {handle!r}"
+    if offset < 0:
+        return f"Error: invalid offset {offset}, it must be 0 or more"
+
+    user_id = config.get("configurable", {}).get("user_id")
+    try:
+        stored = get_store().get_agent_state(handle)
+    except StorageResourceError:
+        stored = None
+    if (
+        not stored
+        or stored.get("user_id") != user_id
+        or stored.get("expires_at", float("inf")) < time.time()
+    ):
+        return f"Error: no tool output found for handle {handle!r}"
+
+    content = stored["content"]
+    limit = get_tool_output_limit(stored.get("tool_name") or "")
+    end = offset + limit
+    page = content[offset:end]
+    if end < len(content):
+        page += (
+            f"\n[{len(content) - end} more characters. "
+            f'Call {FETCH_TOOL_NAME} with handle "{handle}" and offset {end} to read more.]'
+        )
+    return page
+
+
+def create_fetch_tool() -> StructuredTool:
+    return StructuredTool.from_function(
+        func=fetch_tool_output,
+        name=FETCH_TOOL_NAME,
+        description=(
+            "Read more of a tool output that was truncated. "
+            "Pass the handle and offset given at the end of the truncated output."
+        ),
+    )
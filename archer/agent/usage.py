@@ -0,0 +1,64 @@
+import threading
+
+from langchain_core.messages.ai import UsageMetadata
+
+from archer.agent.context import FittedContext
+
+
+class TokenUsageStats:
+    """
+    Accumulates the token usage reported by the model provider, per model.
+
+    `cached_input_tokens` counts the prompt tokens the provider served from its
+    prompt cache, so comparing it with `input_tokens` shows how often the static
+    prefix of the prompt (system prompt and tool schemas) is reused.
+    The context counters show how much of the conversation had to be cut to fit
+    the model's token budget.
+    """
+
+    def __init__(self) -> None:
+        self._usage: dict[str, dict[str, int]] = {}
+        self._context: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, usage: UsageMetadata | None) -> None:
+        if not usage:
+            return
+        cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+        with self._lock:
+            totals = self._usage.setdefault(
+                model,
+                {"requests": 0, "input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0},
+            )
+            totals["requests"] += 1
+            totals["input_tokens"] += usage.get("input_tokens", 0)
+            totals["cached_input_tokens"] += cached
+            totals["output_tokens"] += usage.get("output_tokens", 0)
+
+    def record_context(self, model: str, context: FittedContext) -> None:
+        with self._lock:
+            totals = self._context.setdefault(
+                model,
+                {
+                    "calls": 0,
+                    "context_tokens": 0,
+                    "max_context_tokens": 0,
+                    "dropped_messages": 0,
+                    "truncated_tool_messages": 0,
+                },
+            )
+            totals["calls"] += 1
+            totals["context_tokens"] += context.tokens
+            totals["max_context_tokens"] = max(totals["max_context_tokens"], context.tokens)
+            totals["dropped_messages"] += context.dropped
+            totals["truncated_tool_messages"] += context.truncated
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        with self._lock:
+            return {
+                model: {**self._usage.get(model, {}), **self._context.get(model, {})}
+                for model in {*self._usage, *self._context}
+            }
+
+
+token_usage = TokenUsageStats()
@@ -1,13 +1,7 @@
 import re
+from collections.abc import Callable
 
-from archer.env import (
-    REDACT_CREDIT_CARD_PATTERN,
-    REDACT_EMAIL_PATTERN,
-    REDACT_PHONE_PATTERN,
-    REDACT_SSN_PATTERN,
-    REDACT_USER_DEFINED_PATTERN,
-    REDACTION_ENABLED,
-)
+from archer.agent.redaction import redact
 
 
 def redact_string(input_string: str) -> str:
@@ -20,66 +14,106 @@ def redact_string(input_string: str) -> str:
     Returns:
         - str: the redacted string
     """
-    output_string = input_string
-    if REDACTION_ENABLED:
-        output_string = re.sub(REDACT_EMAIL_PATTERN, "[EMAIL]", output_string)
-        output_string = re.sub(REDACT_CREDIT_CARD_PATTERN, "[CREDIT CARD]", output_string)
-        output_string = re.sub(REDACT_PHONE_PATTERN, "[PHONE]", output_string)
-        output_string = re.sub(REDACT_SSN_PATTERN, "[SSN]", output_string)
-        output_string = re.sub(REDACT_USER_DEFINED_PATTERN, "[REDACTED]", output_string)
+    return redact(input_string)
+
+
+# Spans whose content is never reformatted: code blocks, inline code and Slack
+# entities (user and channel mentions, special mentions and links)
+_PROTECTED_PATTERN = re.compile(
+    r"(?s)(`(?:``.+?```|[^`\n]+?`)"
+    r"|<(?:[@#!][^>|\s]*(?:\|[^>\n]*)?|(?:https?|mailto):[^>|\s]+(?:\|[^>\n]*)?)>)"
+)
 
-    return output_string
+Format = tuple[str, re.Pattern[str], Callable[[re.Match[str]], str]]
+
+
+def _enclose(opening: str, closing: str | None = None) -> Callable[[re.Match[str]], str]:
+    """
+    Return a replacement that puts the first group of a match between new delimiters.
+    """
+    # Faster than a template such as r"**\1**", which is expanded in Python per match
+    closing = opening if closing is None else closing
+    return lambda match: f"{opening}{match[1]}{closing}"
+
+
+def _apply_formats(text: str, formats: list[Format]) -> str:
+    # Each substitution runs on the result of the previous ones, and is skipped
+    # when the text lacks the characters its matches start with
+    for trigger, pattern, replacement in formats:
+        if trigger in text:
+            text = pattern.sub(replacement, text)
+    return text
+
+
+def _convert(content: str, formats: list[Format]) -> str:
+    """
+    Apply the formats to the text outside protected spans, which are kept as they are.
+    """
+    if "`" not in content and "<" not in content:
+        # Nothing is protected
+        return _apply_formats(content, formats)
+
+    # Text and protected spans alternate. Text starting with a backtick that does
+    # not open a code span is left as is, like code.
+    pieces = _PROTECTED_PATTERN.split(content)
+    for index in range(0, len(pieces), 2):
+        if not pieces[index].startswith("`"):
+            pieces[index] = _apply_formats(pieces[index], formats)
+    return "".join(pieces)
 
 
 # Conversion from Slack mrkdwn to Markdown
 # See also: https://api.slack.com/reference/surfaces/formatting#basics
+_SLACK_FORMATS: list[Format] = [
+    # *bold* to **bold**
+    ("*", re.compile(r"\*(?!\s)([^\*\n]+?)(?<!\s)\*"), _enclose("**")),
+    # _italic_ to *italic*
+    ("_", re.compile(r"_(?!\s)([^_\n]+?)(?<!\s)_"), _enclose("*")),
+    # ~strike~ to ~~strike~~
+    ("~", re.compile(r"~(?!\s)([^~\n]+?)(?<!\s)~"), _enclose("~~")),
+]
+
+
 def slack_to_markdown(content: str) -> str:
-    # Split the input string into parts based on code blocks and inline code
-    parts = re.split(r"(?s)(```.+?```|`[^`\n]+?`)", content)
-
-    # Apply the bold, italic, and strikethrough formatting to text not within code
-    result = ""
-    for part in parts:
-        if part.startswith("```") or part.startswith("`"):
-            result += part
-        else:
-            for o, n in [
-                (r"\*(?!\s)([^\*\n]+?)(?<!\s)\*", r"**\1**"),  # *bold* to **bold**
-                (r"_(?!\s)([^_\n]+?)(?<!\s)_", r"*\1*"),  # _italic_ to *italic*
-                (r"~(?!\s)([^~\n]+?)(?<!\s)~", r"~~\1~~"),  # ~strike~ to ~~strike~~
-            ]:
-                part = re.sub(o, n, part)
-            result += part
-    return result
+    """
+    Convert Slack mrkdwn to Markdown.
+
+    Bold, italic and strikethrough are converted outside of code. Slack entities
+    (mentions and links) are kept as they are, so the model can use them.
+    """
+    return _convert(content, _SLACK_FORMATS)
 
 
 # Conversion from Markdown to Slack mrkdwn
 # See also: https://api.slack.com/reference/surfaces/formatting#basics
+#
+# The order matters: bold italic is converted before italic, and bold after
+# italic so that bold text may contain italics.
+_MARKDOWN_FORMATS: list[Format] = [
+    # ***bold italic*** to _*bold italic*_
+    ("***", re.compile(r"\*\*\*(?!\s)([^\*\n]+?)(?<!\s)\*\*\*"), _enclose("_*", "*_")),
+    # *italic* to _italic_
+    ("*", re.compile(r"(?<![\*_])\*(?!\s)([^\*\n]+?)(?<!\s)\*(?![\*_])"), _enclose("_")),
+    # **bold** to *bold*
+    ("**", re.compile(r"\*\*(?!\s)([^\*\n]+?)(?<!\s)\*\*"), _enclose("*")),
+    # __bold__ to *bold*
+    ("__", re.compile(r"__(?!\s)([^_\n]+?)(?<!\s)__"), _enclose("*")),
+    # ~~strike~~ to ~strike~
+    ("~~", re.compile(r"~~(?!\s)([^~\n]+?)(?<!\s)~~"), _enclose("~")),
+    # [text](url) to <url|text>
+    (
+        "](",
+        re.compile(r"\[([^\]]+)\]\(([^)]+)\)"),
+        lambda match: f"<{match[2]}|{match[1]}>",
+    ),
+]
+
+
 def markdown_to_slack(content: str) -> str:
-    # Split the input string into parts based on code blocks and inline code
-    parts = re.split(r"(?s)(```.+?```|`[^`\n]+?`)", content)
-
-    # Apply the bold, italic, and strikethrough formatting to text not within code
-    result = ""
-    for part in parts:
-        if part.startswith("```") or part.startswith("`"):
-            result += part
-        else:
-            for o, n in [
-                (
-                    r"\*\*\*(?!\s)([^\*\n]+?)(?<!\s)\*\*\*",
-                    r"_*\1*_",
-                ),  # ***bold italic*** to *_bold italic_*
-                (
-                    r"(?<![\*_])\*(?!\s)([^\*\n]+?)(?<!\s)\*(?![\*_])",
-                    r"_\1_",
-                ),  # *italic* to _italic_
-                (r"\*\*(?!\s)([^\*\n]+?)(?<!\s)\*\*", r"*\1*"),  # **bold** to *bold*
-                (r"__(?!\s)([^_\n]+?)(?<!\s)__", r"*\1*"),  # __bold__ to *bold*
-                (r"~~(?!\s)([^~\n]+?)(?<!\s)~~", r"~\1~"),  # ~~strike~~ to ~strike~
-                # Add pattern for Markdown links
-                (r"\[([^\]]+)\]\(([^)]+)\)", r"<\2|\1>"),  # [text](url) to <url|text>
-            ]:
-                part = re.sub(o, n, part)
-            result += part
-    return result
+    """
+    Convert Markdown to Slack mrkdwn.
+
+    Bold, italic, strikethrough and links are converted outside of code. Slack
+    entities already in the text (mentions and links) are kept as they are.
+    """
+    return _convert(content, _MARKDOWN_FORMATS)
@@ -1,3 +1,4 @@
+from archer.env import TOOL_OUTPUT_MAX_CHARS, TOOL_TIMEOUT_SECONDS
 from archer.utils import get_formatted_times
 
 MENTION_WITHOUT_TEXT = """
@@ -7,6 +8,10 @@ Hi there! You didn't provide a message with your mention.
 
 INITIAL_GREETING = "Hi! I'm Archer! How can I help you today?"
 DEFAULT_LOADING_TEXT = "working on it..."
+# Seconds between updates of a queued message's position shown in the assistant status
+QUEUE_STATUS_INTERVAL_SECONDS = 5
+# Earlier messages of a thread sent as context when the agent has no state for it
+THREAD_HISTORY_LIMIT = 10
 
 SYSTEM_CONTENT = """
 You are a versatile AI assistant named Archer. You were created by Arcade AI.
@@ -27,10 +32,8 @@ order to provide the best possible assistance to the user. Ensure that you are u
 right tools for the right tasks.
 
 When discussing times or scheduling, be aware of the user's potential time zone
-and provide relevant time conversions when appropriate.
-
-Current times around the world:
-{current_times}
+and provide relevant time conversions when appropriate. The current times around
+the world are given in the last message of the conversation.
 
 Be professional and friendly.
 Don't ask for clarification unless absolutely necessary.
@@ -38,9 +41,56 @@ Don't ask questions in your response.
 Don't use user names in your response.
 """
 
+# Kept out of SYSTEM_CONTENT so the system prompt (and the tool schemas sent before it)
+# stays byte-identical across requests and can be served from the provider's prompt cache.
+CURRENT_TIMES_CONTENT = """
+Current times around the world:
+{current_times}
+"""
+
 
 TOOLKITS = ["github", "google", "search", "web"]
 
+# Characters of a tool's output that are added to the conversation, by tool name
+# or toolkit (the part of the name before "_"). Longer outputs are truncated and
+# the rest can be fetched by the model on demand.
+TOOL_OUTPUT_LIMITS = {
+    "Web": 8000,
+    "Google": 12000,
+}
+
+# Read-only tools whose responses may be cached (fnmatch patterns of tool names)
+TOOL_CACHE_ALLOWLIST = [
+    "Search_*",
+    "Web_ScrapeUrl",
+    "Github_Get*",
+    "Github_List*",
+    "Google_Get*",
+    "Google_List*",
+    "Google_Search*",
+]
+
+# Seconds a cached tool response is served, by toolkit. Toolkits not listed are never cached.
+TOOL_CACHE_TTLS = {
+    "Search": 10 * 60,
+    "Web": 15 * 60,
+    "Github": 2 * 60,
+    "Google": 60,
+}
+
+# Toolkits that act on the user's own account, whose responses are cached per user
+USER_SCOPED_TOOLKITS = ["Github", "Google"]
+
+# Toolkits that only read public data. Responses of runs that called no other tools
+# can be shared between users by the response cache.
+PUBLIC_TOOLKITS = ["Search", "Web"]
+
+# Seconds a tool call may take, by tool name or toolkit, before it is reported as failed
+TOOL_TIMEOUTS = {
+    "Web": 60,
+    "Search": 20,
+}
+
 MODELS = {
     "o3-mini": {
         "name": "o3-mini",
@@ -63,12 +113,16 @@ MODELS = {
 }
 
 
-def get_system_prompt(
+def get_system_prompt() -> str:
+    return SYSTEM_CONTENT
+
+
+def get_current_times_prompt(
     user_timezone: str | None = None,
 ) -> str:
     # Get formatted times for all major time zones
     current_times = get_formatted_times(user_timezone)
-    return SYSTEM_CONTENT.format(current_times=current_times)
+    return CURRENT_TIMES_CONTENT.format(current_times=current_times)
 
 
 def get_available_models() -> dict[str, dict[str, str | int]]:
@@ -77,3 +131,13 @@ def get_available_models() -> dict[str, dict[str, str | int]]:
 
 def get_available_toolkits() -> list[str]:
     return TOOLKITS
+
+
+def get_tool_timeout(tool_name: str) -> float:
+    toolkit = tool_name.split("_")[0]
+    return TOOL_TIMEOUTS.get(tool_name, TOOL_TIMEOUTS.get(toolkit, TOOL_TIMEOUT_SECONDS))
+
+
+def get_tool_output_limit(tool_name: str) -> int:
+    toolkit = tool_name.split("_")[0]
+    return TOOL_OUTPUT_LIMITS.get(tool_name, TOOL_OUTPUT_LIMITS.get(toolkit, TOOL_OUTPUT_MAX_CHARS))
@@ -1,12 +1,118 @@
 import os
 
+
+def _flag(name: str, default: bool) -> bool:
+    """
+    Read a boolean setting, accepting the usual spellings of true and false.
+    Unknown values raise instead of silently turning the setting off.
+    """
+    value = os.environ.get(name, "").strip().lower()
+    if not value:
+        return default
+    if value in ("1", "true", "yes", "on", "enabled"):
+        return True
+    if value in ("0", "false", "no", "off", "disabled"):
+        return False
+    raise ValueError(f"{name} must be true or false, got {os.environ[name]!r}")
+
+
 # High level constants
 
 BOT_NAME = "Archer"
 STORAGE_TYPE = os.environ.get("STORAGE_TYPE", "file")
 FILE_STORAGE_BASE_DIR = os.environ.get("FILE_STORAGE_BASE_DIR", "./data")
+# Flush each file the FileStore writes to disk before it replaces the old one
+FILE_STORAGE_FSYNC = os.environ.get("FILE_STORAGE_FSYNC", "true").lower() == "true"
+# Seconds a cached user state is trusted before it is checked against the store's version
+USER_CACHE_TTL_SECONDS = float(os.environ.get("USER_CACHE_TTL_SECONDS", 30))
+
+# Conversation checkpoints: "memory" (bounded, in-process), "sqlite" (on FILE_STORAGE_BASE_DIR,
+# for a single process) or "postgres" (at DATABASE_URL, shared by every replica)
+CHECKPOINT_TYPE = os.environ.get("CHECKPOINT_TYPE", "memory")
+CHECKPOINT_TTL_SECONDS = int(os.environ.get("CHECKPOINT_TTL_SECONDS", 7 * 24 * 60 * 60))
+CHECKPOINT_MAX_THREADS = int(os.environ.get("CHECKPOINT_MAX_THREADS", 10000))
+CHECKPOINT_KEEP_LAST = int(os.environ.get("CHECKPOINT_KEEP_LAST", 2))
+CHECKPOINT_CACHE_SIZE = int(os.environ.get("CHECKPOINT_CACHE_SIZE", 256))
+
+# Postgres database used by the "postgres" stores, and the connections each process opens
+DATABASE_URL = os.environ.get("DATABASE_URL", "")
+DATABASE_POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", 10))
+
+# Journal mode of the SQLite databases on FILE_STORAGE_BASE_DIR. WAL needs memory shared
+# by the processes using a database, so it only works on a local disk; use DELETE on
+# network storage such as a Modal volume.
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL").upper()
+
+# Slack event de-duplication: "memory" (per process), "sqlite" (shared by the processes of
+# one host, on FILE_STORAGE_BASE_DIR) or "postgres" (at DATABASE_URL, shared by every replica)
+DEDUP_STORE_TYPE = os.environ.get("DEDUP_STORE_TYPE", "sqlite")
+DEDUP_TTL_SECONDS = int(os.environ.get("DEDUP_TTL_SECONDS", 60 * 60))
+
+# Comma separated list of models whose agents are built in the background at startup
+AGENT_WARMUP_MODELS = [
+    model.strip()
+    for model in os.environ.get("AGENT_WARMUP_MODELS", "gpt-4o").split(",")
+    if model.strip()
+]
+
+# Seconds between background refreshes of the tool definitions, 0 to disable
+AGENT_TOOL_REFRESH_SECONDS = float(os.environ.get("AGENT_TOOL_REFRESH_SECONDS", 3600))
+
+# Seconds a completed Arcade authorization is trusted before it is checked again, and
+# the most (user, tool) pairs remembered
+AUTH_CACHE_TTL_SECONDS = int(os.environ.get("AUTH_CACHE_TTL_SECONDS", 15 * 60))
+AUTH_CACHE_MAX_ENTRIES = int(os.environ.get("AUTH_CACHE_MAX_ENTRIES", 10000))
+
+# Agent runs executing at once in the process, and per user; the others wait in a fair queue
+AGENT_MAX_CONCURRENT_RUNS = int(os.environ.get("AGENT_MAX_CONCURRENT_RUNS", 8))
+AGENT_MAX_RUNS_PER_USER = int(os.environ.get("AGENT_MAX_RUNS_PER_USER", 1))
+
+# Stream responses into Slack, updating the message at most once per interval
+STREAMING_ENABLED = os.environ.get("STREAMING_ENABLED", "true").lower() == "true"
+STREAM_UPDATE_INTERVAL_SECONDS = float(os.environ.get("STREAM_UPDATE_INTERVAL_SECONDS", 1.0))
 
-REDACTION_ENABLED = bool(os.environ.get("REDACTION_ENABLED", False))
+# Bind only the tools relevant to each turn instead of every toolkit's tools (opt-in, check
+# benchmarks/tool_routing.py for how often the needed tools are kept)
+TOOL_ROUTING_ENABLED = os.environ.get("TOOL_ROUTING_ENABLED", "false").lower() == "true"
+TOOL_ROUTING_MAX_TOOLS = int(os.environ.get("TOOL_ROUTING_MAX_TOOLS", 12))
+
+# Share of the model's context window the conversation may use, and the longest tool output kept
+CONTEXT_BUDGET_FRACTION = float(os.environ.get("CONTEXT_BUDGET_FRACTION", 0.75))
+CONTEXT_TOOL_MESSAGE_MAX_TOKENS = int(os.environ.get("CONTEXT_TOOL_MESSAGE_MAX_TOKENS", 8000))
+
+# Characters of a tool's output added to the conversation, unless archer.defaults sets a limit
+TOOL_OUTPUT_MAX_CHARS = int(os.environ.get("TOOL_OUTPUT_MAX_CHARS", 16000))
+
+# Seconds the full text of a truncated tool output can be fetched before it is deleted
+TOOL_OUTPUT_TTL_SECONDS = int(os.environ.get("TOOL_OUTPUT_TTL_SECONDS", 24 * 60 * 60))
+
+# Cache the responses of read-only tools (see TOOL_CACHE_ALLOWLIST in archer.defaults)
+TOOL_CACHE_ENABLED = os.environ.get("TOOL_CACHE_ENABLED", "true").lower() == "true"
+TOOL_CACHE_MAX_ENTRIES = int(os.environ.get("TOOL_CACHE_MAX_ENTRIES", 1000))
+
+# Tool execution: default timeout, calls running at once, retries of transient failures
+# and seconds after which a slow read-only call is duplicated
+TOOL_TIMEOUT_SECONDS = float(os.environ.get("TOOL_TIMEOUT_SECONDS", 30))
+TOOL_MAX_CONCURRENCY = int(os.environ.get("TOOL_MAX_CONCURRENCY", 16))
+TOOL_MAX_RETRIES = int(os.environ.get("TOOL_MAX_RETRIES", 2))
+TOOL_HEDGE_SECONDS = float(os.environ.get("TOOL_HEDGE_SECONDS", 10))
+
+# Opt-in cache of whole agent responses to first questions of a thread that used no
+# user-private tools, matched by embedding similarity
+RESPONSE_CACHE_ENABLED = os.environ.get("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_SIMILARITY = float(os.environ.get("RESPONSE_CACHE_SIMILARITY", 0.95))
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", 3600))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 500))
+RESPONSE_CACHE_EMBEDDING_MODEL = os.environ.get(
+    "RESPONSE_CACHE_EMBEDDING_MODEL", "text-embedding-3-small"
+)
+RESPONSE_CACHE_EMBEDDING_DIMENSIONS = int(
+    os.environ.get("RESPONSE_CACHE_EMBEDDING_DIMENSIONS", 256)
+)
+
+# Redact personal data (see the patterns below) from prompts, conversation history,
+# tool outputs and responses
+REDACTION_ENABLED = _flag("REDACTION_ENABLED", False)
 
 ARCADE_API_KEY = os.environ.get("ARCADE_API_KEY", "")
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
@@ -15,6 +121,17 @@ SLACK_BOT_TOKEN = os.environ.get("SLACK_BOT_TOKEN", "")
 SLACK_APP_TOKEN = os.environ.get("SLACK_APP_TOKEN", "")
 SLACK_SIGNING_SECRET = os.environ.get("SLACK_SIGNING_SECRET", "")
 
+# Slack Web API connections kept open for reuse, seconds an idle one stays open,
+# and retries of rate-limited calls
+SLACK_MAX_CONNECTIONS = int(os.environ.get("SLACK_MAX_CONNECTIONS", 64))
+SLACK_KEEPALIVE_SECONDS = float(os.environ.get("SLACK_KEEPALIVE_SECONDS", 60))
+SLACK_RATE_LIMIT_RETRIES = int(os.environ.get("SLACK_RATE_LIMIT_RETRIES", 2))
+
+# Assistant threads whose recent messages are kept in memory instead of fetched from
+# Slack, and seconds a thread is kept after its last message
+THREAD_HISTORY_MAX_THREADS = int(os.environ.get("THREAD_HISTORY_MAX_THREADS", 1000))
+THREAD_HISTORY_TTL_SECONDS = float(os.environ.get("THREAD_HISTORY_TTL_SECONDS", 24 * 60 * 60))
+
 
 # Redaction patterns
 #
@@ -30,3 +147,8 @@ REDACT_CREDIT_CARD_PATTERN = os.environ.get(
 REDACT_SSN_PATTERN = os.environ.get("REDACT_SSN_PATTERN", r"\b\d{3}[- ]?\d{2}[- ]?\d{4}\b")
 # For REDACT_USER_DEFINED_PATTERN, the default will never match anything
 REDACT_USER_DEFINED_PATTERN = os.environ.get("REDACT_USER_DEFINED_PATTERN", r"(?!)")
+# Comma separated words and phrases to redact, such as customer or project names,
+# matched case-insensitively as whole words
+REDACT_TERMS = [
+    term.strip() for term in os.environ.get("REDACT_TERMS", "").split(",") if term.strip()
+]
@@ -1,7 +1,9 @@
+from slack_bolt.async_app import AsyncApp
+
 from archer.listeners.actions import register_actions
 from archer.listeners.events import register_events
 
 
-def register_listeners(app):
+def register_listeners(app: AsyncApp):
     register_actions(app)
     register_events(app)
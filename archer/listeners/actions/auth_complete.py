@@ -3,22 +3,25 @@ import logging
 import uuid
 from typing import Any
 
-from slack_bolt import Ack, BoltContext
-from slack_sdk import WebClient
+from slack_bolt.async_app import AsyncAck, AsyncBoltContext
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.async_client import AsyncWebClient
 
 from archer.agent import invoke_agent
+from archer.agent.auth import auth_cache
 from archer.agent.utils import markdown_to_slack
+from archer.listeners.threads import thread_history
 
 
-def handle_auth_complete(
-    ack: Ack,
+async def handle_auth_complete(
+    ack: AsyncAck,
     body: dict[str, Any],
     logger: logging.Logger,
-    client: WebClient,
-    context: BoltContext,
+    client: AsyncWebClient,
+    context: AsyncBoltContext,
 ):
     # Acknowledge the view submission immediately.
-    ack()
+    await ack()
 
     try:
         # Extract metadata from the view.
@@ -29,60 +32,59 @@ def handle_auth_complete(
         user_message = metadata["message"]
         thread_id = metadata.get("thread_id", str(uuid.uuid4()))
 
-        # Post a temporary loading message.
-        temp_message = client.chat_postMessage(
+        # Post a temporary loading message, replaced by the response once it is ready.
+        temp_message = await client.chat_postMessage(
             channel=channel_id,
             text="Resuming after authorization...",
             thread_ts=thread_ts,
             as_user=True,
         )
 
-        # Retrieve the saved state if available
-        conversation_history = []
-
-        # Retrieve conversation history from the thread
-        replies = client.conversations_replies(
-            channel=channel_id,
-            ts=thread_ts,
-            limit=10,
-        )
-        for message in replies.get("messages", []):
-            # Determine role based on presence of bot_id
-            role = "user" if message.get("bot_id") is None else "assistant"
-            conversation_history.append({"role": role, "content": message.get("text", "")})
+        # The user just (re)authorized, so cached authorization statuses are stale
+        auth_cache.invalidate(user_id)
 
         logger.info(f"Resuming agent for user {user_id} with thread_id: {thread_id}")
 
-        # Re-invoke the agent with the same prompt and restored state
-        response = invoke_agent(
+        # Re-invoke the agent with the same prompt. The run resumes from its
+        # checkpoint, so the thread history is not needed.
+        response = await invoke_agent(
             user_id=user_id,
             prompt=user_message,
-            context=conversation_history,
             thread_id=thread_id,
             resume=True,
+            workspace_id=context.team_id,
         )
 
-        # Delete the temporary loading message.
-        try:
-            client.chat_delete(channel=channel_id, ts=temp_message["ts"])
-        except Exception as e:
-            logger.warning(f"Could not delete loading message: {e}")
-
-        # Send the response to the thread as the assistant
         content = response.content if hasattr(response, "content") else response
 
         # Check if content is empty (which happens when the agent only makes tool calls)
-        if content:
-            client.chat_postMessage(
+        if not content:
+            # Delete the temporary loading message.
+            try:
+                await client.chat_delete(channel=channel_id, ts=temp_message["ts"])
+            except Exception as e:
+                logger.warning(f"Could not delete loading message: {e}")
+            return
+
+        # Replace the loading message with the response
+        text = markdown_to_slack(content)
+        try:
+            await client.chat_update(channel=channel_id, ts=temp_message["ts"], text=text)
+            ts = temp_message["ts"]
+        except SlackApiError as e:
+            logger.warning(f"Could not update loading message: {e}")
+            posted = await client.chat_postMessage(
                 channel=channel_id,
-                text=markdown_to_slack(content),
+                text=text,
                 thread_ts=thread_ts,
                 as_user=True,  # This maintains the assistant's identity
             )
+            ts = posted["ts"]
+        thread_history.add(channel_id, thread_ts, ts, "assistant", text)
 
     except Exception as e:
         logger.exception("Error handling auth completion")
-        client.chat_postMessage(
+        await client.chat_postMessage(
             channel=channel_id,
             text=f":warning: Something went wrong after the authorization: {e!s}",
             thread_ts=thread_ts,
@@ -2,19 +2,19 @@ import json
 import logging
 from typing import Any
 
-from slack_bolt import Ack, BoltContext
-from slack_sdk import WebClient
+from slack_bolt.async_app import AsyncAck, AsyncBoltContext
+from slack_sdk.web.async_client import AsyncWebClient
 
 
-def handle_auth_complete_button(
-    ack: Ack,
+async def handle_auth_complete_button(
+    ack: AsyncAck,
     body: dict[str, Any],
     logger: logging.Logger,
-    client: WebClient,
-    context: BoltContext,
+    client: AsyncWebClient,
+    context: AsyncBoltContext,
 ):
     # Acknowledge the button click right away
-    ack()
+    await ack()
 
     try:
         # Extract the value from the button
@@ -31,7 +31,7 @@ def handle_auth_complete_button(
         trigger_id = body["trigger_id"]
 
         # Open the modal with the authorization complete button
-        client.views_open(
+        await client.views_open(
             trigger_id=trigger_id,
             view={
                 "type": "modal",
@@ -67,7 +67,7 @@ def handle_auth_complete_button(
         )
     except Exception as e:
         logger.exception("Failed to open modal view")
-        client.chat_postMessage(
+        await client.chat_postMessage(
             channel=channel_id,
             text=f":warning: Could not open authorization dialog: {e!s}",
             thread_ts=thread_ts,
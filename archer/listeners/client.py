@@ -0,0 +1,111 @@
+import time
+from types import SimpleNamespace
+
+import aiohttp
+from slack_sdk.http_retry.async_handler import AsyncRetryHandler
+from slack_sdk.http_retry.builtin_async_handlers import (
+    AsyncConnectionErrorRetryHandler,
+    AsyncRateLimitErrorRetryHandler,
+)
+from slack_sdk.http_retry.request import HttpRequest
+from slack_sdk.http_retry.response import HttpResponse
+from slack_sdk.http_retry.state import RetryState
+from yarl import URL
+
+from archer.env import SLACK_KEEPALIVE_SECONDS, SLACK_MAX_CONNECTIONS, SLACK_RATE_LIMIT_RETRIES
+from archer.metrics import SLACK_API_IN_FLIGHT, SLACK_API_SECONDS
+
+# Methods whose callers handle rate limits themselves: the streamed message updates
+# postpone the next update instead of waiting (see SlackResponseStreamer)
+SELF_LIMITED_METHODS = {"chat.update"}
+
+
+def _api_method(url: URL) -> str:
+    # https://slack.com/api/chat.postMessage -> chat.postMessage
+    return url.path.rsplit("/", 1)[-1]
+
+
+async def _on_request_start(
+    session: aiohttp.ClientSession,
+    context: SimpleNamespace,
+    params: aiohttp.TraceRequestStartParams,
+) -> None:
+    context.started = time.perf_counter()
+    SLACK_API_IN_FLIGHT.inc()
+
+
+async def _on_request_end(
+    session: aiohttp.ClientSession, context: SimpleNamespace, params: aiohttp.TraceRequestEndParams
+) -> None:
+    SLACK_API_IN_FLIGHT.dec()
+    SLACK_API_SECONDS.observe(
+        time.perf_counter() - context.started, _api_method(params.url), str(params.response.status)
+    )
+
+
+async def _on_request_exception(
+    session: aiohttp.ClientSession,
+    context: SimpleNamespace,
+    params: aiohttp.TraceRequestExceptionParams,
+) -> None:
+    SLACK_API_IN_FLIGHT.dec()
+    SLACK_API_SECONDS.observe(
+        time.perf_counter() - context.started, _api_method(params.url), "error"
+    )
+
+
+def create_slack_session() -> aiohttp.ClientSession:
+    """
+    Create the HTTP session for the Slack Web API clients.
+
+    Bolt creates a client per request from the app's client, and they all share its
+    session, so the duration of every Slack API call is recorded here (see
+    SLACK_API_SECONDS in archer.metrics). Connections to Slack are pooled and kept
+    alive between calls. Must be called with the event loop running.
+    """
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_request_end.append(_on_request_end)
+    trace_config.on_request_exception.append(_on_request_exception)
+    # Clients without a session of their own give theirs the client's timeout,
+    # 30 seconds by default
+    connector = aiohttp.TCPConnector(
+        limit=SLACK_MAX_CONNECTIONS, keepalive_timeout=SLACK_KEEPALIVE_SECONDS, ttl_dns_cache=300
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=30),
+        trace_configs=[trace_config],
+    )
+
+
+class RateLimitRetryHandler(AsyncRateLimitErrorRetryHandler):
+    """
+    Waits out Slack's rate limits (the Retry-After of a 429 response) and retries,
+    except for the methods in SELF_LIMITED_METHODS.
+    """
+
+    async def _can_retry_async(
+        self,
+        *,
+        state: RetryState,
+        request: HttpRequest,
+        response: HttpResponse | None = None,
+        error: Exception | None = None,
+    ) -> bool:
+        if _api_method(URL(request.url)) in SELF_LIMITED_METHODS:
+            return False
+        return await super()._can_retry_async(
+            state=state, request=request, response=response, error=error
+        )
+
+
+def create_retry_handlers() -> list[AsyncRetryHandler]:
+    """
+    Return the retry handlers of the Slack Web API clients: a retry of calls whose
+    connection failed (slack_sdk's default) and retries of rate-limited calls.
+    """
+    return [
+        AsyncConnectionErrorRetryHandler(),
+        RateLimitRetryHandler(max_retry_count=SLACK_RATE_LIMIT_RETRIES),
+    ]
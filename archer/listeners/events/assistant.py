@@ -1,26 +1,53 @@
 import json
 import logging
-
-from slack_bolt import Assistant, BoltContext, Say, SetStatus, SetSuggestedPrompts
-from slack_sdk import WebClient
-
-from archer.agent import invoke_agent
+import time
+
+from slack_bolt.async_app import (
+    AsyncAssistant,
+    AsyncBoltContext,
+    AsyncSaveThreadContext,
+    AsyncSay,
+    AsyncSetStatus,
+    AsyncSetSuggestedPrompts,
+)
+from slack_sdk.web.async_client import AsyncWebClient
+
+from archer.agent import has_checkpoint, invoke_agent
+from archer.agent.scheduler import QueuedCallback
 from archer.agent.utils import markdown_to_slack
-from archer.defaults import DEFAULT_LOADING_TEXT, INITIAL_GREETING
+from archer.defaults import (
+    DEFAULT_LOADING_TEXT,
+    INITIAL_GREETING,
+    QUEUE_STATUS_INTERVAL_SECONDS,
+    THREAD_HISTORY_LIMIT,
+)
+from archer.env import STREAMING_ENABLED
+from archer.listeners.streaming import SlackResponseStreamer
+from archer.listeners.threads import thread_contexts, thread_history
 
 # Shared assistant instance
-assistant = Assistant()
+assistant = AsyncAssistant(thread_context_store=thread_contexts)
 
 
 # This listener is invoked when a human user opens an assistant thread
 @assistant.thread_started
-def start_assistant_thread(
-    say: Say,
-    set_suggested_prompts: SetSuggestedPrompts,
+async def start_assistant_thread(
+    payload: dict,
+    say: AsyncSay,
+    set_suggested_prompts: AsyncSetSuggestedPrompts,
+    save_thread_context: AsyncSaveThreadContext,
     logger: logging.Logger,
 ):
     try:
-        say(INITIAL_GREETING)
+        thread = payload["assistant_thread"]
+        channel_id, thread_ts = thread["channel_id"], thread["thread_ts"]
+        # The thread is new, so its whole history is known from here on
+        thread_history.start(channel_id, thread_ts)
+        if thread.get("context", {}).get("channel_id") is not None:
+            await save_thread_context(thread["context"])
+
+        greeting = await say(INITIAL_GREETING)
+        thread_history.add(channel_id, thread_ts, greeting.get("ts"), "assistant", INITIAL_GREETING)
 
         # Provide some suggested prompts to the user
         prompts: list[dict[str, str]] = [
@@ -38,49 +65,121 @@ def start_assistant_thread(
             },
         ]
 
-        set_suggested_prompts(prompts=prompts)
+        await set_suggested_prompts(prompts=prompts)
 
     except Exception:
         logger.exception("Failed to handle an assistant_thread_started event")
-        say(":warning: Looks like I had some trouble starting up. Please try again")
+        await say(":warning: Looks like I had some trouble starting up. Please try again")
+
+
+async def get_thread_history(
+    client: AsyncWebClient, context: AsyncBoltContext, current_ts: str | None
+) -> list[dict[str, str]]:
+    """
+    Return the earlier messages of the assistant thread as conversation context.
+
+    The messages are fetched from Slack only for threads missing from thread_history.
+    """
+    messages = thread_history.get(context.channel_id, context.thread_ts)
+    if messages is None:
+        replies = await client.conversations_replies(
+            channel=context.channel_id,
+            ts=context.thread_ts,
+            limit=THREAD_HISTORY_LIMIT,
+        )
+        messages = [
+            {
+                "ts": message.get("ts"),
+                # Determine role based on presence of bot_id
+                "role": "user" if message.get("bot_id") is None else "assistant",
+                "content": message["text"],
+            }
+            for message in replies.get("messages", [])
+        ]
+        thread_history.start(context.channel_id, context.thread_ts, messages)
+    # The current message is sent separately as the prompt
+    return [
+        {"role": message["role"], "content": message["content"]}
+        for message in messages
+        if message["ts"] != current_ts
+    ]
+
+
+def queue_position_reporter(set_status: AsyncSetStatus) -> QueuedCallback:
+    """
+    Return a callback that shows the queue position of a message in the assistant status.
+
+    The position changes each time a run ahead of it starts. A new position is shown at
+    most once per QUEUE_STATUS_INTERVAL_SECONDS, to spare a setStatus call per change.
+    """
+    last_shown = 0.0
+
+    async def show_queue_position(position: int) -> None:
+        nonlocal last_shown
+        now = time.monotonic()
+        if position and now < last_shown + QUEUE_STATUS_INTERVAL_SECONDS:
+            return
+        last_shown = now
+        await set_status(f"queued, position {position}..." if position else DEFAULT_LOADING_TEXT)
+
+    return show_queue_position
+
+
+def remember_reply(context: AsyncBoltContext, ts: str | None, content: str | None) -> None:
+    """
+    Add a response posted in the assistant thread to its cached history.
+    """
+    if content:
+        thread_history.add(
+            context.channel_id, context.thread_ts, ts, "assistant", markdown_to_slack(content)
+        )
 
 
 # This listener is invoked when the human user sends a reply in the assistant thread
 @assistant.user_message
-def respond_in_assistant_thread(
+async def respond_in_assistant_thread(
     payload: dict,
     logger: logging.Logger,
-    context: BoltContext,
-    set_status: SetStatus,
-    say: Say,
-    client: WebClient,
+    context: AsyncBoltContext,
+    set_status: AsyncSetStatus,
+    say: AsyncSay,
+    client: AsyncWebClient,
 ):
     try:
         # Extract user_id, user_message, and thread_id from the payload
         user_message = payload.get("text", "")
         user_id = payload.get("user")
-        set_status(DEFAULT_LOADING_TEXT)
+        await set_status(DEFAULT_LOADING_TEXT)
 
         # Generate a thread_id based on the channel and thread
         thread_id = f"{context.channel_id}:{context.thread_ts}"
         logger.info(f"Using thread_id: {thread_id} for conversation")
 
-        # Retrieve conversation history from the thread
-        replies = client.conversations_replies(
-            channel=context.channel_id,
-            ts=context.thread_ts,
-            limit=10,
+        # Backfill the conversation history from Slack only for threads the agent
+        # has not checkpointed yet; otherwise the earlier turns are already stored.
+        conversation_history = []
+        if not await has_checkpoint(user_id, thread_id):
+            conversation_history = await get_thread_history(client, context, payload.get("ts"))
+        thread_history.add(
+            context.channel_id, context.thread_ts, payload.get("ts"), "user", user_message
         )
 
-        conversation_history = []
-        for message in replies.get("messages", []):
-            # Determine role based on presence of bot_id
-            role = "user" if message.get("bot_id") is None else "assistant"
-            conversation_history.append({"role": role, "content": message["text"]})
+        # Stream the answer into the thread as it is generated
+        streamer = (
+            SlackResponseStreamer(client, context.channel_id, context.thread_ts, set_status)
+            if STREAMING_ENABLED
+            else None
+        )
 
         # Invoke the agent with the user message and conversation history
-        response = invoke_agent(
-            user_id=user_id, prompt=user_message, context=conversation_history, thread_id=thread_id
+        response = await invoke_agent(
+            user_id=user_id,
+            prompt=user_message,
+            context=conversation_history,
+            thread_id=thread_id,
+            stream_handler=streamer,
+            workspace_id=context.team_id,
+            on_queued=queue_position_reporter(set_status),
         )
 
         # Log the response for debugging
@@ -89,6 +188,12 @@ def respond_in_assistant_thread(
         logger.info(f"Agent response thread_id: {response.thread_id}")
         logger.info(f"Agent response has content: {response.content is not None}")
 
+        if response.superseded:
+            # A newer message in the thread is being answered instead
+            if streamer is not None:
+                await streamer.discard()
+            return
+
         # Check if the agent needs authorization
         if response.auth_message:
             # Format the auth message for Slack
@@ -98,8 +203,12 @@ def respond_in_assistant_thread(
             # Add instructions for the user
             auth_message += "\n\nAfter authorizing, click the button below to continue:"
 
+            # Complete any text streamed before the tool call that needs authorization
+            if streamer is not None:
+                await streamer.finish()
+
             # Send message with a button that will provide a trigger_id when clicked
-            say({
+            posted = await say({
                 "text": auth_message,
                 "blocks": [
                     {"type": "section", "text": {"type": "mrkdwn", "text": auth_message}},
@@ -126,14 +235,21 @@ def respond_in_assistant_thread(
                     },
                 ],
             })
+            thread_history.add(
+                context.channel_id, context.thread_ts, posted.get("ts"), "assistant", auth_message
+            )
+
+        elif streamer is not None and await streamer.finish(response.content):
+            remember_reply(context, streamer.message_ts, response.content)
 
         else:
-            # If no auth_message, just send the response content
+            # If no auth_message and nothing was streamed, just send the response content
             content = (
                 markdown_to_slack(response.content) if hasattr(response, "content") else response
             )
-            say(content)
+            posted = await say(content)
+            remember_reply(context, posted.get("ts"), response.content)
 
     except Exception:
         logger.exception("Failed to handle a user message event")
-        say(":warning: Looks like I had some trouble processing. Please try again.")
+        await say(":warning: Looks like I had some trouble processing. Please try again.")
@@ -1,12 +1,13 @@
+import asyncio
 from logging import Logger
 
-from slack_sdk import WebClient
+from slack_sdk.web.async_client import AsyncWebClient
 
 from archer.defaults import get_available_models
 from archer.storage.functions import get_user_state
 
 
-def app_home_opened_callback(event: dict, logger: Logger, client: WebClient):
+async def app_home_opened_callback(event: dict, logger: Logger, client: AsyncWebClient):
     if event["tab"] != "home":
         return
 
@@ -24,7 +25,7 @@ def app_home_opened_callback(event: dict, logger: Logger, client: WebClient):
     ]
 
     # Retrieve user's state to determine if they already have a selected model
-    initial_model = get_user_state(event["user"])["model"]
+    initial_model = (await asyncio.to_thread(get_user_state, event["user"]))["model"]
     try:
         # Find the first option that matches the initial_model
         initial_option = next(
@@ -37,7 +38,7 @@ def app_home_opened_callback(event: dict, logger: Logger, client: WebClient):
         initial_option = options[-1]
 
     try:
-        client.views_publish(
+        await client.views_publish(
             user_id=event["user"],
             view={
                 "type": "home",
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+
+from slack_bolt.async_app import AsyncSetStatus
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.async_client import AsyncWebClient
+
+from archer.agent.base import StreamHandler
+from archer.agent.redaction import StreamRedactor, stream_redactor
+from archer.agent.utils import markdown_to_slack
+from archer.env import STREAM_UPDATE_INTERVAL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class SlackResponseStreamer(StreamHandler):
+    """
+    Streams an agent response into a Slack thread.
+
+    The first token posts a placeholder message, which is then updated with
+    chat_update as more tokens arrive. Updates are batched so that at most one
+    is sent per interval, and postponed when Slack asks us to back off.
+    Tool calls are reported through the assistant status. With REDACTION_ENABLED,
+    tokens are redacted as they arrive, holding back text that may still turn
+    out to be personal data.
+    """
+
+    def __init__(
+        self,
+        client: AsyncWebClient,
+        channel_id: str,
+        thread_ts: str,
+        set_status: AsyncSetStatus | None = None,
+        interval: float = STREAM_UPDATE_INTERVAL_SECONDS,
+    ):
+        self.client = client
+        self.channel_id = channel_id
+        self.thread_ts = thread_ts
+        self.set_status = set_status
+        self.interval = interval
+
+        self.message_ts: str | None = None
+        self._message_id: str | None = None
+        self._buffer: list[str] = []
+        self._redactor: StreamRedactor | None = None
+        self._sent_text = ""
+        self._next_update = 0.0
+
+    @property
+    def text(self) -> str:
+        return "".join(self._buffer)
+
+    async def on_token(self, message_id: str | None, token: str) -> None:
+        # Only the latest model response is shown, like the final answer
+        if message_id != self._message_id:
+            self._message_id = message_id
+            self._buffer = []
+            self._redactor = stream_redactor()
+        self._buffer.append(self._redactor.feed(token) if self._redactor else token)
+
+        if time.monotonic() >= self._next_update:
+            await self._send(self.text)
+
+    async def on_tool_calls(self, tool_names: list[str]) -> None:
+        if self.set_status is None:
+            return
+        try:
+            await self.set_status(f"using {', '.join(dict.fromkeys(tool_names))}...")
+        except SlackApiError as e:
+            logger.warning(f"Could not set tool status: {e}")
+
+    async def finish(self, content: str | None = None) -> bool:
+        """
+        Send the final version of the message.
+
+        Returns False if nothing was posted yet, in which case the caller should
+        post the response itself.
+        """
+        if self.message_ts is None:
+            return False
+        if content is None:
+            content = self.text + (self._redactor.flush() if self._redactor else "")
+        await self._send(content, final=True)
+        return True
+
+    async def discard(self) -> None:
+        """
+        Delete the message posted so far, for a response that is no longer wanted.
+        """
+        if self.message_ts is None:
+            return
+        try:
+            await self.client.chat_delete(channel=self.channel_id, ts=self.message_ts)
+        except SlackApiError as e:
+            logger.warning(f"Could not delete streamed message: {e}")
+        self.message_ts = None
+
+    async def _send(self, text: str, final: bool = False) -> None:
+        text = markdown_to_slack(text)
+        if not text.strip() or text == self._sent_text:
+            return
+
+        try:
+            await self._post_or_update(text)
+        except SlackApiError as e:
+            if e.response.status_code != 429:
+                if final:
+                    raise
+                logger.warning(f"Could not update streamed message: {e}")
+                return
+            retry_after = float(e.response.headers.get("Retry-After", self.interval))
+            if final:
+                # The final text must land, so wait out the rate limit once
+                await asyncio.sleep(retry_after)
+                await self._post_or_update(text)
+            else:
+                self._next_update = time.monotonic() + retry_after
+                logger.info(f"Rate limited while streaming, retrying in {retry_after}s")
+
+    async def _post_or_update(self, text: str) -> None:
+        if self.message_ts is None:
+            response = await self.client.chat_postMessage(
+                channel=self.channel_id, thread_ts=self.thread_ts, text=text
+            )
+            self.message_ts = response["ts"]
+        else:
+            await self.client.chat_update(channel=self.channel_id, ts=self.message_ts, text=text)
+        self._sent_text = text
+        self._next_update = time.monotonic() + self.interval
@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+
+from slack_bolt.context.assistant.thread_context import AssistantThreadContext
+from slack_bolt.context.assistant.thread_context_store.async_store import (
+    AsyncAssistantThreadContextStore,
+)
+
+from archer.defaults import THREAD_HISTORY_LIMIT
+from archer.env import THREAD_HISTORY_MAX_THREADS, THREAD_HISTORY_TTL_SECONDS
+
+# (channel_id, thread_ts)
+Thread = tuple[str, str]
+
+
+class ThreadHistoryCache:
+    """
+    LRU cache of the latest messages of assistant threads.
+
+    A thread becomes known when it starts or when its messages are fetched from
+    Slack. From then on, the messages the app receives and posts are added to it,
+    so its history is served from here instead of a conversations_replies call.
+    Messages for unknown threads are ignored, because their history would be
+    incomplete. The cache is per process, so a thread expires `ttl_seconds` after
+    its last message. This limits how long the cache misses messages answered by
+    another replica.
+
+    Messages are dicts with the ts, role and content of a Slack message, oldest
+    first.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float, limit: int = THREAD_HISTORY_LIMIT):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.limit = limit
+        self._threads: OrderedDict[Thread, tuple[float, list[dict[str, str]]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, channel_id: str, thread_ts: str) -> list[dict[str, str]] | None:
+        """Return the messages of a known thread, or None."""
+        key = (channel_id, thread_ts)
+        with self._lock:
+            entry = self._threads.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._threads.move_to_end(key)
+                self._hits += 1
+                return list(entry[1])
+            if entry is not None:
+                del self._threads[key]
+            self._misses += 1
+            return None
+
+    def start(
+        self, channel_id: str, thread_ts: str, messages: Iterable[dict[str, str]] = ()
+    ) -> None:
+        """
+        Start tracking a thread whose messages are all given, unless it is known
+        already (a message may be handled before the start of its thread).
+        """
+        key = (channel_id, thread_ts)
+        with self._lock:
+            entry = self._threads.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return
+            self._threads[key] = (
+                time.monotonic() + self.ttl_seconds,
+                list(messages)[-self.limit :],
+            )
+            self._threads.move_to_end(key)
+            while len(self._threads) > self.maxsize:
+                self._threads.popitem(last=False)
+
+    def add(self, channel_id: str, thread_ts: str, ts: str | None, role: str, content: str) -> None:
+        """Add a message to a known thread, unless it already holds it."""
+        key = (channel_id, thread_ts)
+        with self._lock:
+            entry = self._threads.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return
+            messages = entry[1]
+            if ts is not None and any(message["ts"] == ts for message in messages):
+                return
+            messages.append({"ts": ts, "role": role, "content": content})
+            del messages[: -self.limit]
+            self._threads[key] = (time.monotonic() + self.ttl_seconds, messages)
+            self._threads.move_to_end(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses, "size": len(self._threads)}
+
+
+class ThreadContextStore(AsyncAssistantThreadContextStore):
+    """
+    Keeps the context of assistant threads in memory. The context is the channel
+    the user is viewing.
+
+    Bolt's default store keeps the context in the metadata of the app's first
+    reply in the thread. Reading it costs a conversations_replies call for every
+    message the app says in the thread, and saving it costs two more calls. The
+    agent does not use the context. Bolt only attaches it to the app's messages,
+    so a context lost on a restart just leaves those messages without it.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._contexts: OrderedDict[Thread, dict[str, str]] = OrderedDict()
+
+    async def save(self, *, channel_id: str, thread_ts: str, context: dict[str, str]) -> None:
+        key = (channel_id, thread_ts)
+        self._contexts[key] = context
+        self._contexts.move_to_end(key)
+        while len(self._contexts) > self.maxsize:
+            self._contexts.popitem(last=False)
+
+    async def find(self, *, channel_id: str, thread_ts: str) -> AssistantThreadContext | None:
+        context = self._contexts.get((channel_id, thread_ts))
+        return AssistantThreadContext(context) if context else None
+
+
+thread_history = ThreadHistoryCache(
+    maxsize=THREAD_HISTORY_MAX_THREADS, ttl_seconds=THREAD_HISTORY_TTL_SECONDS
+)
+thread_contexts = ThreadContextStore(maxsize=THREAD_HISTORY_MAX_THREADS)
@@ -0,0 +1,252 @@
+import abc
+import functools
+import inspect
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+# Seconds, from a fast Slack API call to a long agent run
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Label names for the keys of nested stats (see render), e.g. the models in token_usage
+STAT_LABELS = {
+    "token_usage": "model",
+    "agent_build_seconds": "model",
+    "queued_by_workspace": "workspace",
+    "redactions": "kind",
+    "tools": "tool",
+}
+
+_metrics: list["Metric"] = []
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(abc.ABC):
+    """
+    A metric family with a value per combination of label values.
+
+    Metrics are registered when created and rendered by render(). Updates take a
+    lock, since they come from the event loop and from worker threads.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _labels(self, labelvalues: tuple[str, ...], *extra: tuple[str, str]) -> str:
+        return _labels((*zip(self.labelnames, labelvalues, strict=True), *extra))
+
+    @abc.abstractmethod
+    def samples(self) -> Iterator[str]:
+        """Yield the sample lines of the metric in the text exposition format."""
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type}"
+        yield from self.samples()
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for labelvalues, value in values:
+            yield f"{self.name}{self._labels(labelvalues)} {_number(value)}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labelvalues: str, amount: float = 1) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    @contextmanager
+    def track(self, *labelvalues: str) -> Iterator[None]:
+        """
+        Count the block as in progress while it runs.
+        """
+        self.inc(*labelvalues)
+        try:
+            yield
+        finally:
+            self.dec(*labelvalues)
+
+
+class Histogram(Metric):
+    """
+    Counts observations in buckets, for latencies in seconds.
+
+    An observation only increments one bucket; the cumulative counts of the
+    Prometheus format are computed when the metrics are rendered.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        # Per label values: the count of each bucket and of +Inf, then the sum
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labelvalues)
+            if counts is None:
+                counts = self._values[labelvalues] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, *labelvalues: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = [(labelvalues, list(counts)) for labelvalues, counts in self._values.items()]
+        for labelvalues, counts in values:
+            total = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts, strict=False):
+                total += count
+                labels = self._labels(labelvalues, ("le", _number(bound)))
+                yield f"{self.name}_bucket{labels} {_number(total)}"
+            yield f"{self.name}_sum{self._labels(labelvalues)} {_number(counts[-1])}"
+            yield f"{self.name}_count{self._labels(labelvalues)} {_number(total)}"
+
+
+def timed(histogram: Histogram, *labelvalues: str) -> Callable:
+    """
+    Decorate a function or coroutine function to observe its duration.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with histogram.time(*labelvalues):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with histogram.time(*labelvalues):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _stat_samples(
+    name: str, key: str | None, value: Any, labels: Labels
+) -> Iterator[tuple[str, Labels, float]]:
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int | float):
+        yield name, labels, value
+    elif isinstance(value, dict):
+        label = STAT_LABELS.get(key) if key is not None else None
+        for child, child_value in value.items():
+            if label is not None:
+                yield from _stat_samples(name, None, child_value, (*labels, (label, str(child))))
+            else:
+                yield from _stat_samples(f"{name}_{child}", child, child_value, labels)
+
+
+def render(stats: dict[str, Any] | None = None) -> str:
+    """
+    Render the metrics in the Prometheus text format.
+
+    Numbers in `stats`, such as the stats of the caches and the scheduler shown by
+    /ready, are added as gauges named after their keys. Nested dicts become part of
+    the name, except for those in STAT_LABELS, whose keys become a label.
+    """
+    lines: list[str] = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+
+    gauges: dict[str, list[tuple[Labels, float]]] = {}
+    for section, value in (stats or {}).items():
+        for name, labels, number in _stat_samples(section, section, value, ()):
+            gauges.setdefault("archer_" + re.sub(r"\W", "_", name), []).append((labels, number))
+    for name, samples in gauges.items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(f"{name}{_labels(labels)} {_number(number)}" for labels, number in samples)
+    return "\n".join(lines) + "\n"
+
+
+SLACK_API_SECONDS = Histogram(
+    "archer_slack_api_seconds", "Duration of Slack Web API calls", ("method", "status")
+)
+USER_STATE_SECONDS = Histogram(
+    "archer_user_state_seconds", "Duration of loading a user's settings (get_user_state)"
+)
+AGENT_RUN_SECONDS = Histogram(
+    "archer_agent_run_seconds", "Duration of invoke_agent, by outcome", ("outcome",)
+)
+GRAPH_NODE_SECONDS = Histogram(
+    "archer_graph_node_seconds", "Duration of the agent graph nodes", ("node",)
+)
+TOOL_CALL_SECONDS = Histogram(
+    "archer_tool_call_seconds",
+    "Duration of tool calls including retries, by tool and status",
+    ("tool", "status"),
+)
+LLM_FIRST_TOKEN_SECONDS = Histogram(
+    "archer_llm_first_token_seconds", "Time until the model's first token", ("model",)
+)
+LLM_RESPONSE_SECONDS = Histogram(
+    "archer_llm_response_seconds", "Duration of model calls", ("model",)
+)
+TOOL_CALLS_IN_FLIGHT = Gauge("archer_tool_calls_in_flight", "Tool calls running")
+SLACK_API_IN_FLIGHT = Gauge("archer_slack_api_in_flight", "Slack Web API calls in progress")
@@ -1,62 +1,129 @@
+import asyncio
 import logging
 import os
 import sys
 import threading
-from collections import deque
-from collections.abc import Callable
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
-from slack_bolt.adapter.fastapi import SlackRequestHandler
-from slack_bolt.app import App
+from fastapi.responses import JSONResponse, PlainTextResponse
+from slack_bolt.adapter.fastapi.async_handler import AsyncSlackRequestHandler
+from slack_bolt.async_app import AsyncApp, AsyncBoltRequest
 from slack_bolt.response import BoltResponse
 
-from archer.env import SLACK_BOT_TOKEN, SLACK_SIGNING_SECRET
+from archer.agent import get_startup_metrics, is_ready, warm_up_agents
+from archer.agent.registry import agent_registry
+from archer.agent.scheduler import scheduler
+from archer.agent.tool_cache import tool_cache
+from archer.env import DEDUP_TTL_SECONDS, SLACK_BOT_TOKEN, SLACK_SIGNING_SECRET
 from archer.listeners import register_listeners
+from archer.listeners.client import create_retry_handlers, create_slack_session
+from archer.listeners.threads import thread_history
+from archer.metrics import CONTENT_TYPE, render
+from archer.storage.events import MemoryEventStore
+from archer.storage.functions import get_event_store
 
 LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
 logging.basicConfig(level=LOG_LEVEL, stream=sys.stdout)
 logger = logging.getLogger(__name__)
 
-# Thread-safe deque to store processed event IDs
-processed_events: deque[str] = deque(maxlen=1000)
-event_lock: threading.Lock = threading.Lock()
 
+# Event ids this process accepted, so Slack's retries of them don't query the shared store
+in_flight_events = MemoryEventStore(ttl_seconds=DEDUP_TTL_SECONDS)
 
-def create_slack_app() -> App:
-    slack_app = App(
+
+async def is_duplicate_event(event_id: str, retry_num: str | None) -> bool:
+    """
+    Return whether the event was already accepted, by this process or another one.
+
+    Slack retries an event it did not get a timely ack for, setting X-Slack-Retry-Num.
+    A retry of an event this process is handling is recognised without a round trip
+    to the shared store.
+    """
+    if retry_num and in_flight_events.seen(event_id):
+        logger.info(f"Retry {retry_num} of event {event_id} is already in flight, skipping it.")
+        return True
+
+    # The store may be shared with other processes, so it is queried off the event loop
+    if await asyncio.to_thread(get_event_store().seen, event_id):
+        logger.info(f"Duplicate event detected: {event_id}, skipping processing.")
+        return True
+    if not retry_num:
+        in_flight_events.seen(event_id)
+    return False
+
+
+async def deduplicate_events(
+    req: AsyncBoltRequest,
+    resp: BoltResponse,
+    next: Callable[[], Awaitable[BoltResponse]],  # noqa: A002
+) -> BoltResponse:
+    event_id = req.body.get("event_id")
+    event_type = req.body.get("event", {}).get("type")
+    retry_num = req.headers.get("x-slack-retry-num", [None])[0]
+
+    if (
+        event_type in ["message", "app_mention", "assistant"]
+        and event_id
+        and await is_duplicate_event(event_id, retry_num)
+    ):
+        # The event is already being handled, so tell Slack to stop retrying it
+        return BoltResponse(status=200, body="", headers={"x-slack-no-retry": "1"})
+
+    return await next()
+
+
+def create_slack_app() -> AsyncApp:
+    slack_app = AsyncApp(
         name="Archer",
         logger=logger,
         signing_secret=SLACK_SIGNING_SECRET,
         token=SLACK_BOT_TOKEN,
     )
-
-    @slack_app.middleware
-    def deduplicate_events(
-        req: Request,
-        resp: BoltResponse,
-        next: Callable[[], BoltResponse],  # noqa: A002
-    ) -> BoltResponse:
-        event_id = req.body.get("event_id")
-        event_type = req.body.get("event", {}).get("type")
-
-        if event_type in ["message", "app_mention", "assistant"] and event_id:
-            with event_lock:
-                if event_id in processed_events:
-                    logger.info(f"Duplicate event detected: {event_id}, skipping processing.")
-                    return BoltResponse(status=200)
-                else:
-                    processed_events.append(event_id)
-
-        return next()
+    # Copied to the client Bolt creates for each request
+    slack_app.client.retry_handlers = create_retry_handlers()
+    slack_app.middleware(deduplicate_events)
 
     register_listeners(slack_app)
     return slack_app
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Build the agents in the background so the server can bind (and ack Slack)
+    # while the tools are fetched and the graph is compiled.
+    threading.Thread(target=warm_up_agents, name="agent-warmup", daemon=True).start()
+    agent_registry.start_refresh()
+    # The Slack clients of all requests share one session, which times their calls
+    slack_client = app.state.slack_app.client
+    slack_client.session = create_slack_session()
+    yield
+    agent_registry.stop_refresh()
+    await slack_client.session.close()
+
+
+def get_component_stats() -> dict:
+    """
+    Return the stats of the agents, caches and queues, shown by /ready and /metrics.
+    """
+    return {
+        **get_startup_metrics(),
+        "dedup": get_event_store().stats(),
+        "dedup_in_flight": in_flight_events.stats(),
+        "tool_cache": tool_cache.stats(),
+        "scheduler": scheduler.stats(),
+        "thread_history": thread_history.stats(),
+    }
+
+
 def create_fastapi_app() -> FastAPI:
+    started = time.perf_counter()
     slack_app = create_slack_app()
-    fastapi_handler = SlackRequestHandler(slack_app)
-    fastapi_app = FastAPI()
+    fastapi_handler = AsyncSlackRequestHandler(slack_app)
+    fastapi_app = FastAPI(lifespan=lifespan)
+    fastapi_app.state.slack_app = slack_app
 
     # Define an endpoint to receive Slack requests
     @fastapi_app.post("/slack/events")
@@ -70,4 +137,17 @@ def create_fastapi_app() -> FastAPI:
         )
         return await fastapi_handler.handle(req)
 
+    # Readiness probe: 503 until the warm-up agents have been compiled
+    @fastapi_app.get("/ready")
+    async def ready():
+        metrics = {**get_component_stats(), "app_create_seconds": app_create_seconds}
+        return JSONResponse(metrics, status_code=200 if is_ready() else 503)
+
+    # Latency histograms and the component stats in the Prometheus text format
+    @fastapi_app.get("/metrics")
+    async def metrics():
+        return PlainTextResponse(render(get_component_stats()), media_type=CONTENT_TYPE)
+
+    app_create_seconds = time.perf_counter() - started
+    logger.info(f"FastAPI app created in {app_create_seconds:.2f}s")
     return fastapi_app
@@ -0,0 +1,669 @@
+import asyncio
+import copy
+import itertools
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator, Sequence
+from pathlib import Path
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.types import TASKS, ChannelProtocol
+
+from archer.storage.sqlite import set_journal_mode
+
+
+def _next_version(current: str | int | None) -> str:
+    # Zero padded string versions, compatible with the ones InMemorySaver produces
+    if current is None:
+        current_v = 0
+    elif isinstance(current, int):
+        current_v = current
+    else:
+        current_v = int(current.split(".")[0])
+    return f"{current_v + 1:032}"
+
+
+async def run_to_completion(func, /, *args: Any) -> Any:
+    """
+    Run a write in a worker thread and wait for it even if the caller is cancelled.
+
+    A cancelled agent run then finishes writing its checkpoint before it unwinds,
+    so the next run of the thread (which waits for it) can't be overwritten by a
+    write that was still in flight.
+    """
+    task = asyncio.ensure_future(asyncio.to_thread(func, *args))
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        await task
+        raise
+
+
+def _copy_tuple(checkpoint_tuple: CheckpointTuple | None) -> CheckpointTuple | None:
+    """
+    Copy the dicts and lists of a checkpoint tuple, sharing the values they hold.
+    """
+    if checkpoint_tuple is None:
+        return None
+    checkpoint = checkpoint_tuple.checkpoint
+    return checkpoint_tuple._replace(
+        config=copy.deepcopy(checkpoint_tuple.config),
+        checkpoint={
+            **checkpoint,
+            "channel_values": {
+                channel: copy.copy(value) for channel, value in checkpoint["channel_values"].items()
+            },
+            "channel_versions": dict(checkpoint["channel_versions"]),
+            "versions_seen": {
+                node: dict(versions) for node, versions in checkpoint["versions_seen"].items()
+            },
+            "pending_sends": list(checkpoint.get("pending_sends", [])),
+        },
+        metadata=dict(checkpoint_tuple.metadata),
+        parent_config=copy.deepcopy(checkpoint_tuple.parent_config),
+        pending_writes=list(checkpoint_tuple.pending_writes or []),
+    )
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """
+    An in-process checkpointer that keeps a bounded amount of conversation state.
+
+    Only the last `keep_last` checkpoints of each thread are kept, threads idle for
+    longer than `ttl_seconds` are dropped and, once more than `max_threads` threads
+    are stored, the least recently used ones are evicted.
+    """
+
+    def __init__(self, max_threads: int, ttl_seconds: float, keep_last: int = 2):
+        super().__init__()
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        # The parent checkpoint holds the pending sends of the latest one
+        self.keep_last = max(keep_last, 2)
+        self._last_used: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            if thread_id not in self._last_used:
+                # Avoid creating empty entries in the underlying defaultdict
+                return None
+            self._touch(thread_id)
+            return super().get_tuple(config)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            saved_config = super().put(config, checkpoint, metadata, new_versions)
+            self._touch(thread_id)
+            self._compact(thread_id, config["configurable"]["checkpoint_ns"])
+            self._evict()
+            return saved_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._last_used.pop(thread_id, None)
+            namespaces = self.storage.pop(thread_id, {})
+            for checkpoint_ns, checkpoints in namespaces.items():
+                for checkpoint_id in checkpoints:
+                    self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+    def _touch(self, thread_id: str) -> None:
+        self._last_used[thread_id] = time.monotonic()
+        self._last_used.move_to_end(thread_id)
+
+    def _compact(self, thread_id: str, checkpoint_ns: str) -> None:
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.keep_last:
+            return
+        for checkpoint_id in sorted(checkpoints)[: -self.keep_last]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+    def _evict(self) -> None:
+        expires_before = time.monotonic() - self.ttl_seconds
+        while self._last_used:
+            thread_id, last_used = next(iter(self._last_used.items()))
+            if len(self._last_used) <= self.max_threads and last_used >= expires_before:
+                break
+            self.delete_thread(thread_id)
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    A checkpointer that persists conversation state to a SQLite database.
+
+    With the database on the mounted volume, state survives container restarts and
+    is shared by every agent in the process. As with BoundedMemorySaver only the last
+    `keep_last` checkpoints of a thread are stored, and idle or least recently used
+    threads beyond `max_threads` are pruned periodically.
+
+    The database must have a single writing process: wrapped in a
+    CachedCheckpointSaver, each process serves the latest checkpoints from its own
+    cache, which other processes cannot invalidate.
+    """
+
+    PRUNE_INTERVAL_SECONDS = 300
+
+    def __init__(
+        self,
+        path: str,
+        max_threads: int,
+        ttl_seconds: float,
+        keep_last: int = 2,
+        journal_mode: str = "WAL",
+    ):
+        super().__init__()
+        self.path = Path(path)
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.keep_last = max(keep_last, 2)
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock, self.conn:
+            set_journal_mode(self.conn, journal_mode)
+            self.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL DEFAULT '',
+                    checkpoint_id TEXT NOT NULL,
+                    parent_checkpoint_id TEXT,
+                    type TEXT,
+                    checkpoint BLOB,
+                    metadata_type TEXT,
+                    metadata BLOB,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+                );
+                CREATE TABLE IF NOT EXISTS writes (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL DEFAULT '',
+                    checkpoint_id TEXT NOT NULL,
+                    task_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    channel TEXT NOT NULL,
+                    type TEXT,
+                    value BLOB,
+                    task_path TEXT NOT NULL DEFAULT '',
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+                );
+                CREATE TABLE IF NOT EXISTS threads (
+                    thread_id TEXT PRIMARY KEY,
+                    last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS threads_last_used ON threads (last_used);
+                """
+            )
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.conn.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+                    "metadata_type, metadata FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+                    "metadata_type, metadata FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            if row is None:
+                return None
+            return self._load_tuple(thread_id, checkpoint_ns, row)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,  # noqa: A002
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, "
+            "checkpoint, metadata_type, metadata FROM checkpoints"
+        )
+        clauses: list[str] = []
+        params: list[Any] = []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_checkpoint_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_checkpoint_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+            results: list[CheckpointTuple] = []
+            for thread_id, checkpoint_ns, *row in rows:
+                if limit is not None and len(results) >= limit:
+                    break
+                checkpoint_tuple = self._load_tuple(thread_id, checkpoint_ns, row)
+                if filter and not all(
+                    checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()
+                ):
+                    continue
+                results.append(checkpoint_tuple)
+        yield from results
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        c = checkpoint.copy()
+        c.pop("pending_sends")  # type: ignore[misc]
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(c)
+        metadata_type, metadata_blob = self.serde.dumps_typed(
+            get_checkpoint_metadata(config, metadata)
+        )
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    checkpoint_type,
+                    checkpoint_blob,
+                    metadata_type,
+                    metadata_blob,
+                ),
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO threads VALUES (?, ?)", (thread_id, time.time())
+            )
+            self._compact(thread_id, checkpoint_ns)
+            self._maybe_prune()
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._lock, self.conn:
+            for idx, (channel, value) in enumerate(writes):
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                value_type, value_blob = self.serde.dumps_typed(value)
+                # Regular writes are never overwritten, special ones always are
+                verb = "INSERT OR IGNORE" if write_idx >= 0 else "INSERT OR REPLACE"
+                self.conn.execute(
+                    f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id,
+                        checkpoint_ns,
+                        checkpoint_id,
+                        task_id,
+                        write_idx,
+                        channel,
+                        value_type,
+                        value_blob,
+                        task_path,
+                    ),
+                )
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,  # noqa: A002
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await run_to_completion(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await run_to_completion(self.put_writes, config, writes, task_id, task_path)
+
+    def get_next_version(self, current: str | None, channel: ChannelProtocol) -> str:
+        return _next_version(current)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock, self.conn:
+            self._delete_threads([thread_id])
+
+    def prune(self) -> None:
+        """
+        Drop threads that expired or fall outside the `max_threads` most recently used.
+        """
+        with self._lock, self.conn:
+            self._prune()
+
+    def _load_tuple(
+        self, thread_id: str, checkpoint_ns: str, row: Sequence[Any]
+    ) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, checkpoint_type, checkpoint_blob = row[:4]
+        metadata_type, metadata_blob = row[4:6]
+        writes = self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+            "ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        sends = []
+        if parent_checkpoint_id:
+            sends = self.conn.execute(
+                "SELECT type, value FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? AND channel = ? "
+                "ORDER BY task_path, task_id, idx",
+                (thread_id, checkpoint_ns, parent_checkpoint_id, TASKS),
+            ).fetchall()
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **self.serde.loads_typed((checkpoint_type, checkpoint_blob)),
+                "pending_sends": [self.serde.loads_typed(send) for send in sends],
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata_blob)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+        )
+
+    def _compact(self, thread_id: str, checkpoint_ns: str) -> None:
+        stale = self.conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_last),
+        ).fetchall()
+        for (checkpoint_id,) in stale:
+            for table in ("checkpoints", "writes"):
+                self.conn.execute(
+                    f"DELETE FROM {table} "  # noqa: S608
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                )
+
+    def _maybe_prune(self) -> None:
+        now = time.monotonic()
+        if now - self._last_prune >= self.PRUNE_INTERVAL_SECONDS:
+            self._last_prune = now
+            self._prune()
+
+    def _prune(self) -> None:
+        expired = self.conn.execute(
+            "SELECT thread_id FROM threads WHERE last_used < ?",
+            (time.time() - self.ttl_seconds,),
+        ).fetchall()
+        evicted = self.conn.execute(
+            "SELECT thread_id FROM threads ORDER BY last_used DESC LIMIT -1 OFFSET ?",
+            (self.max_threads,),
+        ).fetchall()
+        self._delete_threads([thread_id for (thread_id,) in {*expired, *evicted}])
+
+    def _delete_threads(self, thread_ids: Sequence[str]) -> None:
+        for table in ("checkpoints", "writes", "threads"):
+            self.conn.executemany(
+                f"DELETE FROM {table} WHERE thread_id = ?",  # noqa: S608
+                [(thread_id,) for thread_id in thread_ids],
+            )
+
+
+class CachedCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    A bounded in-process read cache in front of another checkpointer.
+
+    The latest checkpoint of the most recently used threads is kept in an LRU of at
+    most `maxsize` entries. Writes go straight to the backend and then invalidate the
+    cached entries of their thread. Only writes made through this instance do, so the
+    backend must not be written by another process.
+
+    Every write gives its thread a new generation. A read that missed the cache only
+    stores what it loaded if the generation of the thread did not change meanwhile, so
+    a read racing a write can't put the checkpoint the write replaced back in the
+    cache.
+
+    The graph updates the checkpoints it loads in place (such as their channel
+    versions), so the cache keeps a copy of each tuple and returns a new copy on
+    every read. Only the containers are copied: a deep copy costs as much as loading
+    the checkpoint from SQLite (see benchmarks/checkpoint.py), while the messages
+    and other values they hold are replaced rather than changed by the graph.
+    """
+
+    def __init__(self, backend: BaseCheckpointSaver, maxsize: int):
+        super().__init__(serde=backend.serde)
+        self.backend = backend
+        self.maxsize = maxsize
+        self._cache: OrderedDict[tuple[str, str], CheckpointTuple | None] = OrderedDict()
+        # Generation of the recently written threads; the others are at _min_generation
+        self._generations: OrderedDict[str, int] = OrderedDict()
+        self._min_generation = 0
+        self._next_generation = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        if get_checkpoint_id(config):
+            return self.backend.get_tuple(config)
+
+        key = self._key(config)
+        hit, checkpoint_tuple, generation = self._lookup(key)
+        if not hit:
+            checkpoint_tuple = self.backend.get_tuple(config)
+            self._store(key, checkpoint_tuple, generation)
+        return checkpoint_tuple
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,  # noqa: A002
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        return self.backend.list(config, filter=filter, before=before, limit=limit)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        try:
+            return self.backend.put(config, checkpoint, metadata, new_versions)
+        finally:
+            self._invalidate(config)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        try:
+            self.backend.put_writes(config, writes, task_id, task_path)
+        finally:
+            self._invalidate(config)
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        if get_checkpoint_id(config):
+            return await self.backend.aget_tuple(config)
+
+        key = self._key(config)
+        hit, checkpoint_tuple, generation = self._lookup(key)
+        if not hit:
+            checkpoint_tuple = await self.backend.aget_tuple(config)
+            self._store(key, checkpoint_tuple, generation)
+        return checkpoint_tuple
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,  # noqa: A002
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        async for item in self.backend.alist(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        try:
+            return await self.backend.aput(config, checkpoint, metadata, new_versions)
+        finally:
+            self._invalidate(config)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        try:
+            await self.backend.aput_writes(config, writes, task_id, task_path)
+        finally:
+            self._invalidate(config)
+
+    def get_next_version(self, current: str | None, channel: ChannelProtocol) -> str:
+        return self.backend.get_next_version(current, channel)
+
+    def _key(self, config: RunnableConfig) -> tuple[str, str]:
+        configurable = config["configurable"]
+        return configurable["thread_id"], configurable.get("checkpoint_ns", "")
+
+    def _lookup(self, key: tuple[str, str]) -> tuple[bool, CheckpointTuple | None, int]:
+        with self._lock:
+            generation = self._generations.get(key[0], self._min_generation)
+            if key not in self._cache:
+                return False, None, generation
+            self._cache.move_to_end(key)
+            return True, _copy_tuple(self._cache[key]), generation
+
+    def _store(
+        self, key: tuple[str, str], checkpoint_tuple: CheckpointTuple | None, generation: int
+    ) -> None:
+        checkpoint_tuple = _copy_tuple(checkpoint_tuple)
+        with self._lock:
+            if self._generations.get(key[0], self._min_generation) != generation:
+                # The thread was written while the tuple was loaded, it may be stale
+                return
+            self._cache[key] = checkpoint_tuple
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def _invalidate(self, config: RunnableConfig) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            self._generations[thread_id] = next(self._next_generation)
+            self._generations.move_to_end(thread_id)
+            while len(self._generations) > self.maxsize:
+                # Threads forgotten here fall back to the newest forgotten generation, so
+                # a read that started before it can't store what it loaded
+                _, self._min_generation = self._generations.popitem(last=False)
+            for key in [key for key in self._cache if key[0] == thread_id]:
+                del self._cache[key]
@@ -0,0 +1,23 @@
+import json
+from typing import Any
+
+# orjson is considerably faster and is usually installed (langsmith depends on it),
+# but the standard library is used when it is not available.
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def dumps(data: Any) -> bytes:
+    """Serialize to compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def loads(data: bytes | str) -> Any:
+    """Deserialize JSON produced by dumps (or any other JSON)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
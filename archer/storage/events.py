@@ -0,0 +1,87 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from archer.storage.schema import EventStore
+from archer.storage.sqlite import set_journal_mode
+
+
+class MemoryEventStore(EventStore):
+    """
+    Remembers processed event ids in this process for `ttl_seconds`.
+
+    Lookups are a dict access; since every entry has the same TTL, insertion
+    order is expiry order and expired ids are dropped from the front.
+    """
+
+    def __init__(self, ttl_seconds: float, maxsize: int = 100_000):
+        super().__init__()
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self._expires: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def seen(self, event_id: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._expires and (
+                next(iter(self._expires.values())) < now or len(self._expires) >= self.maxsize
+            ):
+                self._expires.popitem(last=False)
+
+            if event_id in self._expires:
+                self.hits += 1
+                return True
+            self._expires[event_id] = now + self.ttl_seconds
+            self.misses += 1
+            return False
+
+
+class SqliteEventStore(EventStore):
+    """
+    Remembers processed event ids in a SQLite database shared by the processes
+    of one host, such as the workers of a server.
+
+    The insert is atomic, so when two processes receive the same event only one
+    of them claims it. SQLite's locking is not reliable on network storage, so
+    containers that share a volume cannot use this to claim events.
+    """
+
+    PURGE_INTERVAL_SECONDS = 60
+
+    def __init__(self, path: str, ttl_seconds: float, journal_mode: str = "WAL"):
+        super().__init__()
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5)
+        with self._lock, self.conn:
+            set_journal_mode(self.conn, journal_mode)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                "event_id TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+            )
+
+    def seen(self, event_id: str) -> bool:
+        now = time.time()
+        with self._lock, self.conn:
+            # Claims the id unless a live entry exists; an expired one is taken over
+            cursor = self.conn.execute(
+                "INSERT INTO events VALUES (?, ?) ON CONFLICT (event_id) "
+                "DO UPDATE SET expires_at = excluded.expires_at WHERE events.expires_at < ?",
+                (event_id, now + self.ttl_seconds, now),
+            )
+            if now - self._last_purge >= self.PURGE_INTERVAL_SECONDS:
+                self._last_purge = now
+                self.conn.execute("DELETE FROM events WHERE expires_at < ?", (now,))
+
+        if cursor.rowcount == 0:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
@@ -1,14 +1,23 @@
-import json
+import fcntl
+import hashlib
+import os
+import tempfile
 from logging import Logger
 from pathlib import Path
+from typing import Any
 
+from archer.storage.codec import dumps, loads
 from archer.storage.schema import StateStore, StorageResourceError, UserIdentity
 
 
 class FileStore(StateStore):
-    def __init__(self, base_dir: str, logger: Logger):
+    # Name of the file in each directory that writes to the directory are locked on
+    LOCK_FILE = ".lock"
+
+    def __init__(self, base_dir: str, logger: Logger, fsync: bool = True):
         self.base_dir = Path(base_dir)
         self.logger = logger
+        self.fsync = fsync
         self.user_dir = self.base_dir / "users"
         self.state_dir = self.base_dir / "states"
 
@@ -16,41 +25,100 @@ class FileStore(StateStore):
         self.user_dir.mkdir(parents=True, exist_ok=True)
         self.state_dir.mkdir(parents=True, exist_ok=True)
 
+    @staticmethod
+    def _check_state_id(state_id: str) -> None:
+        # State ids become file names, so they must not reach outside the states directory
+        if not state_id or Path(state_id).name != state_id:
+            raise StorageResourceError(f"Invalid state id {state_id!r}")
+
     def _get_user_path(self, user_id: str) -> Path:
         return self.user_dir / f"{user_id}.json"
 
     def _get_state_path(self, state_id: str) -> Path:
+        self._check_state_id(state_id)
+        # Agent states are sharded into states/ab/cd/ so no directory grows too large
+        digest = hashlib.sha1(state_id.encode()).hexdigest()  # noqa: S324
+        return self.state_dir / digest[:2] / digest[2:4] / f"{state_id}.json"
+
+    def _get_legacy_state_path(self, state_id: str) -> Path:
+        self._check_state_id(state_id)
         return self.state_dir / f"{state_id}.json"
 
+    def _write(self, path: Path, data: Any) -> None:
+        """
+        Atomically replace the file at path with the serialized data.
+
+        The data is written to a temporary file in the same directory and renamed
+        over the target, so readers (in any process) see either the old or the new
+        content, never a partial write. Writers of the directory, in this or another
+        process, hold an exclusive flock on its lock file, so they replace files one
+        at a time. Unless `fsync` is off, the data is flushed to disk before the
+        rename, so a crash can't leave an empty file behind.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path.parent / self.LOCK_FILE, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(dumps(data))
+                    if self.fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+
+    def _read(self, path: Path) -> Any:
+        with open(path, "rb") as f:
+            return loads(f.read())
+
     def set_state(self, user_identity: UserIdentity) -> None:
         user_path = self._get_user_path(user_identity["user_id"])
-        with open(user_path, "w") as f:
-            json.dump(user_identity, f, indent=2)
+        self._write(user_path, user_identity)
 
     def get_state(self, user_id: str) -> UserIdentity:
         user_path = self._get_user_path(user_id)
-        if not user_path.exists():
-            raise StorageResourceError(f"User {user_id} not found")
-
-        with open(user_path) as f:
-            return json.load(f)
+        try:
+            return self._read(user_path)
+        except FileNotFoundError:
+            raise StorageResourceError(f"User {user_id} not found") from None
 
     def update_state(self, user_identity: UserIdentity) -> None:
         self.set_state(user_identity)
 
     def save_agent_state(self, state_id: str, state_data: dict) -> None:
         state_path = self._get_state_path(state_id)
-        with open(state_path, "w") as f:
-            json.dump(state_data, f, indent=2)
+        self._write(state_path, state_data)
 
     def get_agent_state(self, state_id: str) -> dict:
-        state_path = self._get_state_path(state_id)
-        if not state_path.exists():
-            raise StorageResourceError(f"State {state_id} not found")
+        for state_path in (self._get_state_path(state_id), self._get_legacy_state_path(state_id)):
+            try:
+                return self._read(state_path)
+            except FileNotFoundError:
+                continue
+        raise StorageResourceError(f"State {state_id} not found")
 
-        with open(state_path) as f:
-            return json.load(f)
+    def delete_agent_states(self, prefix: str, before: float) -> int:
+        self._check_state_id(prefix)
+        deleted = 0
+        for pattern in (f"*/*/{prefix}*.json", f"{prefix}*.json"):
+            for state_path in self.state_dir.glob(pattern):
+                try:
+                    if state_path.stat().st_mtime < before:
+                        state_path.unlink()
+                        deleted += 1
+                except FileNotFoundError:
+                    continue
+        return deleted
 
     def exists(self, user_id: str) -> bool:
         user_path = self._get_user_path(user_id)
         return user_path.exists()
+
+    def get_version(self, user_id: str) -> int | None:
+        try:
+            return self._get_user_path(user_id).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
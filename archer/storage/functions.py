@@ -1,38 +1,208 @@
 import logging
+import os
+import time
+from dataclasses import dataclass
 from typing import TYPE_CHECKING
 
-from archer.env import FILE_STORAGE_BASE_DIR, STORAGE_TYPE
+from archer.env import (
+    CHECKPOINT_CACHE_SIZE,
+    CHECKPOINT_KEEP_LAST,
+    CHECKPOINT_MAX_THREADS,
+    CHECKPOINT_TTL_SECONDS,
+    CHECKPOINT_TYPE,
+    DATABASE_POOL_SIZE,
+    DATABASE_URL,
+    DEDUP_STORE_TYPE,
+    DEDUP_TTL_SECONDS,
+    FILE_STORAGE_BASE_DIR,
+    FILE_STORAGE_FSYNC,
+    SQLITE_JOURNAL_MODE,
+    STORAGE_TYPE,
+    USER_CACHE_TTL_SECONDS,
+)
+from archer.metrics import USER_STATE_SECONDS, timed
+from archer.storage.checkpoint import (
+    BoundedMemorySaver,
+    CachedCheckpointSaver,
+    SqliteCheckpointSaver,
+)
+from archer.storage.events import MemoryEventStore, SqliteEventStore
 from archer.storage.file import FileStore
 from archer.storage.schema import UserIdentity
+from archer.storage.sqlite import SqliteStore
 
 if TYPE_CHECKING:
-    from archer.storage.schema import StateStore
+    from langgraph.checkpoint.base import BaseCheckpointSaver
+    from psycopg_pool import ConnectionPool
+
+    from archer.storage.schema import EventStore, StateStore
 
 logger = logging.getLogger(__name__)
 
+# Process-wide state store.
+_store: "StateStore | None" = None
+# Process-wide checkpointer, shared by the agents of every model.
+_checkpointer: "BaseCheckpointSaver | None" = None
+# Process-wide store of processed Slack event ids.
+_event_store: "EventStore | None" = None
+# Process-wide pool of connections to the Postgres database, if one is used.
+_database: "ConnectionPool | None" = None
+
+
+@dataclass
+class _CachedUserState:
+    state: UserIdentity
+    version: int | None
+    checked_at: float
+
+
+# Read cache of user states, kept coherent with the store through its version.
+_user_cache: dict[str, _CachedUserState] = {}
+
 
 def get_store() -> "StateStore":
-    if STORAGE_TYPE == "file":
-        return FileStore(base_dir=FILE_STORAGE_BASE_DIR, logger=logger)
-    else:
-        msg = f"Invalid storage type: {STORAGE_TYPE}"
-        logger.error(msg)
-        raise ValueError(msg)
+    global _store
+
+    if _store is None:
+        if STORAGE_TYPE == "file":
+            _store = FileStore(
+                base_dir=FILE_STORAGE_BASE_DIR, logger=logger, fsync=FILE_STORAGE_FSYNC
+            )
+        elif STORAGE_TYPE == "sqlite":
+            sqlite_store = SqliteStore(
+                path=os.path.join(FILE_STORAGE_BASE_DIR, "archer.sqlite"),
+                logger=logger,
+                journal_mode=SQLITE_JOURNAL_MODE,
+            )
+            if sqlite_store.is_empty():
+                # Migrate the users saved by the FileStore into the new database
+                imported = sqlite_store.import_file_store(
+                    FileStore(base_dir=FILE_STORAGE_BASE_DIR, logger=logger)
+                )
+                logger.info(f"Imported {imported} users from file storage")
+            _store = sqlite_store
+        else:
+            msg = f"Invalid storage type: {STORAGE_TYPE}"
+            logger.error(msg)
+            raise ValueError(msg)
+    return _store
+
+
+def get_database() -> "ConnectionPool":
+    """
+    Return the pool of connections to DATABASE_URL, used by the "postgres" stores.
+
+    Needs the `postgres` extra of the package.
+    """
+    global _database
+
+    if _database is None:
+        if not DATABASE_URL:
+            msg = "DATABASE_URL must be set to use the postgres stores"
+            logger.error(msg)
+            raise ValueError(msg)
+        from archer.storage.postgres import connect
+
+        _database = connect(DATABASE_URL, max_size=DATABASE_POOL_SIZE)
+    return _database
+
+
+def get_checkpointer() -> "BaseCheckpointSaver":
+    global _checkpointer
+
+    if _checkpointer is None:
+        if CHECKPOINT_TYPE == "memory":
+            _checkpointer = BoundedMemorySaver(
+                max_threads=CHECKPOINT_MAX_THREADS,
+                ttl_seconds=CHECKPOINT_TTL_SECONDS,
+                keep_last=CHECKPOINT_KEEP_LAST,
+            )
+        elif CHECKPOINT_TYPE == "sqlite":
+            backend = SqliteCheckpointSaver(
+                path=os.path.join(FILE_STORAGE_BASE_DIR, "checkpoints.sqlite"),
+                max_threads=CHECKPOINT_MAX_THREADS,
+                ttl_seconds=CHECKPOINT_TTL_SECONDS,
+                keep_last=CHECKPOINT_KEEP_LAST,
+                journal_mode=SQLITE_JOURNAL_MODE,
+            )
+            _checkpointer = CachedCheckpointSaver(backend, maxsize=CHECKPOINT_CACHE_SIZE)
+        elif CHECKPOINT_TYPE == "postgres":
+            from archer.storage.postgres import PostgresCheckpointSaver
+
+            _checkpointer = PostgresCheckpointSaver(
+                get_database(), ttl_seconds=CHECKPOINT_TTL_SECONDS
+            )
+        else:
+            msg = f"Invalid checkpoint type: {CHECKPOINT_TYPE}"
+            logger.error(msg)
+            raise ValueError(msg)
+    return _checkpointer
+
+
+def get_event_store() -> "EventStore":
+    global _event_store
+
+    if _event_store is None:
+        if DEDUP_STORE_TYPE == "memory":
+            _event_store = MemoryEventStore(ttl_seconds=DEDUP_TTL_SECONDS)
+        elif DEDUP_STORE_TYPE == "sqlite":
+            _event_store = SqliteEventStore(
+                path=os.path.join(FILE_STORAGE_BASE_DIR, "events.sqlite"),
+                ttl_seconds=DEDUP_TTL_SECONDS,
+                journal_mode=SQLITE_JOURNAL_MODE,
+            )
+        elif DEDUP_STORE_TYPE == "postgres":
+            from archer.storage.postgres import PostgresEventStore
+
+            _event_store = PostgresEventStore(get_database(), ttl_seconds=DEDUP_TTL_SECONDS)
+        else:
+            msg = f"Invalid dedup store type: {DEDUP_STORE_TYPE}"
+            logger.error(msg)
+            raise ValueError(msg)
+    return _event_store
+
+
+def _cache_user_state(store: "StateStore", user_state: UserIdentity) -> None:
+    _user_cache[user_state["user_id"]] = _CachedUserState(
+        state=UserIdentity(**user_state),
+        version=store.get_version(user_state["user_id"]),
+        checked_at=time.monotonic(),
+    )
 
 
 def set_user_state(user_id: str, provider: str, model: str) -> UserIdentity:
     user = UserIdentity(user_id=user_id, provider=provider, model=model)
     store = get_store()
     store.set_state(user)
+    _cache_user_state(store, user)
     return user
 
 
+@timed(USER_STATE_SECONDS)
 def get_user_state(user_id: str) -> UserIdentity:
+    """
+    Return the user's state, served from the process cache when possible.
+
+    A cached entry is trusted for USER_CACHE_TTL_SECONDS; after that the store's
+    version (the file mtime for FileStore) is compared, so writes made by other
+    replicas are picked up without re-reading unchanged state.
+    """
+    cached = _user_cache.get(user_id)
+    now = time.monotonic()
+    if cached and now - cached.checked_at < USER_CACHE_TTL_SECONDS:
+        return UserIdentity(**cached.state)
+
     store = get_store()
-    if store.exists(user_id):
-        return store.get_state(user_id)
-    else:
+    version = store.get_version(user_id)
+    if version is None:
         return set_user_state(user_id, "openai", "gpt-4o")
+    if cached and cached.version == version:
+        cached.checked_at = now
+        return UserIdentity(**cached.state)
+
+    user_state = store.get_state(user_id)
+    _user_cache[user_id] = _CachedUserState(state=user_state, version=version, checked_at=now)
+    return UserIdentity(**user_state)
 
 
 def update_user_state(user_id: str, provider: str | None = None, model: str | None = None) -> None:
@@ -44,3 +214,4 @@ def update_user_state(user_id: str, provider: str | None = None, model: str | No
 
     store = get_store()
     store.update_state(user_state)
+    _cache_user_state(store, user_state)
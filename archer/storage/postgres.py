@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.postgres import PostgresSaver
+from psycopg_pool import ConnectionPool
+
+from archer.storage.checkpoint import run_to_completion
+from archer.storage.schema import EventStore
+
+logger = logging.getLogger(__name__)
+
+_EXPIRED_THREADS = (
+    "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING max(checkpoint->>'ts') < %s"
+)
+
+# Claims the id unless a live entry exists; an expired one is taken over
+_CLAIM_EVENT = (
+    "INSERT INTO slack_events VALUES (%s, %s) ON CONFLICT (event_id) "
+    "DO UPDATE SET expires_at = excluded.expires_at WHERE slack_events.expires_at < %s"
+)
+
+
+def connect(url: str, max_size: int) -> ConnectionPool:
+    """
+    Open a pool of connections to the Postgres database at `url`.
+    """
+    return ConnectionPool(
+        conninfo=url,
+        max_size=max_size,
+        kwargs={"autocommit": True, "prepare_threshold": 0},
+        open=True,
+    )
+
+
+class PostgresCheckpointSaver(PostgresSaver):
+    """
+    A checkpointer that persists conversation state to a Postgres database.
+
+    Unlike SqliteCheckpointSaver, the database can be written by any number of
+    replicas, so the deployment can scale out. It is not wrapped in a
+    CachedCheckpointSaver for the same reason: the cache of one replica can't see
+    the writes of another. Threads whose latest checkpoint is older than
+    `ttl_seconds` are deleted periodically.
+
+    PostgresSaver only implements the synchronous methods; the async ones run them
+    in a worker thread, as SqliteCheckpointSaver does.
+    """
+
+    PRUNE_INTERVAL_SECONDS = 300
+
+    def __init__(self, pool: ConnectionPool, ttl_seconds: float):
+        super().__init__(pool)
+        self.ttl_seconds = ttl_seconds
+        self._last_prune = 0.0
+        self.setup()
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        self._maybe_prune()
+        return next_config
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,  # noqa: A002
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await run_to_completion(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await run_to_completion(self.put_writes, config, writes, task_id, task_path)
+
+    def prune(self) -> None:
+        """
+        Delete the threads whose latest checkpoint is older than the TTL.
+        """
+        expired_before = datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds)
+        with self._cursor() as cur:
+            cur.execute(_EXPIRED_THREADS, (expired_before.isoformat(),))
+            thread_ids = [row["thread_id"] for row in cur.fetchall()]
+            for table in ("checkpoint_writes", "checkpoint_blobs", "checkpoints"):
+                cur.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ANY(%s)",  # noqa: S608
+                    (thread_ids,),
+                )
+        if thread_ids:
+            logger.info(f"Deleted the checkpoints of {len(thread_ids)} expired threads")
+
+    def _maybe_prune(self) -> None:
+        now = time.monotonic()
+        if now - self._last_prune < self.PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_prune = now
+        try:
+            self.prune()
+        except Exception as e:
+            logger.warning(f"Could not delete expired checkpoints: {e}")
+
+
+class PostgresEventStore(EventStore):
+    """
+    Remembers processed event ids in a Postgres database shared by every replica.
+
+    As with SqliteEventStore the insert is atomic, so when Slack delivers the same
+    event to two replicas only one of them claims it.
+    """
+
+    PURGE_INTERVAL_SECONDS = 60
+
+    def __init__(self, pool: ConnectionPool, ttl_seconds: float):
+        super().__init__()
+        self.pool = pool
+        self.ttl_seconds = ttl_seconds
+        self._last_purge = 0.0
+        with self.pool.connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS slack_events ("
+                "event_id TEXT PRIMARY KEY, expires_at DOUBLE PRECISION NOT NULL)"
+            )
+
+    def seen(self, event_id: str) -> bool:
+        now = time.time()
+        with self.pool.connection() as conn:
+            claimed = conn.execute(_CLAIM_EVENT, (event_id, now + self.ttl_seconds, now)).rowcount
+            if now - self._last_purge >= self.PURGE_INTERVAL_SECONDS:
+                self._last_purge = now
+                conn.execute("DELETE FROM slack_events WHERE expires_at < %s", (now,))
+
+        if claimed == 0:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
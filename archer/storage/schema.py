@@ -32,9 +32,40 @@ class StateStore:
     def get_agent_state(self, state_id: str) -> dict:
         pass
 
+    def delete_agent_states(self, prefix: str, before: float) -> int:
+        """
+        Delete the agent states whose id starts with prefix and that were last saved
+        before the given Unix time. Return the number of states deleted.
+        """
+        return 0
+
     def exists(self, user_id: str) -> bool:
         pass
 
+    def get_version(self, user_id: str) -> int | None:
+        """Return a value that changes whenever the user's state is written, None if missing."""
+        pass
+
+    def get_states(self, user_ids: list[str]) -> dict[str, "UserIdentity"]:
+        """Return the states of the given users that exist, keyed by user id."""
+        return {user_id: self.get_state(user_id) for user_id in user_ids if self.exists(user_id)}
+
+    def set_states(self, user_identities: list["UserIdentity"]) -> None:
+        for user_identity in user_identities:
+            self.set_state(user_identity)
+
+
+class EventStore:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def seen(self, event_id: str) -> bool:
+        pass
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
 
 class UserIdentity(TypedDict):
     user_id: str
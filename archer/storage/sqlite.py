@@ -0,0 +1,181 @@
+import queue
+import sqlite3
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from logging import Logger
+from pathlib import Path
+
+from archer.storage.codec import dumps, loads
+from archer.storage.file import FileStore
+from archer.storage.schema import (
+    StateStore,
+    StorageConnectionError,
+    StorageResourceError,
+    UserIdentity,
+)
+
+# Statements are kept as constants so each pooled connection's statement cache
+# reuses the prepared statement instead of compiling the SQL again.
+_GET_USER = "SELECT data FROM users WHERE user_id = ?"
+_GET_USER_VERSION = "SELECT version FROM users WHERE user_id = ?"
+_SET_USER = (
+    "INSERT INTO users (user_id, data, version) VALUES (?, ?, 1) "
+    "ON CONFLICT (user_id) DO UPDATE SET data = excluded.data, version = users.version + 1"
+)
+_IMPORT_USER = "INSERT OR IGNORE INTO users (user_id, data, version) VALUES (?, ?, 1)"
+_GET_AGENT_STATE = "SELECT data FROM agent_states WHERE state_id = ?"
+_SET_AGENT_STATE = (
+    "INSERT OR REPLACE INTO agent_states (state_id, data, updated_at) VALUES (?, ?, ?)"
+)
+_DELETE_AGENT_STATES = (
+    "DELETE FROM agent_states WHERE substr(state_id, 1, ?) = ? AND updated_at < ?"
+)
+
+# Stay below SQLite's default limit on host parameters per statement
+_BATCH_SIZE = 500
+
+JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "WAL")
+
+
+def set_journal_mode(conn: sqlite3.Connection, journal_mode: str) -> None:
+    """
+    Set the journal mode of a connection, see SQLITE_JOURNAL_MODE in archer.env.
+    """
+    if journal_mode not in JOURNAL_MODES:
+        raise ValueError(f"Invalid SQLite journal mode: {journal_mode}")
+    conn.execute(f"PRAGMA journal_mode={journal_mode}")
+    # Without WAL, only FULL syncs are safe against corruption on power loss
+    conn.execute(f"PRAGMA synchronous={'NORMAL' if journal_mode == 'WAL' else 'FULL'}")
+
+
+class SqliteStore(StateStore):
+    """
+    A StateStore backed by a SQLite database, in WAL mode unless `journal_mode`
+    says otherwise.
+
+    Connections are pooled so that readers in different threads do not wait on
+    each other, and users can be read and written in batches.
+    """
+
+    def __init__(self, path: str, logger: Logger, pool_size: int = 4, journal_mode: str = "WAL"):
+        self.path = Path(path)
+        self.logger = logger
+        self.journal_mode = journal_mode
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._pool: queue.Queue[sqlite3.Connection] = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+
+        with self._connection() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS users (
+                    user_id TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    version INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS agent_states (
+                    state_id TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        try:
+            conn = sqlite3.connect(
+                str(self.path), check_same_thread=False, timeout=10, cached_statements=64
+            )
+        except sqlite3.Error as e:
+            raise StorageConnectionError(f"Could not open {self.path}: {e}") from e
+        set_journal_mode(conn, self.journal_mode)
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._pool.get()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._pool.put(conn)
+
+    def set_state(self, user_identity: UserIdentity) -> None:
+        with self._connection() as conn:
+            conn.execute(_SET_USER, (user_identity["user_id"], dumps(user_identity)))
+
+    def get_state(self, user_id: str) -> UserIdentity:
+        with self._connection() as conn:
+            row = conn.execute(_GET_USER, (user_id,)).fetchone()
+        if row is None:
+            raise StorageResourceError(f"User {user_id} not found")
+        return loads(row[0])
+
+    def update_state(self, user_identity: UserIdentity) -> None:
+        self.set_state(user_identity)
+
+    def save_agent_state(self, state_id: str, state_data: dict) -> None:
+        with self._connection() as conn:
+            conn.execute(_SET_AGENT_STATE, (state_id, dumps(state_data), time.time()))
+
+    def get_agent_state(self, state_id: str) -> dict:
+        with self._connection() as conn:
+            row = conn.execute(_GET_AGENT_STATE, (state_id,)).fetchone()
+        if row is None:
+            raise StorageResourceError(f"State {state_id} not found")
+        return loads(row[0])
+
+    def delete_agent_states(self, prefix: str, before: float) -> int:
+        with self._connection() as conn:
+            cursor = conn.execute(_DELETE_AGENT_STATES, (len(prefix), prefix, before))
+        return cursor.rowcount
+
+    def exists(self, user_id: str) -> bool:
+        return self.get_version(user_id) is not None
+
+    def get_version(self, user_id: str) -> int | None:
+        with self._connection() as conn:
+            row = conn.execute(_GET_USER_VERSION, (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def get_states(self, user_ids: list[str]) -> dict[str, UserIdentity]:
+        states: dict[str, UserIdentity] = {}
+        with self._connection() as conn:
+            for start in range(0, len(user_ids), _BATCH_SIZE):
+                batch = user_ids[start : start + _BATCH_SIZE]
+                rows = conn.execute(
+                    "SELECT user_id, data FROM users "  # noqa: S608
+                    f"WHERE user_id IN ({', '.join('?' * len(batch))})",
+                    batch,
+                )
+                states.update((user_id, loads(data)) for user_id, data in rows)
+        return states
+
+    def set_states(self, user_identities: list[UserIdentity]) -> None:
+        with self._connection() as conn:
+            conn.executemany(
+                _SET_USER, [(user["user_id"], dumps(user)) for user in user_identities]
+            )
+
+    def is_empty(self) -> bool:
+        with self._connection() as conn:
+            return conn.execute("SELECT 1 FROM users LIMIT 1").fetchone() is None
+
+    def import_file_store(self, file_store: FileStore) -> int:
+        """
+        Import the users of a FileStore (data/users/*.json) that are not in this store yet.
+
+        Returns the number of users read from the FileStore.
+        """
+        users = []
+        for user_path in file_store.user_dir.glob("*.json"):
+            try:
+                users.append(file_store.get_state(user_path.stem))
+            except Exception:
+                self.logger.exception(f"Skipping unreadable user state {user_path}")
+        with self._connection() as conn:
+            conn.executemany(_IMPORT_USER, [(user["user_id"], dumps(user)) for user in users])
+        return len(users)
@@ -7,6 +7,8 @@ def get_formatted_times(user_timezone: str | None = None) -> str:
 
     This helps the LLM provide accurate time-based information regardless of user location.
     Includes UTC, Eastern Time (ET), Central Time (CT), Pacific Time (PT), and GMT.
+    Times are given to the minute, which is all the LLM needs and keeps the text
+    unchanged between requests made within the same minute.
     """
     # Get current UTC time
     utc_now = datetime.now(timezone.utc)
@@ -46,10 +48,10 @@ def get_formatted_times(user_timezone: str | None = None) -> str:
     # Format the time string
     time_strings = []
     date_format = "%Y-%m-%d"
-    time_format = "%H:%M:%S"
+    time_format = "%H:%M"
 
     for zone_name, offset in time_zones.items():
-        zone_time = utc_now.replace(tzinfo=timezone(timedelta(hours=offset)))
+        zone_time = utc_now.astimezone(timezone(timedelta(hours=offset)))
         time_strings.append(f"{zone_name}: {zone_time.strftime(f'{date_format} {time_format}')}")
 
     # TODO: Add user timezone to the time strings
@@ -0,0 +1,80 @@
+"""
+Compare reading the latest checkpoint from SQLite and from the checkpoint cache.
+
+Usage:
+    poetry run python benchmarks/checkpoint.py [--messages 10 100 500] [--reads 1000]
+
+For each conversation length a thread with that many messages is checkpointed,
+then its latest checkpoint is read back from the SqliteCheckpointSaver, from a
+CachedCheckpointSaver hit (which returns a copy of the tuple's containers), and
+with a deep copy of the cached tuple for comparison.
+"""
+
+import argparse
+import copy
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+from archer.storage.checkpoint import CachedCheckpointSaver, SqliteCheckpointSaver
+
+
+def timed(label: str, count: int, func: Callable[[], object]) -> None:
+    started = time.perf_counter()
+    for _ in range(count):
+        func()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<22} {elapsed / count * 1e6:10.1f} us/read")
+
+
+def fill(saver: CachedCheckpointSaver, thread_id: str, messages: int) -> None:
+    def agent(state: MessagesState) -> dict:
+        return {"messages": [AIMessage(content="An answer of a few sentences. " * 10)]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("agent", agent)
+    builder.add_edge(START, "agent")
+    builder.add_edge("agent", END)
+    graph = builder.compile(checkpointer=saver)
+
+    history = [
+        HumanMessage(content=f"Question {i}: a sentence or two. " * 3) for i in range(messages - 1)
+    ]
+    graph.invoke({"messages": history}, {"configurable": {"thread_id": thread_id}})
+
+
+def run(saver: CachedCheckpointSaver, config: RunnableConfig, reads: int) -> None:
+    saver.get_tuple(config)
+    cached = saver._cache[saver._key(config)]
+
+    timed("sqlite get_tuple", reads, lambda: saver.backend.get_tuple(config))
+    timed("cache hit (copy)", reads, lambda: saver.get_tuple(config))
+    timed("deep copy", reads, lambda: copy.deepcopy(cached))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--messages", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--reads", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="archer-bench-") as base_dir:
+        backend = SqliteCheckpointSaver(
+            str(Path(base_dir) / "checkpoints.sqlite"), max_threads=1000, ttl_seconds=3600
+        )
+        saver = CachedCheckpointSaver(backend, maxsize=len(args.messages))
+        for count in args.messages:
+            fill(saver, f"T{count}", count)
+            print(f"{count:,} messages")
+            run(
+                saver, {"configurable": {"thread_id": f"T{count}", "checkpoint_ns": ""}}, args.reads
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Measure the throughput of the Slack <-> Markdown converters.
+
+Usage:
+    poetry run python benchmarks/formatting.py [--size 100000] [--runs 20]
+
+The converters in archer.agent.utils are compared with the previous implementation
+(one re.split on code spans, then one re.sub per format on every text segment),
+which is kept below as the reference, on messages of --size bytes: one dense with
+formatting, code and entities, and one of mostly plain prose. tests/test_formatting.py
+checks the converters' output against the same reference.
+"""
+
+import argparse
+import re
+import time
+
+from archer.agent.utils import markdown_to_slack, slack_to_markdown
+
+
+def reference_slack_to_markdown(content: str) -> str:
+    parts = re.split(r"(?s)(```.+?```|`[^`\n]+?`)", content)
+    result = ""
+    for part in parts:
+        if part.startswith("```") or part.startswith("`"):
+            result += part
+        else:
+            for o, n in [
+                (r"\*(?!\s)([^\*\n]+?)(?<!\s)\*", r"**\1**"),
+                (r"_(?!\s)([^_\n]+?)(?<!\s)_", r"*\1*"),
+                (r"~(?!\s)([^~\n]+?)(?<!\s)~", r"~~\1~~"),
+            ]:
+                part = re.sub(o, n, part)
+            result += part
+    return result
+
+
+def reference_markdown_to_slack(content: str) -> str:
+    parts = re.split(r"(?s)(```.+?```|`[^`\n]+?`)", content)
+    result = ""
+    for part in parts:
+        if part.startswith("```") or part.startswith("`"):
+            result += part
+        else:
+            for o, n in [
+                (r"\*\*\*(?!\s)([^\*\n]+?)(?<!\s)\*\*\*", r"_*\1*_"),
+                (r"(?<![\*_])\*(?!\s)([^\*\n]+?)(?<!\s)\*(?![\*_])", r"_\1_"),
+                (r"\*\*(?!\s)([^\*\n]+?)(?<!\s)\*\*", r"*\1*"),
+                (r"__(?!\s)([^_\n]+?)(?<!\s)__", r"*\1*"),
+                (r"~~(?!\s)([^~\n]+?)(?<!\s)~~", r"~\1~"),
+                (r"\[([^\]]+)\]\(([^)]+)\)", r"<\2|\1>"),
+            ]:
+                part = re.sub(o, n, part)
+            result += part
+    return result
+
+
+def sample_message(size: int) -> str:
+    paragraph = (
+        "Here is a **summary** of the *latest* changes in `archer/agent`:\n"
+        "1. ***Routing*** now picks tools per turn, see [the docs](https://example.com/docs).\n"
+        "2. ~~Old cache~~ replaced by __bounded__ caches; ask <@U0123ABC> in <#C0123|dev>.\n"
+        "```python\nresult = agent.invoke(**kwargs)  # *not* formatted\n```\n"
+        "Plain prose without any formatting makes up most of a typical answer, "
+        "so it should be cheap to pass through unchanged.\n\n"
+    )
+    return (paragraph * (size // len(paragraph) + 1))[:size]
+
+
+def prose_message(size: int) -> str:
+    paragraph = (
+        "The agent answered the question using the search results and the calendar, "
+        "and the **next meeting** is on Tuesday at 10:00 in the main office.\n"
+    )
+    return (paragraph * (size // len(paragraph) + 1))[:size]
+
+
+def throughput(convert, text: str, runs: int) -> float:
+    started = time.perf_counter()
+    for _ in range(runs):
+        convert(text)
+    return len(text) * runs / (time.perf_counter() - started) / 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=100_000, help="Message size in bytes")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    for name, text in [
+        ("formatted", sample_message(args.size)),
+        ("prose", prose_message(args.size)),
+    ]:
+        print(f"\nThroughput on a {len(text) // 1000} KB {name} message, MB/s:")
+        print(f"{'converter':<20} {'reference':>10} {'current':>10} {'speedup':>8}")
+        for convert, reference in [
+            (slack_to_markdown, reference_slack_to_markdown),
+            (markdown_to_slack, reference_markdown_to_slack),
+        ]:
+            before = throughput(reference, text, args.runs)
+            after = throughput(convert, text, args.runs)
+            print(f"{convert.__name__:<20} {before:>10.1f} {after:>10.1f} {after / before:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,543 @@
+"""
+Load test the Slack app offline, with fake Slack, model and Arcade backends.
+
+Usage:
+    poetry run python benchmarks/load_test.py [--threads 50] [--turns 4] [--concurrency 10]
+
+The app from create_fastapi_app() runs in process, with its lifespan, and receives
+signed Slack events for user messages in assistant threads over ASGI, as Slack
+would send them. Its Slack Web API calls go to a fake Slack server, which keeps the messages
+of each thread. The chat model is replaced by a scripted model that waits
+--first-token-seconds, calls --tool-calls tools and then streams an answer of
+--answer-tokens tokens. Arcade is replaced by a tool manager whose tools sleep
+--tool-seconds.
+
+Each of --threads conversations starts an assistant thread, waits for the greeting
+and sends --turns messages, waiting for the answer to each before sending the
+next, with --concurrency conversations at a time. The latency of a message is the
+time from posting its event until the answer is complete in Slack. The report
+shows latency percentiles, throughput, Slack API calls per message, memory use and
+the size of the checkpoints.
+
+Settings in archer.env can be changed through their environment variables as
+usual, e.g. CHECKPOINT_TYPE=sqlite or AGENT_MAX_CONCURRENT_RUNS=16.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import resource
+import shutil
+import socket
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any
+from unittest import mock
+
+import httpx
+from aiohttp import web
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import StructuredTool
+from slack_sdk.signature import SignatureVerifier
+
+SIGNING_SECRET = "load-test-secret"  # noqa: S105
+TEAM_ID = "T0LOADTEST"
+# Ends every answer, so the fake Slack server can tell when a reply is complete
+END_OF_ANSWER = "(end of answer)"
+WORDS = "the agent looked into it and here is what it found about your question".split()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@dataclass
+class Reply:
+    sent_at: float
+    first_at: float | None = None
+    done_at: float | None = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class FakeSlack:
+    """
+    Serves the Slack Web API methods the app uses and keeps the thread messages.
+    """
+
+    def __init__(self) -> None:
+        self.threads: dict[tuple[str, str], list[dict]] = defaultdict(list)
+        self.calls: Counter[str] = Counter()
+        self.replies: dict[tuple[str, str], Reply] = {}
+        self.greetings: dict[tuple[str, str], asyncio.Event] = defaultdict(asyncio.Event)
+        # Thread of each message, for chat.update and chat.delete
+        self._message_threads: dict[str, tuple[str, str]] = {}
+        self._sequence = itertools.count(1)
+
+    def next_ts(self) -> str:
+        return f"{int(time.time())}.{next(self._sequence):06d}"
+
+    def add_user_message(self, channel: str, thread_ts: str, user: str, text: str) -> str:
+        ts = self.next_ts()
+        self.threads[channel, thread_ts].append({"ts": ts, "user": user, "text": text})
+        return ts
+
+    def expect_reply(self, channel: str, thread_ts: str) -> Reply:
+        reply = self.replies[channel, thread_ts] = Reply(sent_at=time.perf_counter())
+        return reply
+
+    def _bot_text(self, channel: str, thread_ts: str, text: str) -> None:
+        reply = self.replies.get((channel, thread_ts))
+        if reply is None or reply.done_at is not None:
+            return
+        now = time.perf_counter()
+        if reply.first_at is None:
+            reply.first_at = now
+        if END_OF_ANSWER in text:
+            reply.done_at = now
+            reply.done.set()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        args: dict[str, Any] = dict(request.query)
+        if request.content_type == "application/json":
+            args.update(await request.json())
+        elif request.can_read_body:
+            args.update(await request.post())
+        return web.json_response({"ok": True, **self.respond(method, args)})
+
+    def respond(self, method: str, args: dict[str, Any]) -> dict:
+        handler = {
+            "auth.test": self._auth_test,
+            "chat.postMessage": self._post_message,
+            "chat.update": self._update,
+            "chat.delete": self._delete,
+            "conversations.replies": self._replies,
+        }.get(method)
+        return handler(args) if handler is not None else {}
+
+    def _auth_test(self, args: dict[str, Any]) -> dict:
+        return {"team_id": TEAM_ID, "user_id": "UARCHER", "bot_id": "BARCHER", "team": "Load"}
+
+    def _post_message(self, args: dict[str, Any]) -> dict:
+        channel, thread_ts = args["channel"], args.get("thread_ts")
+        ts = self.next_ts()
+        text = args.get("text") or json.dumps(args.get("blocks", ""))
+        message = {"ts": ts, "bot_id": "BARCHER", "text": text}
+        if thread_ts:
+            self.threads[channel, thread_ts].append(message)
+            self._message_threads[ts] = (channel, thread_ts)
+            self.greetings[channel, thread_ts].set()
+            self._bot_text(channel, thread_ts, text)
+        return {"channel": channel, "ts": ts, "message": message}
+
+    def _update(self, args: dict[str, Any]) -> dict:
+        thread = self._message_threads.get(args["ts"])
+        if thread is not None:
+            for message in self.threads[thread]:
+                if message["ts"] == args["ts"]:
+                    message["text"] = args.get("text", "")
+            self._bot_text(*thread, args.get("text", ""))
+        return {"channel": args["channel"], "ts": args["ts"]}
+
+    def _delete(self, args: dict[str, Any]) -> dict:
+        thread = self._message_threads.pop(args["ts"], None)
+        if thread is not None:
+            self.threads[thread] = [m for m in self.threads[thread] if m["ts"] != args["ts"]]
+        return {"channel": args["channel"], "ts": args["ts"]}
+
+    def _replies(self, args: dict[str, Any]) -> dict:
+        messages = self.threads.get((args["channel"], args["ts"]), [])
+        return {"messages": messages[: int(args.get("limit", 1000))], "has_more": False}
+
+    @contextlib.asynccontextmanager
+    async def serve(self, port: int) -> AsyncIterator[str]:
+        app = web.Application()
+        app.router.add_route("*", "/api/{method}", self.handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        try:
+            yield f"http://127.0.0.1:{port}/api/"
+        finally:
+            await runner.cleanup()
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Answers like a chat model with tools, after a fixed delay and at a fixed token rate.
+
+    A new user message is answered with `tool_calls` parallel tool calls (if any),
+    and tool results with a streamed answer of `answer_tokens` tokens.
+    """
+
+    tool_names: list[str]
+    tool_calls: int = 1
+    first_token_seconds: float = 0.5
+    token_seconds: float = 0.01
+    answer_tokens: int = 100
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "ScriptedChatModel":
+        return self
+
+    def _calls_tools(self, messages: list[BaseMessage]) -> bool:
+        # The last message holds the current times (see ReactAgent._model_messages)
+        conversation = [m for m in messages if not isinstance(m, SystemMessage)]
+        return self.tool_calls > 0 and conversation[-1].type == "human"
+
+    def _chunks(self, messages: list[BaseMessage]) -> Iterator[AIMessageChunk]:
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4
+        if self._calls_tools(messages):
+            query = str([m for m in messages if m.type == "human"][-1].content)
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {
+                        "name": self.tool_names[index % len(self.tool_names)],
+                        "args": json.dumps({"query": query}),
+                        "id": f"call_{time.time_ns()}_{index}",
+                        "index": index,
+                    }
+                    for index in range(self.tool_calls)
+                ],
+                usage_metadata={
+                    "input_tokens": input_tokens,
+                    "output_tokens": 10 * self.tool_calls,
+                    "total_tokens": input_tokens + 10 * self.tool_calls,
+                },
+            )
+            return
+        for index in range(self.answer_tokens):
+            yield AIMessageChunk(content=("" if index == 0 else " ") + WORDS[index % len(WORDS)])
+        yield AIMessageChunk(
+            content=f" {END_OF_ANSWER}",
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": self.answer_tokens,
+                "total_tokens": input_tokens + self.answer_tokens,
+            },
+        )
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.first_token_seconds + self.token_seconds * self.answer_tokens)
+        message = None
+        for chunk in self._chunks(messages):
+            message = chunk if message is None else message + chunk
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(**message.dict()))])
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_seconds)
+        for index, chunk in enumerate(self._chunks(messages)):
+            if index and self.token_seconds:
+                await asyncio.sleep(self.token_seconds)
+            yield ChatGenerationChunk(message=chunk)
+
+
+class FakeToolManager:
+    """
+    Stands in for ArcadeToolManager: one tool per toolkit, none needing authorization.
+    """
+
+    tool_seconds = 0.2
+    output_chars = 2000
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+    @classmethod
+    def tool_names(cls, toolkits: list[str]) -> list[str]:
+        return [f"{toolkit}_Lookup" for toolkit in toolkits]
+
+    def get_tools(self, toolkits: list[str], **kwargs: Any) -> list[StructuredTool]:
+        def lookup(query: str = "") -> str:
+            time.sleep(self.tool_seconds)
+            return (f"Result for {query}: " + "lorem ipsum " * self.output_chars)[
+                : self.output_chars
+            ]
+
+        return [
+            StructuredTool.from_function(
+                func=lookup, name=name, description=f"Look up {name.split('_')[0]} data."
+            )
+            for name in self.tool_names(toolkits)
+        ]
+
+    def requires_auth(self, tool_name: str) -> bool:
+        return False
+
+    def authorize(self, tool_name: str, user_id: str) -> SimpleNamespace:
+        return SimpleNamespace(status="completed", url=None)
+
+
+def event_callback(event: dict) -> dict:
+    return {
+        "token": "load-test",
+        "team_id": TEAM_ID,
+        "api_app_id": "A0LOADTEST",
+        "type": "event_callback",
+        "event_id": f"Ev{time.time_ns()}",
+        "event_time": int(time.time()),
+        "event": event,
+    }
+
+
+def thread_started_event(channel: str, thread_ts: str, user: str) -> dict:
+    return event_callback({
+        "type": "assistant_thread_started",
+        "assistant_thread": {
+            "user_id": user,
+            "context": {},
+            "channel_id": channel,
+            "thread_ts": thread_ts,
+        },
+        "event_ts": thread_ts,
+    })
+
+
+def message_event(channel: str, thread_ts: str, ts: str, user: str, text: str) -> dict:
+    return event_callback({
+        "type": "message",
+        "channel": channel,
+        "channel_type": "im",
+        "user": user,
+        "text": text,
+        "ts": ts,
+        "thread_ts": thread_ts,
+        "event_ts": ts,
+    })
+
+
+async def post_event(client: httpx.AsyncClient, url: str, body: dict) -> None:
+    payload = json.dumps(body)
+    timestamp = str(int(time.time()))
+    signature = SignatureVerifier(SIGNING_SECRET).generate_signature(
+        timestamp=timestamp, body=payload
+    )
+    response = await client.post(
+        url,
+        content=payload,
+        headers={
+            "Content-Type": "application/json",
+            "X-Slack-Request-Timestamp": timestamp,
+            "X-Slack-Signature": signature,
+        },
+    )
+    response.raise_for_status()
+
+
+async def conversation(
+    index: int,
+    args: argparse.Namespace,
+    slack: FakeSlack,
+    client: httpx.AsyncClient,
+    url: str,
+    replies: list[Reply],
+) -> int:
+    """
+    Send the turns of one assistant thread and return the number of timeouts.
+    """
+    channel, user = f"D{index:06d}", f"U{index % args.users:06d}"
+    thread_ts = slack.next_ts()
+    timeouts = 0
+    await post_event(client, url, thread_started_event(channel, thread_ts, user))
+    # Like a user, wait for the greeting before asking
+    with contextlib.suppress(asyncio.TimeoutError):
+        await asyncio.wait_for(slack.greetings[channel, thread_ts].wait(), timeout=args.timeout)
+    for turn in range(args.turns):
+        text = f"Question {turn + 1} of conversation {index}: what happened this week?"
+        ts = slack.add_user_message(channel, thread_ts, user, text)
+        reply = slack.expect_reply(channel, thread_ts)
+        await post_event(client, url, message_event(channel, thread_ts, ts, user, text))
+        try:
+            await asyncio.wait_for(reply.done.wait(), timeout=args.timeout)
+        except asyncio.TimeoutError:
+            timeouts += 1
+        else:
+            replies.append(reply)
+    return timeouts
+
+
+def percentiles(values: list[float]) -> str:
+    if not values:
+        return "n/a"
+    values = sorted(values)
+
+    def at(fraction: float) -> float:
+        return values[min(int(fraction * len(values)), len(values) - 1)]
+
+    return f"p50 {at(0.50):.3f}  p95 {at(0.95):.3f}  p99 {at(0.99):.3f}  max {values[-1]:.3f}"
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def checkpoint_bytes(saver: Any) -> int:
+    """
+    Return the bytes of serialized checkpoints held by the checkpointer.
+    """
+    from archer.storage.checkpoint import CachedCheckpointSaver, SqliteCheckpointSaver
+
+    if isinstance(saver, CachedCheckpointSaver):
+        saver = saver.backend
+    if isinstance(saver, SqliteCheckpointSaver):
+        paths = [saver.path, saver.path.with_name(saver.path.name + "-wal")]
+        return sum(path.stat().st_size for path in paths if path.exists())
+
+    def size(value: Any) -> int:
+        if isinstance(value, bytes | bytearray):
+            return len(value)
+        if isinstance(value, dict):
+            return sum(size(item) for item in value.values())
+        if isinstance(value, tuple | list):
+            return sum(size(item) for item in value)
+        return 0
+
+    return size(getattr(saver, "storage", {})) + size(getattr(saver, "writes", {}))
+
+
+async def run(args: argparse.Namespace) -> None:
+    # Imported once the environment is set, since archer.env reads it on import
+    from archer.agent import agent as agent_module
+    from archer.agent import manifest
+    from archer.defaults import get_available_toolkits
+    from archer.server import create_fastapi_app
+    from archer.storage.functions import get_checkpointer
+
+    FakeToolManager.tool_seconds = args.tool_seconds
+    FakeToolManager.output_chars = args.tool_output_chars
+    model = ScriptedChatModel(
+        tool_names=FakeToolManager.tool_names(get_available_toolkits()),
+        tool_calls=args.tool_calls,
+        first_token_seconds=args.first_token_seconds,
+        token_seconds=args.token_seconds,
+        answer_tokens=args.answer_tokens,
+    )
+
+    slack = FakeSlack()
+    with (
+        mock.patch.object(agent_module, "ChatOpenAI", lambda **kwargs: model),
+        mock.patch.object(manifest, "ArcadeToolManager", FakeToolManager),
+    ):
+        async with slack.serve(free_port()) as slack_url:
+            app = create_fastapi_app()
+            app.state.slack_app.client.base_url = slack_url
+            transport = httpx.ASGITransport(app=app)
+            async with (
+                app.router.lifespan_context(app),
+                httpx.AsyncClient(transport=transport, base_url="http://archer") as client,
+            ):
+                while (await client.get("/ready")).status_code != 200:
+                    await asyncio.sleep(0.05)
+                rss_before = rss_mb()
+
+                replies: list[Reply] = []
+                semaphore = asyncio.Semaphore(args.concurrency)
+
+                async def limited(index: int) -> int:
+                    async with semaphore:
+                        return await conversation(
+                            index, args, slack, client, "/slack/events", replies
+                        )
+
+                slack.calls.clear()
+                started = time.perf_counter()
+                timeouts = sum(await asyncio.gather(*map(limited, range(args.threads))))
+                elapsed = time.perf_counter() - started
+                rss_after = rss_mb()
+                stored = checkpoint_bytes(get_checkpointer())
+
+    messages = args.threads * args.turns
+    report = [
+        f"{args.threads} threads x {args.turns} turns, concurrency {args.concurrency}, "
+        f"checkpoints in {os.environ['CHECKPOINT_TYPE']}, "
+        f"streaming {os.environ['STREAMING_ENABLED']}",
+        f"Messages          {len(replies)} answered, {timeouts} timed out, "
+        f"in {elapsed:.2f}s ({len(replies) / elapsed:.1f} msg/s)",
+        f"Latency (s)       {percentiles([r.done_at - r.sent_at for r in replies])}",
+        f"First update (s)  {percentiles([r.first_at - r.sent_at for r in replies])}",
+        f"RSS               {rss_before:.0f} MB before, {rss_after:.0f} MB after, "
+        f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 / 1e6:.0f} MB peak",
+        f"Checkpoints       {stored / 1e6:.2f} MB, {stored / args.threads / 1e3:.1f} KB per thread",
+        "Slack API calls per message:",
+        *(
+            f"  {method:<40} {count / messages:.2f}"
+            for method, count in slack.calls.most_common()
+            if method != "auth.test"
+        ),
+    ]
+    print("\n".join(report), file=sys.__stdout__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--threads", type=int, default=50, help="conversations to run")
+    parser.add_argument("--turns", type=int, default=4, help="messages per conversation")
+    parser.add_argument("--concurrency", type=int, default=10, help="conversations at a time")
+    parser.add_argument("--users", type=int, default=None, help="users, one per thread if unset")
+    parser.add_argument("--first-token-seconds", type=float, default=0.5)
+    parser.add_argument("--token-seconds", type=float, default=0.01)
+    parser.add_argument("--answer-tokens", type=int, default=100)
+    parser.add_argument("--tool-calls", type=int, default=1, help="tool calls per message")
+    parser.add_argument("--tool-seconds", type=float, default=0.2)
+    parser.add_argument("--tool-output-chars", type=int, default=2000)
+    parser.add_argument("--timeout", type=float, default=120, help="seconds to wait per answer")
+    args = parser.parse_args()
+    args.users = args.users or args.threads
+
+    data_dir = tempfile.mkdtemp(prefix="archer-load-")
+    os.environ.update({
+        "SLACK_BOT_TOKEN": "xoxb-load-test",
+        "SLACK_SIGNING_SECRET": SIGNING_SECRET,
+        "FILE_STORAGE_BASE_DIR": data_dir,
+        "AGENT_TOOL_REFRESH_SECONDS": "0",
+    })
+    for name, value in [
+        ("OPENAI_API_KEY", "sk-load-test"),
+        ("ARCADE_API_KEY", "load-test"),
+        ("CHECKPOINT_TYPE", "memory"),
+        ("STREAMING_ENABLED", "true"),
+        ("AGENT_WARMUP_MODELS", "gpt-4o"),
+        ("LOG_LEVEL", "WARNING"),
+    ]:
+        os.environ.setdefault(name, value)
+    try:
+        # The graph prints every step (it is compiled with debug=True)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            asyncio.run(run(args))
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
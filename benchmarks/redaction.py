@@ -0,0 +1,90 @@
+"""
+Measure the per-message overhead of PII redaction.
+
+Usage:
+    poetry run python benchmarks/redaction.py [--runs 2000]
+
+Compares the Redactor in archer.agent.redaction (one combined, precompiled
+pattern) with the previous approach of one re.sub per pattern, on messages of a
+few sizes with and without personal data. Streaming is measured by feeding the
+message to a StreamRedactor in chunks of a few characters, as model tokens arrive.
+"""
+
+import argparse
+import re
+import time
+
+from archer.agent.redaction import Redactor, redactor
+from archer.env import (
+    REDACT_CREDIT_CARD_PATTERN,
+    REDACT_EMAIL_PATTERN,
+    REDACT_PHONE_PATTERN,
+    REDACT_SSN_PATTERN,
+    REDACT_USER_DEFINED_PATTERN,
+)
+
+PROSE = (
+    "The quarterly review covers the roadmap, the hiring plan and the budget. "
+    "Nothing in this paragraph needs to be redacted, which is the common case. "
+)
+PII = (
+    "Contact jane.doe@example.com or call (555) 123-4567 about card "
+    "4111 1111 1111 1111 and SSN 123-45-6789. "
+)
+SIZES = [200, 2_000, 20_000]
+
+
+def reference_redact(text: str) -> str:
+    text = re.sub(REDACT_EMAIL_PATTERN, "[EMAIL]", text)
+    text = re.sub(REDACT_CREDIT_CARD_PATTERN, "[CREDIT CARD]", text)
+    text = re.sub(REDACT_PHONE_PATTERN, "[PHONE]", text)
+    text = re.sub(REDACT_SSN_PATTERN, "[SSN]", text)
+    return re.sub(REDACT_USER_DEFINED_PATTERN, "[REDACTED]", text)
+
+
+def message(size: int, pii: bool) -> str:
+    paragraph = PROSE + PII if pii else PROSE
+    return (paragraph * (size // len(paragraph) + 1))[:size]
+
+
+def per_message_us(redact, text: str, runs: int) -> float:
+    started = time.perf_counter()
+    for _ in range(runs):
+        redact(text)
+    return (time.perf_counter() - started) / runs * 1e6
+
+
+def stream(redactor: Redactor, text: str, chunk_size: int = 4) -> str:
+    streaming = redactor.stream()
+    parts = [streaming.feed(text[i : i + chunk_size]) for i in range(0, len(text), chunk_size)]
+    parts.append(streaming.flush())
+    return "".join(parts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'message':<16} {'reference us':>13} {'redactor us':>12} {'stream us':>10}  output")
+    for size in SIZES:
+        for pii in (False, True):
+            text = message(size, pii)
+            runs = max(args.runs * SIZES[0] // size, 20)
+            before = per_message_us(reference_redact, text, runs)
+            after = per_message_us(redactor.redact, text, runs)
+            streamed = per_message_us(lambda t: stream(redactor, t), text, max(runs // 10, 5))
+            same = redactor.redact(text) == reference_redact(text)
+            whole = stream(redactor, text) == redactor.redact(text)
+            name = (
+                f"{size // 1000 or size}{'K' if size >= 1000 else 'B'} {'pii' if pii else 'prose'}"
+            )
+            print(
+                f"{name:<16} {before:>13.1f} {after:>12.1f} {streamed:>10.1f}  "
+                f"{'same as reference' if same else 'differs from reference'}, "
+                f"stream {'matches' if whole else 'differs'}"
+            )
+
+
+if __name__ == "__main__":
+    main()
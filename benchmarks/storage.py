@@ -0,0 +1,73 @@
+"""
+Compare the FileStore and SqliteStore state stores.
+
+Usage:
+    poetry run python benchmarks/storage.py [--users 10000 100000] [--dir /tmp/archer-bench]
+
+For each user count both stores are filled with that many users, then every
+user is read back, version checked and updated once. Point --dir at the same
+kind of volume the deployment uses to get representative numbers.
+"""
+
+import argparse
+import logging
+import random
+import shutil
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from archer.storage.file import FileStore
+from archer.storage.schema import StateStore, UserIdentity
+from archer.storage.sqlite import SqliteStore
+
+logger = logging.getLogger(__name__)
+
+
+def timed(label: str, count: int, func: Callable[[], object]) -> None:
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<22} {elapsed:8.2f}s {count / elapsed:12,.0f} ops/s")
+
+
+def run(store: StateStore, users: list[UserIdentity]) -> None:
+    user_ids = [user["user_id"] for user in users]
+    shuffled = random.sample(user_ids, len(user_ids))
+
+    timed("set_state", len(users), lambda: [store.set_state(user) for user in users])
+    timed("get_state", len(users), lambda: [store.get_state(user_id) for user_id in shuffled])
+    timed("get_version", len(users), lambda: [store.get_version(user_id) for user_id in shuffled])
+    timed(
+        "update_state",
+        len(users),
+        lambda: [store.update_state({**user, "model": "gpt-4o-mini"}) for user in users],
+    )
+    timed("get_states (batch)", len(users), lambda: store.get_states(shuffled))
+    timed("set_states (batch)", len(users), lambda: store.set_states(users))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--users", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--dir", default=None, help="directory to create the stores in")
+    args = parser.parse_args()
+
+    for count in args.users:
+        users = [
+            UserIdentity(user_id=f"U{i:09d}", provider="openai", model="gpt-4o")
+            for i in range(count)
+        ]
+        base_dir = Path(tempfile.mkdtemp(prefix="archer-bench-", dir=args.dir))
+        try:
+            print(f"FileStore, {count:,} users")
+            run(FileStore(base_dir=str(base_dir / "file"), logger=logger), users)
+            print(f"SqliteStore, {count:,} users")
+            run(SqliteStore(path=str(base_dir / "archer.sqlite"), logger=logger), users)
+        finally:
+            shutil.rmtree(base_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Measure the prompt tokens spent on tool schemas with and without tool routing.
+
+Usage:
+    poetry run python benchmarks/tool_routing.py [--max-tools 12] [--prompt "..."]
+
+The tools are fetched from Arcade (ARCADE_API_KEY must be set) for the toolkits
+in archer.defaults. For each prompt the tool schemas that would be sent to the
+model are serialized as OpenAI tools and counted with the model's tokenizer,
+once for all tools and once for the subset picked by the ToolRouter.
+"""
+
+import argparse
+import json
+import time
+
+import tiktoken
+from langchain_arcade import ArcadeToolManager
+from langchain_core.messages import HumanMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from archer.agent.routing import ToolRouter
+from archer.defaults import get_available_toolkits
+
+PROMPTS = [
+    "Read my last 10 emails and tell me about them",
+    "What's on my calendar this week?",
+    "Tell me about any recently opened PRs in arcadeai/arcade-ai",
+    "Search the web for the latest news about LangGraph",
+    "Summarize https://arcade.dev",
+    "What is the capital of France?",
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--max-tools", type=int, default=12)
+    parser.add_argument("--model", default="gpt-4o", help="model whose tokenizer is used")
+    parser.add_argument("--prompt", action="append", help="prompt to route (repeatable)")
+    args = parser.parse_args()
+
+    tools = ArcadeToolManager().get_tools(toolkits=get_available_toolkits(), langgraph=False)
+    encoding = tiktoken.encoding_for_model(args.model)
+    schema_tokens = {
+        tool.name: len(encoding.encode(json.dumps(convert_to_openai_tool(tool)))) for tool in tools
+    }
+    all_tokens = sum(schema_tokens.values())
+
+    started = time.perf_counter()
+    router = ToolRouter(tools, max_tools=args.max_tools)
+    print(
+        f"{len(tools)} tools, {all_tokens:,} schema tokens, "
+        f"index built in {(time.perf_counter() - started) * 1000:.1f}ms\n"
+    )
+
+    print(f"{'prompt':<62} {'tools':>7} {'tokens':>8} {'saved':>7} {'route':>8}")
+    for prompt in args.prompt or PROMPTS:
+        started = time.perf_counter()
+        selected = router.select([HumanMessage(prompt)])
+        elapsed = time.perf_counter() - started
+        names = selected if selected is not None else list(schema_tokens)
+        tokens = sum(schema_tokens[name] for name in names)
+        print(
+            f"{prompt[:60]:<62} {len(names):>7} {tokens:>8,} "
+            f"{1 - tokens / all_tokens:>7.0%} {elapsed * 1000:>6.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
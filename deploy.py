@@ -14,7 +14,7 @@ vol = modal.Volume.from_name("archer", create_if_missing=True)
 image = (
     modal.Image.debian_slim()
     .add_local_dir("./dist", "/root/dist", copy=True)
-    .pip_install("/root/dist/archer_slackbot-0.2.0-py3-none-any.whl")
+    .pip_install("/root/dist/archer_slackbot-0.2.0-py3-none-any.whl[postgres]")
 )
 
 # Define secrets to pass environment variables
@@ -24,6 +24,12 @@ secrets = modal.Secret.from_dict({
     "OPENAI_API_KEY": os.environ["OPENAI_API_KEY"],
     "ARCADE_API_KEY": os.environ["ARCADE_API_KEY"],
     "FILE_STORAGE_BASE_DIR": "/data",
+    # Checkpoints live in Postgres, which every container can write, so the app can
+    # scale out. SQLite on the volume only supports a single writing container.
+    "CHECKPOINT_TYPE": "postgres",
+    "DATABASE_URL": os.environ["DATABASE_URL"],
+    # Slack may retry an event on another container, so they claim events in Postgres too
+    "DEDUP_STORE_TYPE": "postgres",
     "LANGSMITH_TRACING": os.environ["LANGSMITH_TRACING"],
     "LANGSMITH_ENDPOINT": os.environ["LANGSMITH_ENDPOINT"],
     "LANGSMITH_API_KEY": os.environ["LANGSMITH_API_KEY"],
@@ -32,6 +38,8 @@ secrets = modal.Secret.from_dict({
 })
 
 
+# Containers share their conversation state through Postgres, so Modal can add
+# containers under load. Each one handles requests concurrently on its event loop.
 @app.function(
     image=image, secrets=[secrets], volumes={"/data": vol}, keep_warm=1, allow_concurrent_inputs=100
 )
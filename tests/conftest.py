@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+import archer.agent
+
+
+class FakeAgent:
+    """
+    An agent whose graph has a single model node that answers every turn with a
+    numbered message and records the conversation it was given.
+
+    The node waits for `release` to be set, so tests can hold a run in flight.
+    """
+
+    def __init__(self) -> None:
+        self.calls: list[list] = []
+        self.inputs: list = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+        async def agent(state: MessagesState) -> dict:
+            self.calls.append(list(state["messages"]))
+            await self.release.wait()
+            return {"messages": [AIMessage(content=f"answer {len(self.calls)}")]}
+
+        builder = StateGraph(MessagesState)
+        builder.add_node("agent", agent)
+        builder.add_edge(START, "agent")
+        builder.add_edge("agent", END)
+        self.graph = builder.compile(checkpointer=MemorySaver())
+
+        astream = self.graph.astream
+
+        def recording_astream(graph_input, *args, **kwargs):
+            self.inputs.append(graph_input)
+            return astream(graph_input, *args, **kwargs)
+
+        self.graph.astream = recording_astream
+
+
+@pytest.fixture
+def fake_agent(monkeypatch) -> FakeAgent:
+    """
+    Make invoke_agent run the FakeAgent for every user.
+    """
+    agent = FakeAgent()
+
+    async def load_user_agent(user_id: str):
+        return {"user_id": user_id, "model": "fake", "timezone": None}, agent
+
+    monkeypatch.setattr(archer.agent, "_load_user_agent", load_user_agent)
+    monkeypatch.setattr(archer.agent, "response_cache", None)
+    return agent
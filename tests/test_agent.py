@@ -0,0 +1,58 @@
+import pytest
+from langchain_core.messages import SystemMessage
+
+from archer.agent import build_state, has_checkpoint, invoke_agent
+
+
+@pytest.mark.asyncio
+async def test_prompt_grows_by_one_turn_per_message(fake_agent):
+    # The Slack listener passes the thread history as context on every turn
+    history: list[dict[str, str]] = []
+    for turn in range(1, 6):
+        prompt = f"question {turn}"
+        response = await invoke_agent("U1", prompt, context=list(history), thread_id="T1")
+        assert response.content == f"answer {turn}"
+        history += [
+            {"role": "user", "content": prompt},
+            {"role": "assistant", "content": response.content},
+        ]
+
+    # System prompt, then a question and an answer per earlier turn, then the question
+    assert [len(messages) for messages in fake_agent.calls] == [2, 4, 6, 8, 10]
+    for messages in fake_agent.calls:
+        assert isinstance(messages[0], SystemMessage)
+        assert sum(isinstance(message, SystemMessage) for message in messages) == 1
+    assert [message.content for message in fake_agent.calls[-1][1:]] == [
+        "question 1",
+        "answer 1",
+        "question 2",
+        "answer 2",
+        "question 3",
+        "answer 3",
+        "question 4",
+        "answer 4",
+        "question 5",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_checkpointed_thread_is_sent_only_the_new_message(fake_agent):
+    context = [{"role": "user", "content": "earlier"}, {"role": "assistant", "content": "reply"}]
+    assert not await has_checkpoint("U1", "T1")
+
+    await invoke_agent("U1", "first", context=context, thread_id="T1")
+    assert await has_checkpoint("U1", "T1")
+    await invoke_agent("U1", "second", context=context, thread_id="T1")
+
+    first, second = fake_agent.inputs
+    assert [message["role"] for message in first["messages"]] == [
+        "system",
+        "user",
+        "assistant",
+        "user",
+    ]
+    assert second["messages"] == [{"role": "user", "content": "second"}]
+
+
+def test_build_state_without_system_prompt():
+    assert build_state(None, "*hi*") == {"messages": [{"role": "user", "content": "**hi**"}]}
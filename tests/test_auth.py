@@ -0,0 +1,159 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import StructuredTool
+
+from archer.agent import agent
+from archer.agent.agent import ReactAgent
+from archer.agent.auth import AuthStatusCache, ToolAuthorizationError, with_cached_authorization
+from archer.agent.executor import ToolExecutor
+
+CONFIG = {"configurable": {"user_id": "U1"}}
+
+
+def test_authorizations_are_remembered_per_user_and_tool():
+    cache = AuthStatusCache(ttl_seconds=60)
+    cache.mark_authorized("U1", "Google_ListEmails")
+
+    assert cache.is_authorized("U1", "Google_ListEmails")
+    assert not cache.is_authorized("U2", "Google_ListEmails")
+    assert not cache.is_authorized("U1", "Google_SendEmail")
+
+
+def test_authorizations_expire():
+    cache = AuthStatusCache(ttl_seconds=0.01)
+    cache.mark_authorized("U1", "Google_ListEmails")
+    time.sleep(0.05)
+
+    assert not cache.is_authorized("U1", "Google_ListEmails")
+
+
+def test_the_oldest_authorizations_are_dropped_beyond_maxsize():
+    cache = AuthStatusCache(ttl_seconds=60, maxsize=2)
+    for tool_name in ("Google_ListEmails", "Google_SendEmail", "Slack_SendMessage"):
+        cache.mark_authorized("U1", tool_name)
+
+    assert not cache.is_authorized("U1", "Google_ListEmails")
+    assert cache.is_authorized("U1", "Slack_SendMessage")
+
+
+def test_invalidate_one_tool_or_all_of_a_user():
+    cache = AuthStatusCache(ttl_seconds=60)
+    for user_id in ("U1", "U2"):
+        for tool_name in ("Google_ListEmails", "Google_SendEmail"):
+            cache.mark_authorized(user_id, tool_name)
+
+    cache.invalidate("U1", "Google_ListEmails")
+    assert not cache.is_authorized("U1", "Google_ListEmails")
+    assert cache.is_authorized("U1", "Google_SendEmail")
+
+    cache.invalidate("U1")
+    assert not cache.is_authorized("U1", "Google_SendEmail")
+    assert cache.is_authorized("U2", "Google_ListEmails")
+
+
+class FakeManager:
+    def __init__(self, response):
+        self.executed = []
+        self.client = SimpleNamespace(tools=SimpleNamespace(execute=self.execute))
+        self.response = response
+
+    def requires_auth(self, tool_name: str) -> bool:
+        return True
+
+    def execute(self, **kwargs):
+        self.executed.append(kwargs)
+        return self.response
+
+
+def arcade_tool(authorized_calls: list) -> StructuredTool:
+    def list_emails(query: str, config: RunnableConfig) -> str:
+        authorized_calls.append(query)
+        return "authorized and executed"
+
+    return StructuredTool.from_function(
+        list_emails, name="Google_ListEmails", description="List emails."
+    )
+
+
+def success(value: str):
+    return SimpleNamespace(success=True, output=SimpleNamespace(value=value, authorization=None))
+
+
+def revoked():
+    return SimpleNamespace(
+        success=False,
+        output=SimpleNamespace(
+            value=None,
+            error=SimpleNamespace(message="authorization required"),
+            authorization=SimpleNamespace(status="pending", url="https://example.com/auth"),
+        ),
+    )
+
+
+def test_cached_authorizations_skip_the_authorize_call():
+    cache = AuthStatusCache(ttl_seconds=60)
+    authorized_calls: list = []
+    manager = FakeManager(success("from execute"))
+    tool = with_cached_authorization(arcade_tool(authorized_calls), manager, cache)
+
+    assert tool.func(config=CONFIG, query="q") == "authorized and executed"
+    cache.mark_authorized("U1", "Google_ListEmails")
+    assert tool.func(config=CONFIG, query="q") == "from execute"
+    assert authorized_calls == ["q"]
+
+
+def test_revoked_authorizations_raise_a_structured_error():
+    cache = AuthStatusCache(ttl_seconds=60)
+    cache.mark_authorized("U1", "Google_ListEmails")
+    tool = with_cached_authorization(arcade_tool([]), FakeManager(revoked()), cache)
+
+    with pytest.raises(ToolAuthorizationError) as error:
+        tool.func(config=CONFIG, query="q")
+    assert error.value.artifact["error"] == "authorization_required"
+
+
+def test_revoked_authorizations_are_forgotten(monkeypatch):
+    cache = AuthStatusCache(ttl_seconds=60)
+    monkeypatch.setattr(agent, "auth_cache", cache)
+    cache.mark_authorized("U1", "Google_ListEmails")
+    tool = with_cached_authorization(arcade_tool([]), FakeManager(revoked()), cache)
+    tool_call = {"name": "Google_ListEmails", "args": {"query": "q"}, "id": "call-1"}
+
+    result = ToolExecutor([tool]).invoke(
+        {"messages": [AIMessage("", tool_calls=[tool_call])]}, CONFIG
+    )
+    (message,) = result["messages"]
+    assert message.status == "error"
+
+    ReactAgent._forget_failed_auth(None, result, CONFIG)
+    assert not cache.is_authorized("U1", "Google_ListEmails")
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        # Tool output that talks about authorization is not an authorization failure
+        ToolMessage(
+            "Error: the authorization header was rejected",
+            name="Google_ListEmails",
+            tool_call_id="call-1",
+        ),
+        ToolMessage(
+            "Error: the authorization header was rejected",
+            name="Google_ListEmails",
+            tool_call_id="call-1",
+            status="error",
+        ),
+    ],
+)
+def test_other_failures_keep_the_authorization(monkeypatch, message):
+    cache = AuthStatusCache(ttl_seconds=60)
+    monkeypatch.setattr(agent, "auth_cache", cache)
+    cache.mark_authorized("U1", "Google_ListEmails")
+
+    ReactAgent._forget_failed_auth(None, {"messages": [message]}, CONFIG)
+    assert cache.is_authorized("U1", "Google_ListEmails")
@@ -0,0 +1,177 @@
+import pytest
+from langchain_core.messages import AIMessage
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+from archer.storage.checkpoint import (
+    BoundedMemorySaver,
+    CachedCheckpointSaver,
+    SqliteCheckpointSaver,
+)
+
+
+def build_graph(checkpointer):
+    def agent(state: MessagesState) -> dict:
+        return {"messages": [AIMessage(content=f"echo {state['messages'][-1].content}")]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("agent", agent)
+    builder.add_edge(START, "agent")
+    builder.add_edge("agent", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def thread(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+@pytest.fixture(params=["memory", "sqlite-wal", "sqlite-delete", "cached-sqlite"])
+def checkpointer(request, tmp_path):
+    if request.param == "memory":
+        return BoundedMemorySaver(max_threads=2, ttl_seconds=3600)
+    journal_mode = "DELETE" if request.param == "sqlite-delete" else "WAL"
+    saver = SqliteCheckpointSaver(
+        str(tmp_path / "checkpoints.sqlite"),
+        max_threads=2,
+        ttl_seconds=3600,
+        journal_mode=journal_mode,
+    )
+    if request.param == "cached-sqlite":
+        return CachedCheckpointSaver(saver, maxsize=16)
+    return saver
+
+
+@pytest.mark.asyncio
+async def test_conversation_continues_across_turns(checkpointer):
+    graph = build_graph(checkpointer)
+    for turn in range(3):
+        await graph.ainvoke({"messages": [{"role": "user", "content": f"q{turn}"}]}, thread("T1"))
+
+    state = await graph.aget_state(thread("T1"))
+    assert [message.content for message in state.values["messages"]] == [
+        "q0",
+        "echo q0",
+        "q1",
+        "echo q1",
+        "q2",
+        "echo q2",
+    ]
+
+
+def test_only_the_last_checkpoints_are_kept(checkpointer):
+    graph = build_graph(checkpointer)
+    for turn in range(4):
+        graph.invoke({"messages": [{"role": "user", "content": f"q{turn}"}]}, thread("T1"))
+
+    assert len(list(checkpointer.list(thread("T1")))) == 2
+
+
+def test_least_recently_used_threads_are_evicted(checkpointer):
+    graph = build_graph(checkpointer)
+    for thread_id in ("T1", "T2", "T3"):
+        graph.invoke({"messages": [{"role": "user", "content": thread_id}]}, thread(thread_id))
+    if isinstance(checkpointer, CachedCheckpointSaver):
+        checkpointer.backend.prune()
+    elif isinstance(checkpointer, SqliteCheckpointSaver):
+        checkpointer.prune()
+
+    assert not list(checkpointer.list(thread("T1")))
+    assert graph.get_state(thread("T3")).values["messages"][-1].content == "echo T3"
+
+
+def test_sqlite_state_survives_a_restart(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    graph = build_graph(SqliteCheckpointSaver(path, max_threads=10, ttl_seconds=3600))
+    graph.invoke({"messages": [{"role": "user", "content": "hello"}]}, thread("T1"))
+
+    graph = build_graph(SqliteCheckpointSaver(path, max_threads=10, ttl_seconds=3600))
+    messages = graph.get_state(thread("T1")).values["messages"]
+    assert [message.content for message in messages] == ["hello", "echo hello"]
+
+
+def test_cached_tuples_are_copies(tmp_path):
+    saver = CachedCheckpointSaver(
+        SqliteCheckpointSaver(str(tmp_path / "c.sqlite"), max_threads=10, ttl_seconds=3600),
+        maxsize=16,
+    )
+    graph = build_graph(saver)
+    graph.invoke({"messages": [{"role": "user", "content": "hello"}]}, thread("T1"))
+
+    first = saver.get_tuple(thread("T1"))
+    first.checkpoint["channel_versions"].clear()
+    first.checkpoint["channel_values"]["messages"].clear()
+
+    second = saver.get_tuple(thread("T1"))
+    assert second.checkpoint["channel_versions"]
+    assert len(second.checkpoint["channel_values"]["messages"]) == 2
+
+
+def test_invalid_journal_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        SqliteCheckpointSaver(
+            str(tmp_path / "c.sqlite"), max_threads=10, ttl_seconds=3600, journal_mode="OFF"
+        )
+
+
+def cached_saver(tmp_path) -> CachedCheckpointSaver:
+    backend = SqliteCheckpointSaver(str(tmp_path / "c.sqlite"), max_threads=10, ttl_seconds=3600)
+    return CachedCheckpointSaver(backend, maxsize=16)
+
+
+def test_a_read_racing_a_write_is_not_cached(tmp_path, monkeypatch):
+    saver = cached_saver(tmp_path)
+    graph = build_graph(saver)
+    graph.invoke({"messages": [{"role": "user", "content": "hello"}]}, thread("T1"))
+    saver._cache.clear()
+
+    load = saver.backend.get_tuple
+
+    def load_then_write(config):
+        checkpoint_tuple = load(config)
+        monkeypatch.setattr(saver.backend, "get_tuple", load)
+        graph.invoke({"messages": [{"role": "user", "content": "again"}]}, thread("T1"))
+        return checkpoint_tuple
+
+    monkeypatch.setattr(saver.backend, "get_tuple", load_then_write)
+    assert len(saver.get_tuple(thread("T1")).checkpoint["channel_values"]["messages"]) == 2
+
+    assert len(saver.get_tuple(thread("T1")).checkpoint["channel_values"]["messages"]) == 4
+
+
+def test_the_cache_is_invalidated_after_the_write(tmp_path, monkeypatch):
+    saver = cached_saver(tmp_path)
+    graph = build_graph(saver)
+    graph.invoke({"messages": [{"role": "user", "content": "hello"}]}, thread("T1"))
+
+    write = saver.backend.put
+
+    def read_during_write(*args):
+        saver.get_tuple(thread("T1"))
+        return write(*args)
+
+    monkeypatch.setattr(saver.backend, "put", read_during_write)
+    graph.invoke({"messages": [{"role": "user", "content": "again"}]}, thread("T1"))
+
+    messages = saver.get_tuple(thread("T1")).checkpoint["channel_values"]["messages"]
+    assert [message.content for message in messages][-1] == "echo again"
+
+
+def test_forgotten_generations_still_reject_racing_reads(tmp_path, monkeypatch):
+    saver = cached_saver(tmp_path)
+    saver.maxsize = 1
+    graph = build_graph(saver)
+    graph.invoke({"messages": [{"role": "user", "content": "hello"}]}, thread("T1"))
+    saver._cache.clear()
+
+    load = saver.backend.get_tuple
+
+    def load_then_write(config):
+        checkpoint_tuple = load(config)
+        monkeypatch.setattr(saver.backend, "get_tuple", load)
+        graph.invoke({"messages": [{"role": "user", "content": "again"}]}, thread("T1"))
+        graph.invoke({"messages": [{"role": "user", "content": "other"}]}, thread("T2"))
+        return checkpoint_tuple
+
+    monkeypatch.setattr(saver.backend, "get_tuple", load_then_write)
+    saver.get_tuple(thread("T1"))
+
+    assert ("T1", "") not in saver._cache
@@ -0,0 +1,140 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from archer.agent.context import MESSAGE_OVERHEAD_TOKENS, ContextManager
+
+
+class WordEncoding:
+    """
+    A tokenizer with one token per word, so token counts are easy to predict.
+    """
+
+    def encode(self, text: str, disallowed_special=()) -> list[str]:
+        return text.split(" ") if text else []
+
+    def decode(self, tokens: list[str]) -> str:
+        return " ".join(tokens)
+
+
+@pytest.fixture
+def context(monkeypatch):
+    def make(budget: int, tool_message_max_tokens: int = 1000) -> ContextManager:
+        monkeypatch.setattr("archer.agent.context.get_encoding", lambda model: WordEncoding())
+        return ContextManager(
+            "gpt-4o",
+            max_tokens=budget,
+            budget_fraction=1.0,
+            tool_message_max_tokens=tool_message_max_tokens,
+        )
+
+    return make
+
+
+def words(count: int, word: str = "word") -> str:
+    return " ".join([word] * count)
+
+
+def tool_message(text: str, call_id: str = "call-1") -> ToolMessage:
+    return ToolMessage(text, name="Google_ListEmails", tool_call_id=call_id, id=f"msg-{call_id}")
+
+
+def test_messages_are_counted_with_their_overhead(context):
+    manager = context(budget=1000)
+    assert manager.count(HumanMessage(words(10))) == 10 + MESSAGE_OVERHEAD_TOKENS
+
+
+def test_changed_content_is_counted_again(context):
+    manager = context(budget=1000)
+    # Same id and length, different number of tokens
+    assert manager.count(HumanMessage("aaaaaaa", id="m1")) == 1 + MESSAGE_OVERHEAD_TOKENS
+    assert manager.count(HumanMessage("a a a a", id="m1")) == 4 + MESSAGE_OVERHEAD_TOKENS
+
+
+def test_short_tool_outputs_are_kept(context):
+    manager = context(budget=1000)
+    message = tool_message(words(10))
+    assert manager.truncate(message, 10) is message
+
+
+def test_long_tool_outputs_are_cut(context):
+    manager = context(budget=1000)
+    truncated = manager.truncate(tool_message(words(100)), 10)
+
+    assert truncated.content.startswith(words(10) + "\n")
+    assert "[... 90 more tokens of tool output omitted]" in truncated.content
+    assert truncated.tool_call_id == "call-1"
+
+
+def test_cut_outputs_keep_their_own_ids(context):
+    manager = context(budget=1000)
+    first = manager.truncate(tool_message(words(100), "call-1"), 10)
+    second = manager.truncate(tool_message(words(100), "call-2"), 10)
+
+    assert first.content == second.content
+    assert (first.id, first.tool_call_id) == ("msg-call-1", "call-1")
+    assert (second.id, second.tool_call_id) == ("msg-call-2", "call-2")
+
+
+def test_cut_outputs_follow_changed_content(context):
+    manager = context(budget=1000)
+    manager.truncate(tool_message(words(100, "old")), 10)
+    truncated = manager.truncate(tool_message(words(100, "new")), 10)
+
+    assert truncated.content.startswith("new")
+
+
+def conversation(turns: int, tool_tokens: int = 10) -> list:
+    messages: list = [SystemMessage(words(10))]
+    for turn in range(turns):
+        call = {"name": "Google_ListEmails", "args": {}, "id": f"call-{turn}"}
+        messages += [
+            HumanMessage(words(10), id=f"human-{turn}"),
+            AIMessage("", tool_calls=[call], id=f"ai-{turn}"),
+            tool_message(words(tool_tokens), f"call-{turn}"),
+            AIMessage(words(10), id=f"answer-{turn}"),
+        ]
+    return messages
+
+
+def test_conversations_within_budget_are_sent_whole(context):
+    messages = conversation(3)
+    fitted = context(budget=10_000).fit(messages)
+
+    assert fitted.messages == messages
+    assert (fitted.dropped, fitted.truncated) == (0, 0)
+
+
+def test_oldest_turns_are_dropped_first(context):
+    manager = context(budget=200)
+    messages = conversation(5)
+    fitted = manager.fit(messages)
+
+    assert fitted.tokens <= 200
+    assert fitted.messages[0] is messages[0]
+    assert (
+        fitted.messages[1].content
+        == f"{fitted.dropped} earlier messages of this conversation were omitted."
+    )
+    # Whole turns are dropped and the latest turn is kept
+    assert fitted.dropped % 4 == 0
+    assert fitted.messages[-4:] == messages[-4:]
+
+
+def test_long_tool_outputs_are_cut_before_turns_are_dropped(context):
+    manager = context(budget=10_000, tool_message_max_tokens=50)
+    fitted = manager.fit(conversation(3, tool_tokens=500))
+
+    assert (fitted.dropped, fitted.truncated) == (0, 3)
+    assert fitted.tokens == sum(manager.count(message) for message in fitted.messages)
+
+
+def test_a_latest_turn_over_budget_has_its_tool_output_cut_further(context):
+    manager = context(budget=400, tool_message_max_tokens=2000)
+    messages = conversation(2, tool_tokens=3000)
+    fitted = manager.fit(messages)
+
+    assert fitted.dropped == 4
+    assert fitted.truncated == 1
+    (tool_output,) = (m for m in fitted.messages if isinstance(m, ToolMessage))
+    assert tool_output.tool_call_id == "call-1"
+    assert manager.count(tool_output) < 400
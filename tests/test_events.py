@@ -0,0 +1,121 @@
+import json
+import time
+
+import pytest
+from slack_bolt.async_app import AsyncBoltRequest
+from slack_bolt.response import BoltResponse
+
+import archer.server
+from archer.server import deduplicate_events
+from archer.storage.events import MemoryEventStore, SqliteEventStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def event_store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryEventStore(ttl_seconds=60)
+    return SqliteEventStore(str(tmp_path / "events.sqlite"), ttl_seconds=60)
+
+
+def test_only_the_first_delivery_claims_an_event(event_store):
+    assert not event_store.seen("E1")
+    assert event_store.seen("E1")
+    assert not event_store.seen("E2")
+    assert event_store.stats() == {"hits": 1, "misses": 2}
+
+
+def test_expired_events_can_be_claimed_again(event_store):
+    event_store.ttl_seconds = 0.01
+    assert not event_store.seen("E1")
+    time.sleep(0.05)
+    assert not event_store.seen("E1")
+
+
+def test_memory_store_is_bounded():
+    event_store = MemoryEventStore(ttl_seconds=60, maxsize=2)
+    for event_id in ("E1", "E2", "E3"):
+        event_store.seen(event_id)
+
+    assert not event_store.seen("E1")
+
+
+def test_sqlite_store_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "events.sqlite")
+    first = SqliteEventStore(path, ttl_seconds=60)
+    second = SqliteEventStore(path, ttl_seconds=60)
+
+    assert not first.seen("E1")
+    assert second.seen("E1")
+
+
+@pytest.fixture
+def stores(monkeypatch):
+    shared = MemoryEventStore(ttl_seconds=60)
+    in_flight = MemoryEventStore(ttl_seconds=60)
+    monkeypatch.setattr(archer.server, "get_event_store", lambda: shared)
+    monkeypatch.setattr(archer.server, "in_flight_events", in_flight)
+    return shared, in_flight
+
+
+async def deliver(event_id: str, retry_num: int | None = None) -> bool:
+    """
+    Run an event through the middleware and return whether it reached the listeners.
+    """
+    headers = {"content-type": "application/json"}
+    if retry_num is not None:
+        headers["x-slack-retry-num"] = str(retry_num)
+    body = json.dumps({"event_id": event_id, "event": {"type": "message"}})
+    request = AsyncBoltRequest(body=body, headers=headers)
+    handled = []
+
+    async def next_():
+        handled.append(event_id)
+        return BoltResponse(status=200, body="")
+
+    response = await deduplicate_events(request, BoltResponse(status=200), next_)
+    if not handled:
+        assert response.headers["x-slack-no-retry"] == ["1"]
+    return bool(handled)
+
+
+@pytest.mark.asyncio
+async def test_duplicate_deliveries_are_acked_without_processing(stores):
+    assert await deliver("E1")
+    assert not await deliver("E1")
+    assert await deliver("E2")
+
+
+@pytest.mark.asyncio
+async def test_retries_of_events_in_flight_skip_the_shared_store(stores):
+    shared, _ = stores
+    assert await deliver("E1")
+
+    assert not await deliver("E1", retry_num=1)
+    assert shared.stats() == {"hits": 0, "misses": 1}
+
+
+@pytest.mark.asyncio
+async def test_retries_of_events_claimed_elsewhere_are_skipped(stores):
+    shared, _ = stores
+    shared.seen("E1")
+
+    assert not await deliver("E1", retry_num=1)
+
+
+@pytest.mark.asyncio
+async def test_retries_of_unclaimed_events_are_processed(stores):
+    assert await deliver("E1", retry_num=2)
+    assert not await deliver("E1", retry_num=3)
+
+
+@pytest.mark.asyncio
+async def test_other_requests_are_not_deduplicated(stores):
+    body = json.dumps({"type": "block_actions", "event_id": "E1"})
+    request = AsyncBoltRequest(body=body, headers={"content-type": "application/json"})
+
+    async def next_():
+        return BoltResponse(status=204, body="")
+
+    for _ in range(2):
+        response = await deduplicate_events(request, BoltResponse(status=200), next_)
+        assert response.status == 204
@@ -0,0 +1,188 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.tools import StructuredTool
+
+import archer.agent.executor
+from archer.agent.executor import ToolExecutor
+
+
+def make_tool(name: str, func) -> StructuredTool:
+    return StructuredTool.from_function(func, name=name, description=f"The {name} tool.")
+
+
+def call(name: str, call_id: str = "call-1") -> dict:
+    return {"name": name, "args": {"query": "q"}, "id": call_id}
+
+
+@pytest.fixture(autouse=True)
+def short_timeouts(monkeypatch):
+    monkeypatch.setattr(archer.agent.executor, "get_tool_timeout", lambda tool_name: 0.5)
+
+
+@pytest.fixture(params=["sync", "async"])
+def run_call(request):
+    def run(executor: ToolExecutor, tool_call: dict) -> ToolMessage:
+        if request.param == "sync":
+            return executor.run_call(tool_call, {})
+        return asyncio.run(executor.arun_call(tool_call, {}))
+
+    return run
+
+
+def test_calls_of_a_message_run_concurrently():
+    barrier = threading.Barrier(3, timeout=2)
+
+    def wait_for_the_others(query: str) -> str:
+        barrier.wait()
+        return "done"
+
+    executor = ToolExecutor([make_tool("Google_SendEmail", wait_for_the_others)])
+    message = AIMessage("", tool_calls=[call("Google_SendEmail", f"call-{i}") for i in range(3)])
+
+    result = executor.invoke({"messages": [message]}, {})
+
+    assert [m.content for m in result["messages"]] == ["done"] * 3
+    assert [m.tool_call_id for m in result["messages"]] == ["call-0", "call-1", "call-2"]
+
+
+def test_slow_read_only_call_is_hedged_once_and_never_retried(run_call):
+    started: list[float] = []
+
+    def slow(query: str) -> str:
+        started.append(time.monotonic())
+        time.sleep(2)
+        return "late"
+
+    executor = ToolExecutor([make_tool("Search_SearchGoogle", slow)], hedge_after=0.1)
+    began = time.monotonic()
+    message = run_call(executor, call("Search_SearchGoogle"))
+
+    assert message.status == "error"
+    assert "did not finish within 0.5 seconds" in message.content
+    assert time.monotonic() - began < 1
+    assert len(started) == 2
+
+
+def test_calls_with_side_effects_are_not_hedged(run_call):
+    started: list[float] = []
+
+    def slow(query: str) -> str:
+        started.append(time.monotonic())
+        time.sleep(1)
+        return "late"
+
+    executor = ToolExecutor([make_tool("Google_SendEmail", slow)], hedge_after=0.1)
+    assert run_call(executor, call("Google_SendEmail")).status == "error"
+    assert len(started) == 1
+
+
+def test_read_only_calls_are_retried_within_the_deadline(monkeypatch, run_call):
+    monkeypatch.setattr(archer.agent.executor, "get_tool_timeout", lambda tool_name: 5)
+    attempts: list[int] = []
+
+    def flaky(query: str) -> str:
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise ConnectionError("reset")
+        return "ok"
+
+    executor = ToolExecutor([make_tool("Search_SearchGoogle", flaky)], max_retries=2)
+    message = run_call(executor, call("Search_SearchGoogle"))
+
+    assert message.content == "ok"
+    assert len(attempts) == 2
+
+
+def test_retries_stop_at_the_deadline(run_call):
+    attempts: list[int] = []
+
+    def failing(query: str) -> str:
+        attempts.append(1)
+        raise ConnectionError("reset")
+
+    executor = ToolExecutor([make_tool("Search_SearchGoogle", failing)], max_retries=10)
+    began = time.monotonic()
+    message = run_call(executor, call("Search_SearchGoogle"))
+
+    assert message.status == "error"
+    assert "temporary error" in message.content
+    assert time.monotonic() - began < 0.5
+    assert len(attempts) < 10
+
+
+def test_connection_errors_of_calls_with_side_effects_are_not_retried(run_call):
+    attempts: list[int] = []
+
+    def failing(query: str) -> str:
+        attempts.append(1)
+        raise ConnectionError("reset")
+
+    executor = ToolExecutor([make_tool("Google_SendEmail", failing)], max_retries=2)
+    message = run_call(executor, call("Google_SendEmail"))
+
+    assert message.status == "error"
+    assert len(attempts) == 1
+
+
+def test_unknown_tools_get_an_error_result(run_call):
+    executor = ToolExecutor([make_tool("Google_SendEmail", lambda query: "sent")])
+    message = run_call(executor, call("Google_Unknown"))
+    assert message.status == "error"
+    assert "Google_SendEmail" in message.content
+
+
+class RefusingExecutor(ThreadPoolExecutor):
+    def submit(self, *args, **kwargs):
+        raise AssertionError("the default executor must not be used")
+
+
+@pytest.mark.asyncio
+async def test_async_calls_wait_on_the_event_loop():
+    asyncio.get_running_loop().set_default_executor(RefusingExecutor())
+    barrier = threading.Barrier(3, timeout=2)
+
+    def wait_for_the_others(query: str) -> str:
+        barrier.wait()
+        return "done"
+
+    def flaky(query: str) -> str:
+        raise ConnectionError("reset")
+
+    executor = ToolExecutor(
+        [
+            make_tool("Google_SendEmail", wait_for_the_others),
+            make_tool("Search_SearchGoogle", flaky),
+        ],
+        hedge_after=0.1,
+    )
+    calls = [call("Google_SendEmail", f"call-{i}") for i in range(3)]
+    calls.append(call("Search_SearchGoogle", "call-3"))
+    result = await executor.ainvoke({"messages": [AIMessage("", tool_calls=calls)]}, {})
+
+    assert [m.content for m in result["messages"][:3]] == ["done"] * 3
+    assert "temporary error" in result["messages"][3].content
+
+
+@pytest.mark.asyncio
+async def test_cancelled_async_calls_drop_their_queued_attempts(monkeypatch):
+    release = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(archer.agent.executor, "_pool", pool)
+    pool.submit(release.wait)
+    attempts: list[int] = []
+
+    executor = ToolExecutor([make_tool("Google_SendEmail", lambda query: attempts.append(1))])
+    task = asyncio.create_task(executor.arun_call(call("Google_SendEmail"), {}))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    release.set()
+    pool.shutdown(wait=True)
+    assert not attempts
@@ -0,0 +1,96 @@
+import fcntl
+import logging
+import threading
+from pathlib import Path
+
+import pytest
+
+from archer.storage.file import FileStore
+from archer.storage.schema import StorageResourceError, UserIdentity
+
+
+@pytest.fixture(params=[True, False], ids=["fsync", "no-fsync"])
+def store(request, tmp_path) -> FileStore:
+    return FileStore(str(tmp_path), logging.getLogger(__name__), fsync=request.param)
+
+
+def user(model: str = "gpt-4o") -> UserIdentity:
+    return UserIdentity(user_id="U1", provider="openai", model=model)
+
+
+def test_writes_replace_the_file(store):
+    store.set_state(user())
+    store.update_state(user("gpt-4o-mini"))
+
+    assert store.get_state("U1")["model"] == "gpt-4o-mini"
+    assert sorted(path.name for path in store.user_dir.iterdir()) == [".lock", "U1.json"]
+
+
+def test_a_failed_write_keeps_the_old_file(store):
+    store.set_state(user())
+
+    with pytest.raises(TypeError):
+        store.set_state({**user(), "model": object()})
+
+    assert store.get_state("U1")["model"] == "gpt-4o"
+    assert sorted(path.name for path in store.user_dir.iterdir()) == [".lock", "U1.json"]
+
+
+def test_agent_states_are_sharded(store):
+    store.save_agent_state("state-1", {"value": 1})
+
+    (path,) = store.state_dir.glob("*/*/state-1.json")
+    assert len(path.parent.name) == 2
+    assert len(path.parent.parent.name) == 2
+    assert store.get_agent_state("state-1") == {"value": 1}
+
+
+def test_agent_states_are_read_from_the_legacy_layout(store):
+    (store.state_dir / "state-1.json").write_text('{"value": 1}')
+    assert store.get_agent_state("state-1") == {"value": 1}
+
+
+@pytest.mark.parametrize("state_id", ["", "../users/U1", "../../etc/passwd", "a/b", "/etc/passwd"])
+def test_state_ids_outside_the_states_directory_are_rejected(store, state_id):
+    with pytest.raises(StorageResourceError):
+        store.save_agent_state(state_id, {})
+    with pytest.raises(StorageResourceError):
+        store.get_agent_state(state_id)
+    with pytest.raises(StorageResourceError):
+        store.delete_agent_states(state_id, before=0)
+
+
+def test_writers_wait_for_the_directory_lock(store):
+    store.set_state(user())
+    written = threading.Event()
+
+    def write():
+        store.update_state(user("gpt-4o-mini"))
+        written.set()
+
+    # Another process holding the lock is stood in for by a separate open file
+    with open(Path(store.user_dir) / FileStore.LOCK_FILE, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        writer = threading.Thread(target=write)
+        writer.start()
+        assert not written.wait(0.2)
+        assert store.get_state("U1")["model"] == "gpt-4o"
+    writer.join(timeout=5)
+
+    assert written.is_set()
+    assert store.get_state("U1")["model"] == "gpt-4o-mini"
+
+
+def test_concurrent_writers_leave_a_valid_file(store):
+    def write(index: int):
+        for _ in range(20):
+            store.update_state(user(f"model-{index}"))
+
+    writers = [threading.Thread(target=write, args=(index,)) for index in range(8)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    assert store.get_state("U1")["model"].startswith("model-")
+    assert sorted(path.name for path in store.user_dir.iterdir()) == [".lock", "U1.json"]
@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from archer.agent.utils import markdown_to_slack, slack_to_markdown
+from benchmarks.formatting import reference_markdown_to_slack, reference_slack_to_markdown
+
+SLACK_TO_MARKDOWN = [
+    ("*bold* _italic_ ~strike~", "**bold** *italic* ~~strike~~"),
+    ("`*code*` and *bold*", "`*code*` and **bold**"),
+    ("```\n*block*\n```\n_after_", "```\n*block*\n```\n*after*"),
+    ("* not bold *", "* not bold *"),
+    ("*a _b* c_", "**a *b** c*"),
+    ("hi <@U0123ABC> see <#C0123|general>", "hi <@U0123ABC> see <#C0123|general>"),
+    # Slack entities come out unchanged
+    ("<https://example.com/a_b_c|the_docs>", "<https://example.com/a_b_c|the_docs>"),
+    ("<https://example.com/a_b_c>", "<https://example.com/a_b_c>"),
+    ("<!here> *now*", "<!here> **now**"),
+]
+
+MARKDOWN_TO_SLACK = [
+    ("**bold** *italic* ~~strike~~", "*bold* _italic_ ~strike~"),
+    ("***both***", "_*both*_"),
+    ("__bold__ and [docs](https://example.com)", "*bold* and <https://example.com|docs>"),
+    ("**bold with *italic* inside**", "*bold with _italic_ inside*"),
+    ("`**code**` **bold**", "`**code**` *bold*"),
+    ("```\n**block**\n```", "```\n**block**\n```"),
+    # Slack entities come out unchanged
+    (
+        "ask <@U0123ABC> about <https://example.com/a__b__c>",
+        "ask <@U0123ABC> about <https://example.com/a__b__c>",
+    ),
+]
+
+
+# Pieces of the random cases, weighted towards formatting characters. Slack
+# entities are left out, since the converters keep them unchanged and the
+# previous implementation (the reference) did not.
+PIECES = ["*", "**", "***", "_", "__", "~", "~~", "`", "```", " ", "\n", "a", "bc"]
+PIECES += ["[", "]", "(", ")", "<", ">", "\x00"]
+WEIGHTS = [6, 3, 2, 5, 3, 4, 2, 2, 1, 5, 2, 6, 4, 1, 1, 1, 1, 1, 1, 1]
+
+
+def random_cases(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)  # noqa: S311
+    return ["".join(rng.choices(PIECES, WEIGHTS, k=rng.randint(1, 30))) for _ in range(count)]
+
+
+@pytest.mark.parametrize(("text", "expected"), SLACK_TO_MARKDOWN)
+def test_slack_to_markdown(text, expected):
+    assert slack_to_markdown(text) == expected
+
+
+@pytest.mark.parametrize(("text", "expected"), MARKDOWN_TO_SLACK)
+def test_markdown_to_slack(text, expected):
+    assert markdown_to_slack(text) == expected
+
+
+@pytest.mark.parametrize(
+    ("convert", "reference"),
+    [
+        (slack_to_markdown, reference_slack_to_markdown),
+        (markdown_to_slack, reference_markdown_to_slack),
+    ],
+)
+def test_matches_reference_on_random_text(convert, reference):
+    differences = [
+        (text, convert(text), reference(text))
+        for text in random_cases(20_000)
+        if convert(text) != reference(text)
+    ]
+    assert not differences[:10]
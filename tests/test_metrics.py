@@ -0,0 +1,46 @@
+import pytest
+
+import archer.metrics
+from archer.metrics import Counter, Histogram, Metric, render
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(archer.metrics, "_metrics", [])
+
+
+def test_metric_is_abstract():
+    with pytest.raises(TypeError):
+        Metric("archer_test", "A metric without samples")
+
+
+def test_counter_renders_a_sample_per_label_value():
+    counter = Counter("archer_test_total", "Test events", ("kind",))
+    counter.inc("a")
+    counter.inc("a", amount=2)
+    counter.inc("b")
+
+    lines = render().splitlines()
+    assert lines[:2] == ["# HELP archer_test_total Test events", "# TYPE archer_test_total counter"]
+    assert 'archer_test_total{kind="a"} 3' in lines
+    assert 'archer_test_total{kind="b"} 1' in lines
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("archer_test_seconds", "Test durations", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 5):
+        histogram.observe(value)
+
+    lines = render().splitlines()
+    assert 'archer_test_seconds_bucket{le="0.1"} 1' in lines
+    assert 'archer_test_seconds_bucket{le="1"} 3' in lines
+    assert 'archer_test_seconds_bucket{le="+Inf"} 4' in lines
+    assert "archer_test_seconds_count 4" in lines
+    assert "archer_test_seconds_sum 6.25" in lines
+
+
+def test_stats_become_gauges():
+    stats = {"scheduler": {"running": 2, "queued_by_workspace": {"W1": 3}}}
+    lines = render(stats).splitlines()
+    assert "archer_scheduler_running 2" in lines
+    assert 'archer_scheduler_queued_by_workspace{workspace="W1"} 3' in lines
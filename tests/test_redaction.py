@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from archer.agent.redaction import Redactor, redactor
+from archer.env import _flag
+
+TEXT = (
+    "Contact jane.doe@example.com or call (555) 123-4567 about card "
+    "4111 1111 1111 1111 and SSN 123-45-6789. Nothing else here is personal, "
+    "though the meeting is at 10:30 in room 42.\n"
+) * 5
+
+
+def test_redacts_each_kind_of_personal_data():
+    assert redactor.redact("mail jane.doe@example.com now") == "mail [EMAIL] now"
+    assert redactor.redact("call (555) 123-4567") == "call [PHONE]"
+    assert redactor.redact("card 4111-1111-1111-1111") == "card [CREDIT CARD]"
+    assert redactor.redact("ssn 123-45-6789") == "ssn [SSN]"
+
+
+def test_text_without_personal_data_is_unchanged():
+    text = "The meeting is at 10:30 in room 42."
+    assert redactor.redact(text) == text
+
+
+def test_terms_are_matched_as_whole_words_ignoring_case():
+    terms = Redactor(rules=[], terms=["Project X", "Acme"])
+    assert terms.redact("acme ships project x, not Acmeville") == (
+        "[REDACTED] ships [REDACTED], not Acmeville"
+    )
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_streamed_text_is_redacted_like_the_whole_text(seed):
+    rng = random.Random(seed)  # noqa: S311
+    stream = redactor.stream(holdback=32)
+    output = ""
+    position = 0
+    while position < len(TEXT):
+        size = rng.randint(1, 8)
+        output += stream.feed(TEXT[position : position + size])
+        position += size
+    output += stream.flush()
+
+    assert output == redactor.redact(TEXT)
+    assert "@" not in output
+    assert "4111" not in output
+
+
+def test_stream_holds_back_text_that_may_be_part_of_a_match():
+    stream = redactor.stream(holdback=16)
+    released = stream.feed("word " * 8 + "jane.doe@exa")
+    assert "jane" not in released
+    released += stream.feed("mple.com and then some more words to push it out")
+    released += stream.flush()
+    assert "[EMAIL]" in released
+    assert "jane" not in released
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("true", True),
+        ("1", True),
+        ("Yes", True),
+        (" on ", True),
+        ("false", False),
+        ("0", False),
+        ("off", False),
+        ("", False),
+    ],
+)
+def test_redaction_flag_accepts_the_usual_spellings(monkeypatch, value, expected):
+    monkeypatch.setenv("REDACTION_ENABLED", value)
+    assert _flag("REDACTION_ENABLED", False) is expected
+
+
+def test_redaction_flag_rejects_unknown_values(monkeypatch):
+    # Redaction must not be turned off by a typo
+    monkeypatch.setenv("REDACTION_ENABLED", "ture")
+    with pytest.raises(ValueError, match="REDACTION_ENABLED"):
+        _flag("REDACTION_ENABLED", False)
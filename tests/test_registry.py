@@ -0,0 +1,166 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from archer.agent import registry
+from archer.agent.registry import AgentRegistry
+
+
+class FakeAgent:
+    def __init__(self, model: str, manifest):
+        self.model = model
+        self.manifest = manifest
+
+
+class Manifests:
+    """
+    Stands in for load_tool_manifest: each call returns a new numbered manifest,
+    or raises while `failing` is set. `loaded` is set after every call.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.failing = False
+        self.loaded = threading.Event()
+
+    def __call__(self):
+        try:
+            if self.failing:
+                raise RuntimeError("Arcade is down")
+            self.count += 1
+            return SimpleNamespace(version=self.count, tools=[], fetched_at=time.time())
+        finally:
+            self.loaded.set()
+
+    def wait(self, count: int = 1) -> None:
+        for _ in range(count):
+            assert self.loaded.wait(timeout=5)
+            self.loaded.clear()
+
+
+def eventually(condition) -> bool:
+    deadline = time.monotonic() + 5
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def manifests(monkeypatch) -> Manifests:
+    manifests = Manifests()
+    monkeypatch.setattr(registry, "load_tool_manifest", manifests)
+    monkeypatch.setattr(registry, "ReactAgent", FakeAgent)
+    return manifests
+
+
+@pytest.fixture
+def make_registry():
+    registries = []
+
+    def make(refresh_seconds: float) -> AgentRegistry:
+        agents = AgentRegistry(refresh_seconds=refresh_seconds)
+        registries.append(agents)
+        return agents
+
+    yield make
+    for agents in registries:
+        agents.stop_refresh()
+        if agents._refresh_thread is not None:
+            agents._refresh_thread.join(timeout=5)
+
+
+def test_agents_are_built_once_per_model_from_one_manifest(manifests, make_registry):
+    agents = make_registry(refresh_seconds=0)
+
+    assert agents.get("gpt-4o") is agents.get("gpt-4o")
+    assert agents.get("gpt-4o").manifest is agents.get("gpt-4o-mini").manifest
+    assert manifests.count == 1
+    assert agents.stats()["models"] == ["gpt-4o", "gpt-4o-mini"]
+
+
+def test_concurrent_first_requests_wait_for_one_build(manifests, make_registry, monkeypatch):
+    agents = make_registry(refresh_seconds=0)
+    builds = []
+
+    def slow_agent(model: str, manifest) -> FakeAgent:
+        builds.append(model)
+        time.sleep(0.05)
+        return FakeAgent(model, manifest)
+
+    monkeypatch.setattr(registry, "ReactAgent", slow_agent)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(agents.get("gpt-4o"))) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert builds == ["gpt-4o"]
+    assert len({id(agent) for agent in results}) == 1
+
+
+def test_refresh_replaces_the_manifest_and_the_built_agents(manifests, make_registry):
+    agents = make_registry(refresh_seconds=0)
+    old = agents.get("gpt-4o")
+
+    agents.refresh()
+
+    new = agents.get("gpt-4o")
+    assert new is not old
+    assert (old.manifest.version, new.manifest.version) == (1, 2)
+    # Models that were never requested are not built by a refresh
+    assert agents.peek("gpt-4o-mini") is None
+    assert agents.get("gpt-4o-mini").manifest is new.manifest
+
+
+def test_start_refresh_reloads_the_manifest_when_it_expires(manifests, make_registry):
+    agents = make_registry(refresh_seconds=0.05)
+    agents.get("gpt-4o")
+    manifests.wait()
+
+    agents.start_refresh()
+
+    assert eventually(lambda: agents.stats()["refreshes"] >= 2)
+    assert manifests.count >= 3
+    assert agents.get("gpt-4o").manifest.version >= 3
+
+
+def test_failed_refreshes_keep_the_current_agents(manifests, make_registry):
+    agents = make_registry(refresh_seconds=0.05)
+    current = agents.get("gpt-4o")
+    manifests.wait()
+    manifests.failing = True
+
+    agents.start_refresh()
+    manifests.wait(2)
+
+    assert agents.get("gpt-4o") is current
+    assert agents.stats()["refresh_failures"] >= 1
+    assert agents.stats()["refreshes"] == 0
+
+    # The next successful refresh replaces them
+    manifests.failing = False
+    assert eventually(lambda: agents.get("gpt-4o") is not current)
+
+
+def test_refresh_runs_only_when_enabled_and_once(manifests, make_registry):
+    disabled = make_registry(refresh_seconds=0)
+    disabled.start_refresh()
+    assert disabled._refresh_thread is None
+
+    agents = make_registry(refresh_seconds=60)
+    agents.start_refresh()
+    thread = agents._refresh_thread
+    agents.start_refresh()
+    assert agents._refresh_thread is thread
+
+    agents.stop_refresh()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert manifests.count == 0
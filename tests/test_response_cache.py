@@ -0,0 +1,218 @@
+import math
+import sys
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+import archer.agent
+from archer.agent import _is_shareable, invoke_agent
+from archer.agent.response_cache import SemanticResponseCache, hashed_embedding, normalize_prompt
+
+# Unit vectors at a known cosine similarity to "capital of france"
+VECTORS = {
+    "capital of france": [1.0, 0.0],
+    "france capital": [0.96, 0.28],
+    "capital city of france": [0.8, 0.6],
+    "weather in paris": [0.0, 1.0],
+}
+TOOLS = ["Search_SearchGoogle", "Web_ScrapeUrl"]
+
+
+@pytest.fixture
+def clock(monkeypatch) -> list[float]:
+    now = [0.0]
+    # archer.agent.response_cache is also the name of the cache instance in archer.agent
+    module = sys.modules[SemanticResponseCache.__module__]
+    monkeypatch.setattr(module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def cache(**kwargs) -> SemanticResponseCache:
+    return SemanticResponseCache(embed=VECTORS.__getitem__, **{"threshold": 0.95, **kwargs})
+
+
+def test_prompts_are_normalized():
+    assert normalize_prompt("  <@U123> What's  the Weather? ") == "what's the weather"
+
+
+def test_hashed_embeddings_are_deterministic():
+    assert hashed_embedding("capital of france") == hashed_embedding("capital of france")
+    assert hashed_embedding("capital of france") != hashed_embedding("weather in paris")
+
+
+def test_hashed_embeddings_rank_similar_texts_higher():
+    responses = SemanticResponseCache(embed=hashed_embedding)
+    vector = responses.key("gpt-4o", "what is the capital of france").vector
+    close = responses.key("gpt-4o", "what's the capital of france").vector
+    far = responses.key("gpt-4o", "summarize my unread emails").vector
+
+    assert math.isclose(sum(x * x for x in vector), 1.0)
+    assert sum(map(float.__mul__, vector, close)) > sum(map(float.__mul__, vector, far))
+
+
+def test_similar_prompts_hit_above_the_threshold(clock):
+    responses = cache()
+    responses.put(responses.key("gpt-4o", "Capital of France?", TOOLS), "Paris")
+
+    assert responses.get(responses.key("gpt-4o", "capital of france", TOOLS)) == "Paris"
+    assert responses.get(responses.key("gpt-4o", "france capital", TOOLS)) == "Paris"
+    assert responses.get(responses.key("gpt-4o", "capital city of france", TOOLS)) is None
+    assert responses.get(responses.key("gpt-4o", "weather in paris", TOOLS)) is None
+
+    stats = responses.stats()
+    assert (stats["hits"], stats["exact_hits"], stats["misses"]) == (2, 1, 2)
+
+
+def test_a_lower_threshold_accepts_looser_matches(clock):
+    responses = cache(threshold=0.75)
+    responses.put(responses.key("gpt-4o", "capital of france", TOOLS), "Paris")
+
+    assert responses.get(responses.key("gpt-4o", "capital city of france", TOOLS)) == "Paris"
+    assert responses.get(responses.key("gpt-4o", "weather in paris", TOOLS)) is None
+
+
+def test_the_most_similar_prompt_wins(clock):
+    responses = cache(threshold=0.5)
+    responses.put(responses.key("gpt-4o", "capital city of france", TOOLS), "Paris, the city")
+    responses.put(responses.key("gpt-4o", "france capital", TOOLS), "Paris")
+
+    assert responses.get(responses.key("gpt-4o", "capital of france", TOOLS)) == "Paris"
+
+
+def test_entries_expire_after_the_ttl(clock):
+    responses = cache(ttl=60)
+    responses.put(responses.key("gpt-4o", "capital of france", TOOLS), "Paris")
+
+    clock[0] = 59.9
+    assert responses.get(responses.key("gpt-4o", "france capital", TOOLS)) == "Paris"
+    clock[0] = 60.0
+    assert responses.get(responses.key("gpt-4o", "capital of france", TOOLS)) is None
+    assert responses.stats()["size"] == 0
+
+
+def test_the_least_recently_used_entry_is_evicted(clock):
+    responses = cache(maxsize=2)
+    responses.put(responses.key("gpt-4o", "capital of france", TOOLS), "Paris")
+    responses.put(responses.key("gpt-4o", "weather in paris", TOOLS), "Sunny")
+    # Using the first entry makes the second one the least recently used
+    assert responses.get(responses.key("gpt-4o", "capital of france", TOOLS)) == "Paris"
+    responses.put(responses.key("gpt-4o", "capital city of france", TOOLS), "Paris, the city")
+
+    assert responses.get(responses.key("gpt-4o", "weather in paris", TOOLS)) is None
+    assert responses.get(responses.key("gpt-4o", "capital of france", TOOLS)) == "Paris"
+    assert responses.stats()["evictions"] == 1
+
+
+def test_entries_are_scoped_by_model(clock):
+    responses = cache()
+    responses.put(responses.key("gpt-4o", "capital of france", TOOLS), "Paris")
+
+    assert responses.get(responses.key("gpt-4o-mini", "capital of france", TOOLS)) is None
+    assert responses.get(responses.key("gpt-4o-mini", "france capital", TOOLS)) is None
+
+
+def test_entries_are_scoped_by_tool_set(clock):
+    responses = cache()
+    responses.put(responses.key("gpt-4o", "capital of france", TOOLS), "Paris")
+
+    # The order of the tools does not matter, their set does
+    reordered = list(reversed(TOOLS))
+    assert responses.get(responses.key("gpt-4o", "capital of france", reordered)) == "Paris"
+    assert responses.get(responses.key("gpt-4o", "capital of france", TOOLS[:1])) is None
+    assert responses.get(responses.key("gpt-4o", "france capital", [])) is None
+
+
+def run(*messages, **state) -> dict:
+    return {"messages": [SystemMessage("system"), HumanMessage("question"), *messages], **state}
+
+
+def tool_call(name: str, call_id: str = "call-1") -> AIMessage:
+    return AIMessage("", tool_calls=[{"name": name, "args": {}, "id": call_id}])
+
+
+def tool_result(name: str, call_id: str = "call-1", status: str = "success") -> ToolMessage:
+    return ToolMessage("result", name=name, tool_call_id=call_id, status=status)
+
+
+@pytest.mark.parametrize(
+    "state",
+    [
+        run(AIMessage("Paris")),
+        run(
+            tool_call("Search_SearchGoogle"),
+            tool_result("Search_SearchGoogle"),
+            tool_call("FetchToolOutput", "call-2"),
+            tool_result("FetchToolOutput", "call-2"),
+            AIMessage("Paris"),
+        ),
+        # Only the last question of the run counts
+        {
+            "messages": [
+                HumanMessage("earlier"),
+                tool_call("Google_ListEmails"),
+                tool_result("Google_ListEmails"),
+                *run(AIMessage("Paris"))["messages"],
+            ]
+        },
+    ],
+    ids=["no-tools", "public-tools", "earlier-turn"],
+)
+def test_answers_from_public_data_are_shareable(state):
+    assert _is_shareable(state)
+
+
+@pytest.mark.parametrize(
+    "state",
+    [
+        run(tool_call("Google_ListEmails"), tool_result("Google_ListEmails"), AIMessage("3")),
+        run(
+            tool_call("Search_SearchGoogle"),
+            tool_call("Github_ListRepositories", "call-2"),
+            tool_result("Search_SearchGoogle"),
+            tool_result("Github_ListRepositories", "call-2"),
+            AIMessage("Here"),
+        ),
+        run(
+            tool_call("Search_SearchGoogle"),
+            tool_result("Search_SearchGoogle", status="error"),
+            AIMessage("Search failed"),
+        ),
+        run(tool_call("Google_ListEmails"), auth_message="Please authorize Google"),
+        run(tool_call("Search_SearchGoogle"), tool_result("Search_SearchGoogle")),
+        run(AIMessage("")),
+        {"messages": []},
+    ],
+    ids=[
+        "user-tool",
+        "user-tool-among-public",
+        "failed-tool",
+        "authorization",
+        "no-answer",
+        "empty-answer",
+        "no-messages",
+    ],
+)
+def test_user_specific_or_failed_answers_are_not_shareable(state):
+    assert not _is_shareable(state)
+
+
+@pytest.mark.asyncio
+async def test_first_questions_of_new_threads_are_answered_from_the_cache(fake_agent, monkeypatch):
+    fake_agent.tools = [SimpleNamespace(name=name) for name in TOOLS]
+    monkeypatch.setattr(archer.agent, "response_cache", SemanticResponseCache(hashed_embedding))
+
+    first = await invoke_agent("U1", "What is the capital of France?", thread_id="T1")
+    second = await invoke_agent("U2", "what is the capital of france", thread_id="T2")
+    # Follow-up questions depend on the thread and go to the agent
+    follow_up = await invoke_agent("U2", "what is the capital of france", thread_id="T2")
+
+    assert first.content == second.content == "answer 1"
+    assert follow_up.content == "answer 2"
+    assert len(fake_agent.calls) == 2
+    # The cached answer is in the thread's checkpoint, before the follow-up
+    assert [message.content for message in fake_agent.calls[-1][1:]] == [
+        "what is the capital of france",
+        "answer 1",
+        "what is the capital of france",
+    ]
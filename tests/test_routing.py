@@ -0,0 +1,88 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import StructuredTool
+
+from archer.agent.routing import ToolRouter, tokenize
+
+DESCRIPTIONS = {
+    "Google_ListEmails": "List emails in the user's Gmail inbox.",
+    "Google_SendEmail": "Send an email from the user's Gmail account.",
+    "Google_ListEvents": "List events in the user's Google Calendar.",
+    "Github_ListPullRequests": "List the pull requests of a GitHub repository.",
+    "Search_SearchGoogle": "Search the web with Google.",
+    "Weather_GetForecast": "Get the weather forecast for a city.",
+    "FetchToolOutput": "Read more of a tool output that was truncated.",
+}
+
+
+def make_tool(name: str, description: str) -> StructuredTool:
+    def run(query: str = "") -> str:
+        return ""
+
+    return StructuredTool.from_function(run, name=name, description=description)
+
+
+@pytest.fixture
+def router() -> ToolRouter:
+    tools = [make_tool(name, description) for name, description in DESCRIPTIONS.items()]
+    return ToolRouter(tools, max_tools=2, always=["FetchToolOutput"])
+
+
+def test_tokenize_splits_names_and_expands_aliases():
+    assert tokenize("ListEmails") == ["listemail", "list", "email"]
+    assert tokenize("open PRs in my repo") == ["open", "pull", "request", "repository"]
+
+
+def test_select_returns_the_matching_tools_and_the_always_tools(router):
+    selected = router.select([HumanMessage("what's in my inbox?")])
+    assert "Google_ListEmails" in selected
+    assert "FetchToolOutput" in selected
+    assert len(selected) <= 3
+
+
+def test_select_keeps_the_order_the_tools_were_given(router):
+    selected = router.select([HumanMessage("list my pull requests and my emails")])
+    assert selected == sorted(selected, key=list(DESCRIPTIONS).index)
+
+
+def test_select_returns_none_when_nothing_matches(router):
+    assert router.select([HumanMessage("and the one after that?")]) is None
+
+
+def test_recent_use_does_not_select_tools_when_nothing_matches(router):
+    router.record_use("U1", ["Google_ListEmails"])
+    assert router.select([HumanMessage("and the one after that?")], "U1") is None
+
+
+def test_recent_use_breaks_ties_between_matching_tools(router):
+    question = [HumanMessage("list")]
+    assert "Github_ListPullRequests" not in router.select(question, "U1")
+    router.record_use("U1", ["Github_ListPullRequests"])
+    assert "Github_ListPullRequests" in router.select(question, "U1")
+
+
+def test_recent_use_does_not_add_tools_the_question_does_not_match(router):
+    router.record_use("U1", ["Google_ListEmails"])
+    selected = router.select([HumanMessage("weather forecast in Paris")], "U1")
+    assert "Weather_GetForecast" in selected
+    assert "Google_ListEmails" not in selected
+
+
+def test_select_only_reads_the_latest_user_messages(router):
+    messages = [
+        HumanMessage("check my pull requests"),
+        AIMessage("Here they are."),
+        HumanMessage("thanks"),
+        AIMessage("You're welcome."),
+        HumanMessage("weather forecast?"),
+    ]
+    selected = router.select(messages)
+    assert "Weather_GetForecast" in selected
+    assert "Github_ListPullRequests" not in selected
+
+
+def test_record_use_is_bounded(router):
+    router.max_users = 2
+    for user_id in ("U1", "U2", "U3"):
+        router.record_use(user_id, ["Google_ListEmails"])
+    assert list(router._recent) == ["U2", "U3"]
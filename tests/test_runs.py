@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from archer.agent import _cancelled_tool_results, invoke_agent
+from archer.agent.runs import ThreadRunTracker
+
+
+async def settle() -> None:
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_new_message_cancels_the_run_in_flight():
+    tracker = ThreadRunTracker()
+    release = asyncio.Event()
+    seen: list[list[str]] = []
+
+    async def func(run):
+        seen.append(list(run.prompts))
+        run.mark_started()
+        await release.wait()
+        return run.prompts[-1]
+
+    first = asyncio.ensure_future(tracker.run("T1", "q1", func))
+    await settle()
+    second = asyncio.ensure_future(tracker.run("T1", "q2", func))
+    await settle()
+    release.set()
+
+    assert await first is None
+    assert await second == "q2"
+    # The first run had started, so its prompt is not sent again
+    assert seen == [["q1"], ["q2"]]
+    assert tracker.stats() == {"active": 0, "superseded": 1}
+
+
+@pytest.mark.asyncio
+async def test_prompts_of_a_run_that_never_started_are_carried_over():
+    tracker = ThreadRunTracker()
+    release = asyncio.Event()
+    seen: list[list[str]] = []
+
+    async def func(run):
+        # Waiting for a scheduler slot, the run has not checkpointed its prompts yet
+        await release.wait()
+        seen.append(list(run.prompts))
+        run.mark_started()
+        return run.prompts
+
+    first = asyncio.ensure_future(tracker.run("T1", "q1", func))
+    await settle()
+    second = asyncio.ensure_future(tracker.run("T1", "q2", func))
+    await settle()
+    release.set()
+
+    assert await first is None
+    assert await second == ["q1", "q2"]
+    assert seen == [["q1", "q2"]]
+
+
+@pytest.mark.asyncio
+async def test_runs_of_other_threads_are_not_cancelled():
+    tracker = ThreadRunTracker()
+
+    async def func(run):
+        await asyncio.sleep(0.01)
+        return run.thread_id
+
+    results = await asyncio.gather(tracker.run("T1", "q1", func), tracker.run("T2", "q2", func))
+    assert results == ["T1", "T2"]
+
+
+@pytest.mark.asyncio
+async def test_superseded_agent_run_keeps_its_message_in_the_thread(fake_agent):
+    fake_agent.release.clear()
+    first = asyncio.ensure_future(invoke_agent("U1", "first question", thread_id="T1"))
+    while not fake_agent.calls:
+        await asyncio.sleep(0.01)
+
+    second = asyncio.ensure_future(invoke_agent("U1", "second question", thread_id="T1"))
+    await settle()
+    fake_agent.release.set()
+
+    assert (await first).superseded
+    response = await second
+    assert not response.superseded
+    assert response.content == "answer 2"
+    questions = [
+        message.content for message in fake_agent.calls[-1] if isinstance(message, HumanMessage)
+    ]
+    assert questions == ["first question", "second question"]
+
+
+@pytest.mark.asyncio
+async def test_message_of_a_run_cancelled_before_its_checkpoint_is_not_lost(fake_agent):
+    loading = asyncio.Event()
+    aget_state = fake_agent.graph.aget_state
+
+    async def slow_aget_state(config, *args, **kwargs):
+        # The first run is cancelled while it reads the checkpoint to build its input
+        if not loading.is_set():
+            loading.set()
+            await asyncio.sleep(3600)
+        return await aget_state(config, *args, **kwargs)
+
+    fake_agent.graph.aget_state = slow_aget_state
+    first = asyncio.ensure_future(invoke_agent("U1", "first question", thread_id="T1"))
+    await loading.wait()
+    response = await invoke_agent("U1", "second question", thread_id="T1")
+
+    assert (await first).superseded
+    assert response.content == "answer 1"
+    questions = [
+        message.content for message in fake_agent.calls[-1] if isinstance(message, HumanMessage)
+    ]
+    assert questions == ["first question", "second question"]
+
+
+def test_unanswered_tool_calls_get_a_result_with_an_unknown_outcome():
+    messages = [
+        HumanMessage("send the report and check my calendar"),
+        AIMessage(
+            "",
+            tool_calls=[
+                {"name": "Google_SendEmail", "args": {}, "id": "call-1"},
+                {"name": "Google_ListEvents", "args": {}, "id": "call-2"},
+            ],
+        ),
+        ToolMessage("[]", tool_call_id="call-2"),
+    ]
+
+    results = _cancelled_tool_results(messages)
+
+    assert [result["tool_call_id"] for result in results] == ["call-1"]
+    assert "may or may not have completed" in results[0]["content"]
+
+
+def test_answered_tool_calls_need_no_results():
+    messages = [
+        AIMessage("", tool_calls=[{"name": "Google_ListEvents", "args": {}, "id": "call-1"}]),
+        ToolMessage("[]", tool_call_id="call-1"),
+        AIMessage("You have no events."),
+    ]
+    assert _cancelled_tool_results(messages) == []
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+
+from archer.agent.scheduler import AgentScheduler
+
+
+async def settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class Runs:
+    """
+    Runs that hold their scheduler slot until released, recording the start order.
+    """
+
+    def __init__(self, scheduler: AgentScheduler):
+        self.scheduler = scheduler
+        self.started: list[str] = []
+        self.release: dict[str, asyncio.Event] = {}
+        self.tasks: dict[str, asyncio.Task] = {}
+
+    def start(self, name: str, user_id: str, workspace_id: str = "W1", on_queued=None) -> None:
+        self.release[name] = asyncio.Event()
+
+        async def run() -> None:
+            async with self.scheduler.slot(user_id, workspace_id, on_queued):
+                self.started.append(name)
+                await self.release[name].wait()
+
+        self.tasks[name] = asyncio.ensure_future(run())
+
+    async def finish(self, name: str) -> None:
+        self.release[name].set()
+        await self.tasks[name]
+        await settle()
+
+    async def finish_all(self) -> None:
+        for event in self.release.values():
+            event.set()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+
+@pytest_asyncio.fixture
+async def make_runs():
+    created: list[Runs] = []
+
+    def make(max_concurrency: int, max_per_user: int) -> Runs:
+        runs = Runs(AgentScheduler(max_concurrency, max_per_user))
+        created.append(runs)
+        return runs
+
+    yield make
+    for runs in created:
+        await runs.finish_all()
+
+
+@pytest.mark.asyncio
+async def test_runs_beyond_the_limit_wait_for_a_slot(make_runs):
+    runs = make_runs(max_concurrency=2, max_per_user=5)
+    for name in ("a", "b", "c"):
+        runs.start(name, user_id=name)
+    await settle()
+    assert runs.started == ["a", "b"]
+    assert runs.scheduler.stats()["queued"] == 1
+
+    await runs.finish("a")
+    assert runs.started == ["a", "b", "c"]
+    assert runs.scheduler.stats()["running"] == 2
+
+
+@pytest.mark.asyncio
+async def test_a_user_runs_at_most_max_per_user_at_once(make_runs):
+    runs = make_runs(max_concurrency=4, max_per_user=1)
+    runs.start("u1-first", user_id="U1")
+    runs.start("u1-second", user_id="U1")
+    runs.start("u2", user_id="U2")
+    await settle()
+    assert runs.started == ["u1-first", "u2"]
+
+    await runs.finish("u1-first")
+    assert runs.started == ["u1-first", "u2", "u1-second"]
+
+
+@pytest.mark.asyncio
+async def test_queue_is_served_round_robin_across_workspaces(make_runs):
+    runs = make_runs(max_concurrency=1, max_per_user=5)
+    runs.start("busy", user_id="U0", workspace_id="W0")
+    for name in ("a1", "a2", "a3"):
+        runs.start(name, user_id="UA", workspace_id="WA")
+    runs.start("b1", user_id="UB", workspace_id="WB")
+    await settle()
+
+    for name in ("busy", "a1", "b1", "a2"):
+        await runs.finish(name)
+    assert runs.started == ["busy", "a1", "b1", "a2", "a3"]
+
+
+@pytest.mark.asyncio
+async def test_queued_runs_are_told_their_position(make_runs):
+    runs = make_runs(max_concurrency=1, max_per_user=5)
+    positions: dict[str, list[int]] = {"b": [], "c": []}
+
+    def reporter(name: str):
+        async def on_queued(position: int) -> None:
+            positions[name].append(position)
+
+        return on_queued
+
+    runs.start("a", user_id="U1")
+    runs.start("b", user_id="U2", on_queued=reporter("b"))
+    runs.start("c", user_id="U3", on_queued=reporter("c"))
+    await settle()
+    assert positions == {"b": [1], "c": [2]}
+
+    await runs.finish("a")
+    # b leaves the queue and starts, c moves up
+    assert positions == {"b": [1, 0], "c": [2, 1]}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_queued_run_gives_up_its_place(make_runs):
+    runs = make_runs(max_concurrency=1, max_per_user=5)
+    for name in ("a", "b", "c"):
+        runs.start(name, user_id=name)
+    await settle()
+
+    runs.tasks["b"].cancel()
+    await settle()
+    assert runs.scheduler.stats()["queued"] == 1
+
+    await runs.finish("a")
+    assert runs.started == ["a", "c"]
+    await runs.finish("c")
+    assert runs.scheduler.stats()["running"] == 0
@@ -0,0 +1,112 @@
+import logging
+import sqlite3
+import threading
+
+import pytest
+
+import archer.storage.functions
+from archer.storage.file import FileStore
+from archer.storage.schema import StorageResourceError, UserIdentity
+from archer.storage.sqlite import SqliteStore
+
+logger = logging.getLogger(__name__)
+
+
+def user(user_id: str = "U1", model: str = "gpt-4o") -> UserIdentity:
+    return UserIdentity(user_id=user_id, provider="openai", model=model)
+
+
+@pytest.fixture(params=["WAL", "DELETE"])
+def journal_mode(request) -> str:
+    return request.param
+
+
+def test_a_fresh_database_gets_the_schema(tmp_path, journal_mode):
+    store = SqliteStore(str(tmp_path / "archer.sqlite"), logger, journal_mode=journal_mode)
+
+    conn = sqlite3.connect(tmp_path / "archer.sqlite")
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master")}
+    assert {"users", "agent_states"} <= tables
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0].upper() == journal_mode
+    assert store.is_empty()
+    assert store.get_version("U1") is None
+    with pytest.raises(StorageResourceError):
+        store.get_state("U1")
+
+
+def test_reopening_keeps_the_data(tmp_path):
+    SqliteStore(str(tmp_path / "archer.sqlite"), logger).set_state(user())
+
+    store = SqliteStore(str(tmp_path / "archer.sqlite"), logger)
+    assert store.get_state("U1") == user()
+
+
+def test_each_write_bumps_the_version(tmp_path):
+    store = SqliteStore(str(tmp_path / "archer.sqlite"), logger)
+    store.set_state(user())
+    store.update_state(user(model="gpt-4o-mini"))
+
+    assert store.get_version("U1") == 2
+    assert store.get_state("U1")["model"] == "gpt-4o-mini"
+
+
+def test_users_are_imported_from_the_file_store(tmp_path):
+    file_store = FileStore(str(tmp_path), logger)
+    file_store.set_state(user("U1"))
+    file_store.set_state(user("U2", model="gpt-4o-mini"))
+    (file_store.user_dir / "U3.json").write_text("not json")
+
+    store = SqliteStore(str(tmp_path / "archer.sqlite"), logger)
+    store.set_state(user("U2", model="o1"))
+
+    assert store.import_file_store(file_store) == 2
+    assert store.get_states(["U1", "U2", "U3"]) == {
+        "U1": user("U1"),
+        # Users already in the database are not overwritten by the import
+        "U2": user("U2", model="o1"),
+    }
+
+
+def test_get_store_migrates_the_file_store_once(tmp_path, monkeypatch):
+    FileStore(str(tmp_path), logger).set_state(user())
+    monkeypatch.setattr(archer.storage.functions, "STORAGE_TYPE", "sqlite")
+    monkeypatch.setattr(archer.storage.functions, "FILE_STORAGE_BASE_DIR", str(tmp_path))
+    monkeypatch.setattr(archer.storage.functions, "_store", None)
+
+    store = archer.storage.functions.get_store()
+    assert isinstance(store, SqliteStore)
+    assert store.get_state("U1") == user()
+
+    store.update_state(user(model="gpt-4o-mini"))
+    monkeypatch.setattr(archer.storage.functions, "_store", None)
+    assert archer.storage.functions.get_store().get_state("U1")["model"] == "gpt-4o-mini"
+
+
+def test_concurrent_writers_do_not_lose_writes(tmp_path, journal_mode):
+    # Separate stores have separate connections, as separate processes would
+    path = str(tmp_path / "archer.sqlite")
+    SqliteStore(path, logger, journal_mode=journal_mode)
+    stores = [SqliteStore(path, logger, journal_mode=journal_mode) for _ in range(4)]
+    errors = []
+
+    def write(store: SqliteStore, index: int):
+        try:
+            for count in range(25):
+                store.set_state(user(f"U{index}-{count}"))
+                store.update_state(user("shared", model=f"model-{index}"))
+        except Exception as e:
+            errors.append(e)
+
+    writers = [
+        threading.Thread(target=write, args=(store, index)) for index, store in enumerate(stores)
+    ]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    assert not errors
+    store = SqliteStore(path, logger, journal_mode=journal_mode)
+    user_ids = [f"U{index}-{count}" for index in range(4) for count in range(25)]
+    assert len(store.get_states(user_ids)) == 100
+    assert store.get_version("shared") == 100
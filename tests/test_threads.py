@@ -0,0 +1,149 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from archer.listeners import threads
+from archer.listeners.events.assistant import get_thread_history
+from archer.listeners.threads import ThreadContextStore, ThreadHistoryCache
+
+
+@pytest.fixture
+def clock(monkeypatch) -> list[float]:
+    now = [0.0]
+    monkeypatch.setattr(threads, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def message(ts: str, role: str = "user", content: str | None = None) -> dict[str, str]:
+    return {"ts": ts, "role": role, "content": content or f"message {ts}"}
+
+
+def test_messages_of_unknown_threads_are_ignored(clock):
+    history = ThreadHistoryCache(maxsize=10, ttl_seconds=60)
+    history.add("C1", "T1", "1", "user", "hello")
+
+    assert history.get("C1", "T1") is None
+    assert history.stats() == {"hits": 0, "misses": 1, "size": 0}
+
+
+def test_started_threads_collect_their_messages(clock):
+    history = ThreadHistoryCache(maxsize=10, ttl_seconds=60)
+    history.start("C1", "T1")
+    history.add("C1", "T1", "1", "assistant", "How can I help?")
+    history.add("C1", "T1", "2", "user", "hello")
+    # Slack redelivers events, and the app's own replies may be seen twice
+    history.add("C1", "T1", "2", "user", "hello")
+
+    assert history.get("C1", "T1") == [
+        message("1", "assistant", "How can I help?"),
+        message("2", "user", "hello"),
+    ]
+    assert history.get("C1", "T2") is None
+
+
+def test_only_the_latest_messages_are_kept(clock):
+    history = ThreadHistoryCache(maxsize=10, ttl_seconds=60, limit=3)
+    history.start("C1", "T1", [message(str(ts)) for ts in range(5)])
+    assert [m["ts"] for m in history.get("C1", "T1")] == ["2", "3", "4"]
+
+    history.add("C1", "T1", "5", "user", "latest")
+    assert [m["ts"] for m in history.get("C1", "T1")] == ["3", "4", "5"]
+
+
+def test_returned_histories_are_copies(clock):
+    history = ThreadHistoryCache(maxsize=10, ttl_seconds=60)
+    history.start("C1", "T1", [message("1")])
+
+    history.get("C1", "T1").append(message("2"))
+    assert history.get("C1", "T1") == [message("1")]
+
+
+def test_starting_a_known_thread_keeps_its_messages(clock):
+    history = ThreadHistoryCache(maxsize=10, ttl_seconds=60)
+    history.start("C1", "T1")
+    history.add("C1", "T1", "1", "user", "hello")
+
+    # A message may be handled before the start of its thread
+    history.start("C1", "T1")
+    assert history.get("C1", "T1") == [message("1", "user", "hello")]
+
+
+def test_threads_expire_after_their_last_message(clock):
+    history = ThreadHistoryCache(maxsize=10, ttl_seconds=60)
+    history.start("C1", "T1", [message("1")])
+
+    clock[0] = 50
+    history.add("C1", "T1", "2", "user", "still here")
+    clock[0] = 109
+    assert len(history.get("C1", "T1")) == 2
+
+    clock[0] = 110
+    assert history.get("C1", "T1") is None
+    # Expired threads are unknown, so their messages are ignored
+    history.add("C1", "T1", "3", "user", "too late")
+    assert history.get("C1", "T1") is None
+    assert history.stats()["size"] == 0
+
+    # Until their history is fetched again
+    history.start("C1", "T1", [message("1"), message("2"), message("3")])
+    assert len(history.get("C1", "T1")) == 3
+
+
+def test_the_least_recently_used_thread_is_evicted(clock):
+    history = ThreadHistoryCache(maxsize=2, ttl_seconds=60)
+    history.start("C1", "T1")
+    history.start("C1", "T2")
+    # Reading T1 makes T2 the least recently used
+    history.get("C1", "T1")
+    history.start("C1", "T3")
+
+    assert history.get("C1", "T2") is None
+    assert history.get("C1", "T1") == []
+    assert history.get("C1", "T3") == []
+
+
+class FakeClient:
+    def __init__(self, messages: list[dict]):
+        self.messages = messages
+        self.calls = 0
+
+    async def conversations_replies(self, **kwargs) -> dict:
+        self.calls += 1
+        return {"messages": self.messages}
+
+
+@pytest.mark.asyncio
+async def test_thread_history_is_fetched_from_slack_once(monkeypatch):
+    history = ThreadHistoryCache(maxsize=10, ttl_seconds=60)
+    monkeypatch.setattr(sys.modules[get_thread_history.__module__], "thread_history", history)
+    client = FakeClient([
+        {"ts": "1", "bot_id": "B1", "text": "How can I help?"},
+        {"ts": "2", "text": "hello"},
+    ])
+    context = SimpleNamespace(channel_id="C1", thread_ts="T1")
+
+    # The current message is sent as the prompt, not as history
+    assert await get_thread_history(client, context, "2") == [
+        {"role": "assistant", "content": "How can I help?"}
+    ]
+    history.add("C1", "T1", "3", "assistant", "hi")
+    history.add("C1", "T1", "4", "user", "again")
+
+    assert await get_thread_history(client, context, "4") == [
+        {"role": "assistant", "content": "How can I help?"},
+        {"role": "user", "content": "hello"},
+        {"role": "assistant", "content": "hi"},
+    ]
+    assert client.calls == 1
+    assert history.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+@pytest.mark.asyncio
+async def test_thread_contexts_are_bounded():
+    contexts = ThreadContextStore(maxsize=1)
+    await contexts.save(channel_id="C1", thread_ts="T1", context={"channel_id": "C9"})
+    assert (await contexts.find(channel_id="C1", thread_ts="T1"))["channel_id"] == "C9"
+
+    await contexts.save(channel_id="C1", thread_ts="T2", context={"channel_id": "C9"})
+    assert await contexts.find(channel_id="C1", thread_ts="T1") is None
@@ -0,0 +1,71 @@
+import pytest
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import StructuredTool
+
+from archer.agent.tool_cache import ToolResponseCache, with_response_cache
+
+
+def make_tool(name: str, calls: list[str]) -> StructuredTool:
+    def run(config: RunnableConfig, query: str = "") -> dict:
+        calls.append(name)
+        return {"value": f"{name} {query} {len(calls)}"}
+
+    return StructuredTool.from_function(run, name=name, description=f"The {name} tool.")
+
+
+def user(user_id: str) -> dict:
+    return {"configurable": {"user_id": user_id}}
+
+
+@pytest.fixture
+def cache() -> ToolResponseCache:
+    return ToolResponseCache(maxsize=100)
+
+
+def test_read_only_responses_are_cached_per_user(cache):
+    calls: list[str] = []
+    tool = with_response_cache(make_tool("Google_ListEmails", calls), cache)
+
+    first = tool.func(config=user("U1"), query="inbox")
+    assert tool.func(config=user("U1"), query="inbox") == first
+    tool.func(config=user("U2"), query="inbox")
+
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_public_responses_are_shared_between_users(cache):
+    calls: list[str] = []
+    tool = with_response_cache(make_tool("Search_SearchGoogle", calls), cache)
+
+    tool.func(config=user("U1"), query="weather")
+    tool.func(config=user("U2"), query="weather")
+
+    assert len(calls) == 1
+
+
+def test_user_scoped_writes_invalidate_only_that_users_responses(cache):
+    calls: list[str] = []
+    list_emails = with_response_cache(make_tool("Google_ListEmails", calls), cache)
+    send_email = with_response_cache(make_tool("Google_SendEmail", calls), cache)
+
+    list_emails.func(config=user("U1"), query="inbox")
+    list_emails.func(config=user("U2"), query="inbox")
+    send_email.func(config=user("U1"), query="hello")
+    list_emails.func(config=user("U1"), query="inbox")
+    list_emails.func(config=user("U2"), query="inbox")
+
+    assert calls.count("Google_ListEmails") == 3
+
+
+def test_other_tools_of_a_public_toolkit_do_not_clear_the_shared_cache(cache):
+    calls: list[str] = []
+    scrape = with_response_cache(make_tool("Web_ScrapeUrl", calls), cache)
+    crawl = make_tool("Web_CrawlWebsite", calls)
+
+    assert with_response_cache(crawl, cache) is crawl
+    scrape.func(config=user("U1"), query="https://example.com")
+    crawl.func(config=user("U2"), query="https://example.com")
+    scrape.func(config=user("U1"), query="https://example.com")
+
+    assert calls.count("Web_ScrapeUrl") == 1
@@ -0,0 +1,90 @@
+import logging
+import os
+import time
+
+import pytest
+from langchain_core.messages import ToolMessage
+
+import archer.agent.tool_output
+from archer.agent.tool_output import ToolOutputProcessor, fetch_tool_output
+from archer.storage.file import FileStore
+from archer.storage.schema import StorageResourceError
+from archer.storage.sqlite import SqliteStore
+
+CONFIG = {"configurable": {"user_id": "U1"}}
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def store(request, tmp_path, monkeypatch):
+    logger = logging.getLogger(__name__)
+    if request.param == "file":
+        store = FileStore(str(tmp_path), logger)
+    else:
+        store = SqliteStore(str(tmp_path / "archer.sqlite"), logger)
+    monkeypatch.setattr(archer.agent.tool_output, "get_store", lambda: store)
+    return store
+
+
+def truncate(processor: ToolOutputProcessor, size: int = 50_000) -> str:
+    message = ToolMessage(content="x" * size, name="Google_ListEmails", tool_call_id="call-1")
+    content = processor.process(message, "U1").content
+    return content.split('handle "')[1].split('"')[0]
+
+
+def test_truncated_output_can_be_read_in_pages(store):
+    handle = truncate(ToolOutputProcessor())
+    page = fetch_tool_output(handle, 100, config=CONFIG)
+    assert page.startswith("x")
+    assert f'handle "{handle}"' in page
+
+
+def test_other_users_cannot_read_an_output(store):
+    handle = truncate(ToolOutputProcessor())
+    page = fetch_tool_output(handle, 0, config={"configurable": {"user_id": "U2"}})
+    assert page.startswith("Error: no tool output found")
+
+
+@pytest.mark.parametrize(
+    "handle",
+    ["../../users/U1", "../users/U1", "tool-output-" + "a" * 32 + "\n", "tool-output-xyz"],
+)
+def test_invalid_handles_are_rejected(store, handle):
+    assert fetch_tool_output(handle, 0, config=CONFIG).startswith("Error: invalid")
+
+
+def test_negative_offsets_are_rejected(store):
+    handle = truncate(ToolOutputProcessor())
+    assert fetch_tool_output(handle, -1, config=CONFIG).startswith("Error: invalid offset")
+
+
+def test_expired_outputs_are_not_served(store, monkeypatch):
+    monkeypatch.setattr(ToolOutputProcessor, "purge_expired", lambda self: None)
+    handle = truncate(ToolOutputProcessor(ttl_seconds=0))
+    time.sleep(0.01)
+    assert fetch_tool_output(handle, 0, config=CONFIG).startswith("Error: no tool output")
+
+
+def test_expired_outputs_are_deleted_when_outputs_are_saved(store):
+    # Outputs expire a second before they are saved, so coarse file times can't keep them
+    handle = truncate(ToolOutputProcessor(ttl_seconds=-1))
+    with pytest.raises(StorageResourceError):
+        store.get_agent_state(handle)
+
+
+def test_purge_only_deletes_old_tool_outputs(store):
+    store.save_agent_state("other-state", {"kept": True})
+    handle = truncate(ToolOutputProcessor())
+
+    assert store.delete_agent_states("tool-output-", time.time() - 60) == 0
+    assert store.delete_agent_states("tool-output-", time.time() + 1) == 1
+    assert store.get_agent_state("other-state") == {"kept": True}
+    with pytest.raises(StorageResourceError):
+        store.get_agent_state(handle)
+
+
+def test_file_store_rejects_state_ids_outside_its_directory(tmp_path):
+    store = FileStore(str(tmp_path), logging.getLogger(__name__))
+    os.makedirs(tmp_path / "users", exist_ok=True)
+    (tmp_path / "users" / "U1.json").write_text("{}")
+    with pytest.raises(StorageResourceError):
+        store.get_agent_state("../users/U1")
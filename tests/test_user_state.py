@@ -0,0 +1,136 @@
+import logging
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from archer.storage import functions
+from archer.storage.file import FileStore
+from archer.storage.functions import get_user_state, set_user_state, update_user_state
+from archer.storage.schema import UserIdentity
+from archer.storage.sqlite import SqliteStore
+
+logger = logging.getLogger(__name__)
+
+
+class CountingStore:
+    """
+    Wraps a store and counts the calls that reach it.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.calls: list[str] = []
+
+    def __getattr__(self, name: str):
+        method = getattr(self.store, name)
+
+        def call(*args, **kwargs):
+            self.calls.append(name)
+            return method(*args, **kwargs)
+
+        return call
+
+
+@pytest.fixture
+def clock(monkeypatch) -> list[float]:
+    now = [1000.0]
+    monkeypatch.setattr(functions, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    monkeypatch.setattr(functions, "USER_CACHE_TTL_SECONDS", 30)
+    monkeypatch.setattr(functions, "_user_cache", {})
+    return now
+
+
+@pytest.fixture(params=["sqlite", "file"])
+def stores(request, tmp_path, monkeypatch, clock) -> tuple[CountingStore, object]:
+    """
+    Return the store of this process, and a separate store on the same data
+    standing in for another replica.
+    """
+    if request.param == "sqlite":
+        path = str(tmp_path / "archer.sqlite")
+        store, replica = SqliteStore(path, logger), SqliteStore(path, logger)
+    else:
+        store, replica = FileStore(str(tmp_path), logger), FileStore(str(tmp_path), logger)
+    counting = CountingStore(store)
+    monkeypatch.setattr(functions, "_store", counting)
+    return counting, replica
+
+
+def write_elsewhere(replica, model: str) -> None:
+    replica.update_state(UserIdentity(user_id="U1", provider="openai", model=model))
+    if isinstance(replica, FileStore):
+        # The FileStore's version is the file's mtime, which may not have moved
+        # within the resolution of the filesystem's clock
+        path = replica._get_user_path("U1")
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_new_users_get_the_default_state(stores):
+    store, _ = stores
+
+    assert get_user_state("U1") == {"user_id": "U1", "provider": "openai", "model": "gpt-4o"}
+    assert store.store.get_state("U1")["model"] == "gpt-4o"
+
+
+def test_cached_states_are_served_without_the_store_within_the_ttl(stores, clock):
+    store, replica = stores
+    set_user_state("U1", "openai", "gpt-4o")
+    store.calls.clear()
+
+    clock[0] += 29
+    write_elsewhere(replica, "gpt-4o-mini")
+
+    # Writes of other replicas are seen only once the entry is checked again
+    assert get_user_state("U1")["model"] == "gpt-4o"
+    assert store.calls == []
+
+
+def test_unchanged_states_are_checked_by_version_only(stores, clock):
+    store, _ = stores
+    set_user_state("U1", "openai", "gpt-4o")
+    store.calls.clear()
+
+    clock[0] += 30
+    assert get_user_state("U1")["model"] == "gpt-4o"
+    assert store.calls == ["get_version"]
+
+    # The check restarts the TTL
+    clock[0] += 29
+    assert get_user_state("U1")["model"] == "gpt-4o"
+    assert store.calls == ["get_version"]
+
+
+def test_changed_states_are_read_again_after_the_ttl(stores, clock):
+    store, replica = stores
+    set_user_state("U1", "openai", "gpt-4o")
+    write_elsewhere(replica, "gpt-4o-mini")
+    store.calls.clear()
+
+    clock[0] += 30
+    assert get_user_state("U1")["model"] == "gpt-4o-mini"
+    assert store.calls == ["get_version", "get_state"]
+
+    clock[0] += 30
+    assert get_user_state("U1")["model"] == "gpt-4o-mini"
+    assert store.calls == ["get_version", "get_state", "get_version"]
+
+
+def test_updates_of_this_process_are_cached(stores, clock):
+    store, _ = stores
+    set_user_state("U1", "openai", "gpt-4o")
+
+    update_user_state("U1", model="o1")
+    store.calls.clear()
+
+    assert get_user_state("U1")["model"] == "o1"
+    clock[0] += 30
+    assert get_user_state("U1")["model"] == "o1"
+    assert store.calls == ["get_version"]
+
+
+def test_returned_states_are_copies(stores):
+    get_user_state("U1")["model"] = "changed by the caller"
+
+    assert get_user_state("U1")["model"] == "gpt-4o"